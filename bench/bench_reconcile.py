@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+照合処理（reconcile）まわりのベンチマーク
+
+上流4ページ（timetable.json / timetable.html / YouTube live / streams）の記録を
+フィクスチャとして読み込み、ネットワークと投稿を差し替えた上で
+  - 部品ごと（assign_broadcast_dates, lineup_for, full_slots_for, diff_lineup,
+    merge_baseline, union_full, parse_youtube_streams, index_archives, build_change_tweet）
+  - reconcile() 1回まるごと（告知 / 変更通知 / 無変化の2回目）
+の時間（中央値・最良）とピークメモリを測る。
+
+フィクスチャは bench/fixtures/ に --record で実ページを保存して使う。無ければ
+（あるいは --days/--yt-pad を指定すれば）同じ形の合成ページを作る。--days で日数の多い
+番組表、--yt-pad で巨大な配信一覧（bench_youtube_parser の合成ノードで水増し）にできる。
+
+--save-baseline で結果を保存し、--compare で保存分と比べて遅く/重くなったケースを
+報告する（閾値を越えたら終了コード1）。
+
+使い方:
+  python bench/bench_reconcile.py --record                  # 実ページをフィクスチャに保存
+  python bench/bench_reconcile.py                           # フィクスチャ（無ければ合成）で測る
+  python bench/bench_reconcile.py --days 60 --yt-pad 3000   # 大きくした合成ページで測る
+  python bench/bench_reconcile.py --save-baseline bench/baseline.json
+  python bench/bench_reconcile.py --compare bench/baseline.json --threshold 1.3
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+import weather_bot as wb  # noqa: E402
+import simulate  # noqa: E402
+from bench_youtube_parser import synthetic_page  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+FIXTURE_META = 'meta.json'
+FIXTURES = wb.SNAPSHOT_FILES   # 保存名は SNAPSHOT_DIR の記録と同じ
+SYNTH_NOW = datetime(2026, 8, 22, 21, 30, tzinfo=wb.JST)   # 合成ページの「記録時刻」
+SYNTH_DAYS = 3
+# 差が小さすぎるケースは比率が暴れるので、比較ではこれ未満の悪化を無視する
+COMPARE_FLOOR_MS = 0.2
+COMPARE_FLOOR_KB = 64
+
+
+# ============================ フィクスチャ ============================
+def record(directory: str) -> None:
+    """上流4ページを取得してフィクスチャとして保存する（記録時刻を meta.json に残す）。"""
+    os.makedirs(directory, exist_ok=True)
+    for url, name in FIXTURES.items():
+        text = wb.http_get(url, cache_bust=url in (wb.TIMETABLE_JSON_URL, wb.TIMETABLE_HTML_URL))
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"{name}: {len(text.encode('utf-8')) / 1e3:.1f} KB", file=sys.stderr)
+    with open(os.path.join(directory, FIXTURE_META), 'w', encoding='utf-8') as f:
+        json.dump({'recorded_at': wb.now_jst().isoformat(timespec='minutes')}, f)
+
+
+def load_recorded(directory: str):
+    """保存したフィクスチャを読む。揃っていなければ None。"""
+    paths = {url: os.path.join(directory, name) for url, name in FIXTURES.items()}
+    meta = os.path.join(directory, FIXTURE_META)
+    if not all(os.path.exists(p) for p in list(paths.values()) + [meta]):
+        return None
+    pages = {}
+    for url, path in paths.items():
+        with open(path, 'rb') as f:
+            pages[url] = f.read()
+    with open(meta, 'r', encoding='utf-8') as f:
+        now = datetime.fromisoformat(json.load(f)['recorded_at'])
+    return pages, now.astimezone(wb.JST)
+
+
+def rota(day: date) -> dict:
+    """合成の出演表 {時刻: キャスターコード}（日付ごとに決まった並び）。"""
+    codes = sorted(set(wb.FALLBACK_CASTER_KANJI) - set(wb.FALLBACK_CASTER_TRANS.values())) \
+        + sorted(wb.FALLBACK_CASTER_TRANS)
+    rng = random.Random(day.toordinal())
+    return dict(zip(wb.STANDARD_SLOTS, rng.sample(codes, len(wb.STANDARD_SLOTS))))
+
+
+def synthetic_timetable(now: datetime, days: int) -> list[dict]:
+    """
+    timetable.json 相当のエントリ列。先頭は進行中の放送日の 08:00 から（05:00 は
+    assign_broadcast_dates が翌日への繰り上げに使うので付けない）。最終日の一部は未定。
+    """
+    first = wb.today_bday(now)
+    entries = []
+    for i in range(days):
+        day = first + timedelta(days=i)
+        casters = rota(day)
+        for t, program in wb.STANDARD_SLOTS.items():
+            if i == 0 and t == '05:00':
+                continue
+            undecided = i == days - 1 and t >= '14:00'
+            entries.append({'hour': t, 'title': program, 'caster': '' if undecided else casters[t]})
+        for t in ('23:00', '02:00'):
+            entries.append({'hour': t, 'title': 'ウェザーニュースLiVE', 'caster': ''})
+    return entries
+
+
+def synthetic_caster_html() -> str:
+    """timetable.html 相当（caster_trans / caster_kanji の JS 対応表）。"""
+    def js(func: str, table: dict) -> str:
+        body = ''.join(f' if(x == "{k}"){{ ret_name = "{v}"; }}\n' for k, v in table.items())
+        return f'function {func}(x){{\n var ret_name = x;\n{body} return ret_name;\n}}\n'
+    return ('<html><head><title>番組表</title></head><body><script>\n'
+            + js('caster_trans', wb.FALLBACK_CASTER_TRANS)
+            + js('caster_kanji', wb.FALLBACK_CASTER_KANJI)
+            + 'function render(){}\n</script></body></html>')
+
+
+def archive_title(day: date, program: str, code: str) -> str:
+    name = wb.FALLBACK_CASTER_KANJI[wb.FALLBACK_CASTER_TRANS.get(code, code)].replace(' ', '')
+    return (f"【ライブ配信終了】最新天気ニュース・地震情報 {day.year}年{day.month}月{day.day}日"
+            f"／〈ウェザーニュースLiVE{wb.program_suffix(program)}・{name}／山口剛央〉")
+
+
+def video_id(day: date, t: str) -> str:
+    return hashlib.sha256(f"{day}{t}".encode()).hexdigest()[:11]
+
+
+def synthetic_streams(now: datetime, pad: int) -> str:
+    """配信一覧相当（直近3日の実在しそうなタイトル＋合成ノード pad 本で水増し）。"""
+    nodes = []
+    tb = wb.today_bday(now)
+    for back in range(3):
+        day = tb - timedelta(days=back)
+        for t, program in reversed(list(wb.STANDARD_SLOTS.items())):
+            if wb.slot_minutes(t) + 180 > (now - datetime.combine(day, datetime.min.time(), wb.JST)) \
+                    .total_seconds() / 60:
+                continue   # まだ終わっていない枠は一覧に載らない
+            title = archive_title(day, program, rota(day)[t])
+            title = ''.join(f'\\u{ord(c):04x}' if ord(c) > 0x7f else c for c in title)
+            nodes.append('{"videoRenderer":{"videoId":"%s","title":{"runs":[{"text":"%s"}]}}},'
+                         % (video_id(day, t), title))
+    padding = synthetic_page(pad) if pad else ''
+    return ('<html><body><script>var ytInitialData = {"contents":[' + ''.join(nodes)
+            + ']};</script>' + padding + '</body></html>')
+
+
+def synthetic_live(now: datetime) -> str:
+    """放送中ページ相当（canonical と title だけあればよい）。"""
+    tb = wb.today_bday(now)
+    slot = max((t for t in wb.STANDARD_SLOTS if wb.slot_minutes(t) <= now.hour * 60 + now.minute),
+               default='20:00')
+    vid = video_id(tb, slot)
+    return (f'<html><head><title>{archive_title(tb, wb.STANDARD_SLOTS[slot], rota(tb)[slot])}</title>'
+            f'<link rel="canonical" href="https://www.youtube.com/watch?v={vid}"></head></html>')
+
+
+def synthetic_pages(days: int, pad: int):
+    now = SYNTH_NOW
+    pages = {
+        wb.TIMETABLE_JSON_URL: json.dumps(synthetic_timetable(now, days), ensure_ascii=False),
+        wb.TIMETABLE_HTML_URL: synthetic_caster_html(),
+        wb.YOUTUBE_LIVE_URL: synthetic_live(now),
+        wb.YOUTUBE_STREAMS_URL: synthetic_streams(now, pad),
+    }
+    return {url: text.encode('utf-8') for url, text in pages.items()}, now
+
+
+# ============================ 差し替え（ネットワーク・投稿） ============================
+def install_stubs(pages: dict) -> list:
+    """
+    取得をフィクスチャ返しに、投稿・固定を記録だけに差し替える（simulate.py の代役を使う。
+    ETag は本文のハッシュなので、条件付きGETは本物どおり 304 になる）。
+
+    Returns:
+        投稿の記録のリスト（実行ごとに空にして使う）
+    """
+    posted = []
+    simulate.install_stand_ins(pages, posted)
+    # 変更通知のまとめ出し（保留）は切る。change シナリオは通知を出すところまでを測る
+    wb.COALESCE_WINDOW_MIN = 0
+    return posted
+
+
+# ============================ 計測 ============================
+def measure(fn, repeat: int, setup=None) -> dict:
+    """fn を repeat 回測って {median_ms, min_ms, peak_kb} を返す（setup は計測外）。"""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    arg = setup() if setup else None
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_ms': statistics.median(times) * 1e3, 'min_ms': min(times) * 1e3,
+            'peak_kb': peak / 1e3}
+
+
+def function_cases(pages: dict, now: datetime) -> dict:
+    """部品ごとのケース（名前 → 引数を受けない関数）。"""
+    entries = json.loads(pages[wb.TIMETABLE_JSON_URL])
+    streams = pages[wb.YOUTUBE_STREAMS_URL].decode('utf-8')
+    dated = wb.assign_broadcast_dates(entries, now)
+    bdays = sorted(dated)
+    target = bdays[1] if len(bdays) > 1 else bdays[0]
+    lineup = wb.lineup_for(dated, target, pad_standard=True)
+    # 基準は半分の枠で別人・残りは未定 → 決定と変更の両方が出る
+    names = [p['caster'] for p in lineup if p['caster']] or ['未定']
+    baseline = [dict(p, caster=names[(i + 1) % len(names)]) if i % 2 else
+                dict(p, caster=None, status='undecided') for i, p in enumerate(lineup)]
+    decisions, changes = wb.diff_lineup(baseline, lineup)
+    full = wb.full_slots_for(dated, target)
+    full_acc = [dict(p, youtube='https://youtu.be/x') for p in full[::2]]
+    archives = wb.parse_youtube_streams(streams)
+    index = wb.index_archives(archives)
+    days = {d: wb.full_slots_for(dated, d) for d in bdays}
+    return {
+        'assign_broadcast_dates': lambda: wb.assign_broadcast_dates(entries, now),
+        'lineup_for': lambda: [wb.lineup_for(dated, d, pad_standard=True) for d in bdays],
+        'full_slots_for': lambda: [wb.full_slots_for(dated, d) for d in bdays],
+        'diff_lineup': lambda: wb.diff_lineup(baseline, lineup),
+        'merge_baseline': lambda: wb.merge_baseline(baseline, lineup),
+        'union_full': lambda: wb.union_full(full_acc, full),
+        'parse_youtube_streams': lambda: wb.parse_youtube_streams(streams),
+        'index_archives': lambda: wb.index_archives(archives),
+        'match_archive': lambda: [wb.match_archive(index, d, p['program'], p['caster'])
+                                  for d, slots in days.items() for p in slots],
+        'build_change_tweet': lambda: wb.build_change_tweet(target, lineup, decisions, changes,
+                                                            '14:30'),
+    }
+
+
+def reset_bot() -> None:
+    """実行間で持ち越すプロセス内キャッシュを全部捨てる（作業ディレクトリごと替えるため）。"""
+    wb.reset_run_caches()
+    wb._CASTER_MAPS = None
+    wb._HTTP_CACHE = None
+
+
+def scenario_state(dated: dict, tb: date, scenario: str) -> dict:
+    """シナリオ開始時の schedule_data.json。"""
+    lineup = wb.lineup_for(dated, tb, pad_standard=True)
+    if scenario == 'change':
+        # 後半の枠を別人で告知していたことにする → 変更通知が出る
+        names = [p['caster'] for p in lineup if p['caster']] or ['未定']
+        lineup = [dict(p, caster=names[(i + 2) % len(names)]) if p['time'] >= '14:00' else p
+                  for i, p in enumerate(lineup)]
+    return {'target_date': tb.isoformat(), 'announced_date': tb.isoformat(),
+            'tweeted': lineup, 'full': []}
+
+
+def reconcile_cases(pages: dict, now: datetime, posted: list, workdir: str) -> dict:
+    """reconcile() 1回まるごとのケース（名前 → (setup, 計測する関数)）。"""
+    entries = json.loads(pages[wb.TIMETABLE_JSON_URL])
+    tb = wb.today_bday(now)
+    dated = wb.assign_broadcast_dates(entries, now)
+    announce_at = datetime.combine(tb, datetime.min.time(), wb.JST).replace(hour=wb.ANNOUNCE_HOUR,
+                                                                           minute=30)
+    daytime = datetime.combine(tb, datetime.min.time(), wb.JST).replace(hour=10, minute=30)
+    trans = wb.parse_js_caster_map(pages[wb.TIMETABLE_HTML_URL].decode('utf-8'), 'caster_trans')
+    kanji = wb.parse_js_caster_map(pages[wb.TIMETABLE_HTML_URL].decode('utf-8'), 'caster_kanji')
+
+    def setup(scenario: str, at: datetime, warm: bool):
+        def run_setup():
+            shutil.rmtree(workdir, ignore_errors=True)
+            os.makedirs(workdir)
+            os.chdir(workdir)
+            os.environ['TEST_NOW'] = at.isoformat()
+            reset_bot()
+            with open(wb.DATA_FILE, 'w', encoding='utf-8') as f:
+                json.dump(scenario_state(dated, tb, scenario), f, ensure_ascii=False)
+            wb.save_caster_maps_cache(trans, kanji)
+            wb.ensure_history_file()
+            wb.ensure_cache_files()
+            if warm:
+                wb.reconcile()   # 1回目（計測外）。2回目は番組表も状態も変わらない
+                reset_bot()
+            posted.clear()
+        return run_setup
+
+    def run(_):
+        if not wb.reconcile():
+            raise RuntimeError('reconcile が失敗した')
+
+    return {
+        'reconcile:announce': (setup('announce', announce_at, False), run),
+        'reconcile:change': (setup('change', daytime, False), run),
+        'reconcile:steady': (setup('change', daytime, True), run),
+    }
+
+
+# ============================ 比較 ============================
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """基準より threshold 倍以上 遅い/重いケースを返す（ごく小さい差は無視）。"""
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r['median_ms'] > b['median_ms'] * threshold and \
+                r['median_ms'] - b['median_ms'] > COMPARE_FLOOR_MS:
+            regressions.append(f"{name}: 時間 {b['median_ms']:.2f} → {r['median_ms']:.2f} ms")
+        if r['peak_kb'] > b['peak_kb'] * threshold and r['peak_kb'] - b['peak_kb'] > COMPARE_FLOOR_KB:
+            regressions.append(f"{name}: ピーク {b['peak_kb']:.0f} → {r['peak_kb']:.0f} KB")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--fixtures', default=FIXTURE_DIR, help='フィクスチャのディレクトリ')
+    ap.add_argument('--record', action='store_true', help='実ページを取得してフィクスチャに保存する')
+    ap.add_argument('--days', type=int, help=f'合成番組表の日数（既定 {SYNTH_DAYS}。指定すると合成を使う）')
+    ap.add_argument('--yt-pad', type=int, default=0, help='配信一覧を合成ノード N 本で水増しする')
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--only', help='名前にこの文字列を含むケースだけ測る')
+    ap.add_argument('--save-baseline', metavar='PATH', help='結果を基準として保存する')
+    ap.add_argument('--compare', metavar='PATH', help='保存した基準と比べる')
+    ap.add_argument('--threshold', type=float, default=1.3, help='悪化とみなす倍率')
+    args = ap.parse_args()
+
+    if args.record:
+        record(args.fixtures)
+        return
+
+    loaded = None if args.days or args.yt_pad else load_recorded(args.fixtures)
+    if loaded:
+        (pages, now), source = loaded, f'フィクスチャ {args.fixtures}'
+    else:
+        pages, now = synthetic_pages(args.days or SYNTH_DAYS, args.yt_pad)
+        source = f'合成（{args.days or SYNTH_DAYS}日, 水増し{args.yt_pad}本）'
+    sizes = ', '.join(f"{FIXTURES[u]} {len(b) / 1e3:.0f}KB" for u, b in pages.items())
+    print(f"{source} / 記録時刻 {now.isoformat(timespec='minutes')}\n{sizes}\n")
+
+    os.environ['TEST_NOW'] = now.isoformat()
+    os.environ.pop('SKIP_TWEET_FLAG', None)
+    posted = install_stubs(pages)
+    # ボットは作業ディレクトリに状態・キャッシュを書くので、一時ディレクトリで動かす
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='bench_reconcile_')
+    os.chdir(workdir)
+    results = {}
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            cases = {name: (None, lambda _, fn=fn: fn())
+                     for name, fn in function_cases(pages, now).items()}
+            cases.update(reconcile_cases(pages, now, posted, workdir))
+        print(f"{'case':<24} {'median(ms)':>11} {'min(ms)':>9} {'peak(KB)':>9}")
+        for name, (setup, fn) in cases.items():
+            if args.only and args.only not in name:
+                continue
+            with contextlib.redirect_stderr(io.StringIO()):
+                r = measure(fn, args.repeat, setup)
+            results[name] = r
+            print(f"{name:<24} {r['median_ms']:>11.3f} {r['min_ms']:>9.3f} {r['peak_kb']:>9.0f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'python': sys.version.split()[0], 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n基準を保存: {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        print(f"\n基準（{baseline.get('source')}）との比較: "
+              + ('悪化なし' if not regressions else f'{len(regressions)}件悪化'))
+        for line in regressions:
+            print('  ' + line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配信一覧ページ解析（parse_youtube_streams）のベンチマーク
+
+旧実装（ページ全体の \\uXXXX 置換 → タイトルごとにID一覧を作り直す）と比べ、
+ページを 1x, 2x, 4x ... と大きくしたときの時間とピークメモリを並べる。
+新実装は時間がページサイズにほぼ比例し、ピークメモリはページのコピー分だけ小さくなる。
+
+使い方:
+  python bench/bench_youtube_parser.py                      # 合成ページ
+  python bench/bench_youtube_parser.py --page streams.html  # 保存した実ページを倍々に拡大
+  python bench/bench_youtube_parser.py --scales 1 2 4 8 16 --repeat 3
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import weather_bot  # noqa: E402
+
+
+def legacy_parse(html: str) -> list[tuple[str, str]]:
+    """旧 fetch_youtube_archives() の解析部分（比較用にそのまま残したもの）。"""
+    html = re.sub(r'\\u([0-9a-fA-F]{4})', lambda m: chr(int(m.group(1), 16)), html)
+    ids = [(m.start(), m.group(1))
+           for m in re.finditer(r'"(?:videoId|contentId)":"([A-Za-z0-9_-]{11})"', html)]
+    out, seen = [], set()
+    for m in re.finditer(r'"(?:content|simpleText|text)":"(【[^"]{10,220})"', html):
+        before = [v for pos, v in ids if pos < m.start()]
+        if not before:
+            continue
+        pair = (before[-1], m.group(1))
+        if pair[1] in seen:
+            continue
+        seen.add(pair[1])
+        out.append(pair)
+    return out
+
+
+def synthetic_page(items: int) -> str:
+    """ytInitialData 風の配信一覧ページを作る（1本あたり数KBのノード＋エスケープ混じりのタイトル）。"""
+    progs = ['モーニング', 'サンシャイン', 'コーヒータイム', 'アフタヌーン', 'イブニング', 'ムーン']
+    parts = ['<html><head><title>ウェザーニュース - YouTube</title></head><body><script>',
+             'var ytInitialData = {"contents":[']
+    for i in range(items):
+        vid = f"{i:011d}"[-11:].replace('0', 'A')
+        day = i // 6 % 28 + 1
+        prog = progs[i % 6]
+        # 半分は \uXXXX のまま（実ページ同様）、半分は生のUTF-8で置く
+        title = f"【ライブ配信終了】最新天気ニュース・地震情報 2026年7月{day}日／〈ウェザーニュースLiVE{prog}・キャスター{i}／解説〉"
+        if i % 2:
+            title = ''.join(f'\\u{ord(c):04x}' if ord(c) > 0x7f else c for c in title)
+        parts.append(
+            '{"videoRenderer":{"videoId":"%s","thumbnail":{"thumbnails":[%s]},'
+            '"title":{"runs":[{"text":"%s"}]},"descriptionSnippet":{"runs":[{"text":"%s"}]},'
+            '"navigationEndpoint":{"commandMetadata":{"webCommandMetadata":{"url":"/watch?v=%s"}}}}},'
+            % (vid, ','.join('{"url":"https://i.ytimg.com/vi/%s/hq%d.jpg","width":%d}' % (vid, k, k * 100)
+                             for k in range(8)),
+               title, 'x' * 1500, vid))
+    parts.append(']};</script></body></html>')
+    return ''.join(parts)
+
+
+def measure(fn, html: str, repeat: int) -> tuple[float, int, list]:
+    """(最良の秒数, ピーク追加メモリ[byte], 結果) を返す。"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(html)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--page', help='保存した配信一覧ページ（無ければ合成ページ）')
+    ap.add_argument('--items', type=int, default=120, help='合成ページ 1x あたりの配信本数')
+    ap.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8])
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--no-legacy', action='store_true', help='旧実装を測らない（大きいページ向け）')
+    args = ap.parse_args()
+
+    base = None
+    if args.page:
+        with open(args.page, 'r', encoding='utf-8') as f:
+            base = f.read()
+
+    print(f"{'scale':>5} {'size(MB)':>9} {'items':>6} {'new(ms)':>9} {'new peak(MB)':>13}"
+          f" {'old(ms)':>9} {'old peak(MB)':>13} {'same':>5}")
+    for scale in args.scales:
+        html = base * scale if base is not None else synthetic_page(args.items * scale)
+        t_new, m_new, r_new = measure(weather_bot.parse_youtube_streams, html, args.repeat)
+        row = (f"{scale:>5} {len(html.encode('utf-8')) / 1e6:>9.2f} {len(r_new):>6} "
+               f"{t_new * 1e3:>9.1f} {m_new / 1e6:>13.2f}")
+        if not args.no_legacy:
+            t_old, m_old, r_old = measure(legacy_parse, html, args.repeat)
+            row += f" {t_old * 1e3:>9.1f} {m_old / 1e6:>13.2f} {str(r_old == r_new):>5}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+過去の放送一覧の静的サイト（履歴の final レコードから生成）
+
+final レコード（weather_bot.history_final_record。resolve_youtube_links で埋めた
+配信リンク付きのフル時刻表）から、次のページを HTML と JSON の組で書き出す:
+
+  site/index.html              … 月とキャスターの一覧
+  site/day/2026-08-01.html     … 放送日ごとの時刻表（配信リンク付き）
+  site/month/2026-08.html      … 月ごとの放送日 × 出演者
+  site/caster/<氏名>.html      … キャスターごとの出演一覧
+
+（それぞれ .json も同じ場所に置く。）
+
+生成の状態は出力先の .archive_site.json に持つ:
+  - 取り込み済みの final（放送日 → 枠）と、caster_stats.py と同じウォーターマーク
+  - ページごとの入力のハッシュ
+ページの中身はそのページの入力（その日の枠、その月の日々、そのキャスターの出演…）
+だけで決まるので、入力のハッシュが前回と同じページは書き直さない。毎回の実行後に
+回しても、書くのは新しい放送日とそれが載る月・キャスター・一覧のページだけで済む。
+同じ放送日の final が複数あれば、caster_stats.py と同じく最初のものを採る（history_segments.new_finals）。
+
+使い方:
+  python src/archive_site.py                  # 更新（変わったページだけ書く）
+  python src/archive_site.py --out public     # 出力先を変える
+  python src/archive_site.py --rebuild        # 状態を捨てて全ページを書き直す
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+from datetime import date
+from html import escape
+from urllib.parse import quote
+
+import history_segments
+
+SITE_DIR = 'site'
+STATE_FILE = '.archive_site.json'
+SITE_VERSION = 1   # ページの形を変えたら上げる（全ページが書き直しになる）
+WEEKDAYS = '月火水木金土日'
+
+
+def empty_state() -> dict:
+    return {
+        'version': SITE_VERSION,
+        'watermark': '',   # 最後に取り込んだレコードの ts
+        'finals': {},      # 放送日 → 枠 [{time, program, caster, youtube}, ...]
+        'pages': {},       # ページ（拡張子なしの相対パス）→ 入力のハッシュ
+    }
+
+
+def load_state(out_dir: str = SITE_DIR) -> dict:
+    """生成の状態を読む。無い・壊れている・版が違うなら空から（全ページ書き直し）。"""
+    path = os.path.join(out_dir, STATE_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == SITE_VERSION:
+                return state
+        except Exception as e:
+            print(f"サイト状態の読み込みエラー（作り直す）: {e}", file=sys.stderr)
+    return empty_state()
+
+
+def save_state(state: dict, out_dir: str = SITE_DIR) -> None:
+    """生成の状態を書く（一時ファイル経由で置き換え）。"""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def update(state: dict, directory: str = history_segments.HISTORY_DIR) -> int:
+    """
+    ウォーターマークより新しい final レコードを取り込む。
+
+    Returns:
+        取り込んだ final の件数
+    """
+    finals, state['watermark'] = history_segments.new_finals(state['watermark'],
+                                                             set(state['finals']), directory)
+    for record in finals:
+        state['finals'][record['date']] = [
+            {'time': s.get('time'), 'program': s.get('program') or '',
+             'caster': s.get('caster'), 'youtube': s.get('youtube')}
+            for s in record.get('slots') or [] if s.get('time')]
+    return len(finals)
+
+
+# ============================ ページの入力 ============================
+def is_caster_slot(s: dict) -> bool:
+    return bool(s.get('caster')) and '・' in (s.get('program') or '')
+
+
+def caster_file(name: str) -> str:
+    """キャスターのページのファイル名（氏名のまま。パスに使えない文字だけ置き換える）。"""
+    return name.replace('/', '_').replace('\\', '_').replace(' ', '_').replace('　', '_')
+
+
+def page_inputs(finals: dict) -> dict[str, dict]:
+    """
+    全ページの入力（ページの中身を決めるデータ）。ページ → 入力。
+    ここに入れたものだけでページを描くこと（入れ忘れると変わっても書き直されない）。
+    """
+    days = sorted(finals)
+    pages: dict[str, dict] = {}
+    months: dict[str, list] = {}
+    casters: dict[str, list] = {}
+    for i, day in enumerate(days):
+        slots = finals[day]
+        pages[f"day/{day}"] = {'kind': 'day', 'date': day, 'slots': slots,
+                               'prev': days[i - 1] if i else None,
+                               'next': days[i + 1] if i + 1 < len(days) else None}
+        months.setdefault(day[:7], []).append(
+            {'date': day, 'slots': [{'time': s['time'], 'caster': s['caster']}
+                                    for s in slots if is_caster_slot(s)]})
+        for s in slots:
+            if is_caster_slot(s):
+                casters.setdefault(s['caster'], []).append(
+                    {'date': day, 'time': s['time'], 'program': s['program'],
+                     'youtube': s.get('youtube')})
+    for month, entries in months.items():
+        pages[f"month/{month}"] = {'kind': 'month', 'month': month, 'days': entries}
+    for name, appearances in casters.items():
+        pages[f"caster/{caster_file(name)}"] = {'kind': 'caster', 'caster': name,
+                                                'appearances': appearances}
+    pages['index'] = {
+        'kind': 'index',
+        'months': [{'month': m, 'days': len(e)} for m, e in sorted(months.items())],
+        'casters': sorted(({'caster': n, 'count': len(a), 'last': a[-1]['date']}
+                           for n, a in casters.items()),
+                          key=lambda c: (-c['count'], c['caster'])),
+    }
+    return pages
+
+
+def input_hash(data: dict) -> str:
+    raw = json.dumps([SITE_VERSION, data], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# ============================ 描画 ============================
+def _day_label(day: str) -> str:
+    d = date.fromisoformat(day)
+    return f"{d.year}年{d.month}月{d.day}日（{WEEKDAYS[d.weekday()]}）"
+
+
+def _href(page: str, current: str) -> str:
+    """current のページから page への相対リンク。"""
+    up = '../' * current.count('/')
+    return up + '/'.join(quote(part) for part in page.split('/')) + '.html'
+
+
+def _caster_link(name: str, current: str) -> str:
+    return f'<a href="{_href("caster/" + caster_file(name), current)}">{escape(name)}</a>'
+
+
+def _video_link(url) -> str:
+    return f'<a href="{escape(url)}">配信</a>' if url else ''
+
+
+def _html(title: str, body: list[str], page: str) -> str:
+    home = '' if page == 'index' else f'<p><a href="{_href("index", page)}">一覧へ</a></p>'
+    return '\n'.join([
+        '<!DOCTYPE html>',
+        '<html lang="ja"><head><meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f'<title>{escape(title)} | ウェザーニュースLiVE 放送アーカイブ</title>',
+        '</head><body>',
+        home,
+        f'<h1>{escape(title)}</h1>',
+        *body,
+        '</body></html>',
+        ''])
+
+
+def render_day(page: str, data: dict) -> str:
+    rows = []
+    for s in data['slots']:
+        who = _caster_link(s['caster'], page) if is_caster_slot(s) else escape(s.get('caster') or '-')
+        rows.append(f"<tr><td>{escape(s['time'])}</td><td>{escape(s['program'])}</td>"
+                    f"<td>{who}</td><td>{_video_link(s.get('youtube'))}</td></tr>")
+    nav = [f'<a href="{_href("day/" + d, page)}">{label}</a>'
+           for d, label in ((data['prev'], '← 前の日'), (data['next'], '次の日 →')) if d]
+    return _html(_day_label(data['date']), [
+        f'<p><a href="{_href("month/" + data["date"][:7], page)}">{data["date"][:7]}</a>'
+        + (' | ' + ' | '.join(nav) if nav else '') + '</p>',
+        '<table><tr><th>時刻</th><th>番組</th><th>キャスター</th><th>配信</th></tr>',
+        *rows, '</table>'], page)
+
+
+def render_month(page: str, data: dict) -> str:
+    rows = []
+    for e in data['days']:
+        lineup = ' / '.join(f"{escape(s['time'])} {_caster_link(s['caster'], page)}"
+                            for s in e['slots'])
+        rows.append(f'<tr><td><a href="{_href("day/" + e["date"], page)}">'
+                    f'{_day_label(e["date"])}</a></td><td>{lineup}</td></tr>')
+    y, m = data['month'].split('-')
+    return _html(f"{int(y)}年{int(m)}月", [
+        '<table><tr><th>放送日</th><th>出演</th></tr>', *rows, '</table>'], page)
+
+
+def render_caster(page: str, data: dict) -> str:
+    rows = [f'<tr><td><a href="{_href("day/" + a["date"], page)}">{_day_label(a["date"])}</a></td>'
+            f"<td>{escape(a['time'])}</td><td>{escape(a['program'])}</td>"
+            f"<td>{_video_link(a.get('youtube'))}</td></tr>"
+            for a in reversed(data['appearances'])]
+    return _html(data['caster'], [
+        f"<p>出演 {len(data['appearances'])}回</p>",
+        '<table><tr><th>放送日</th><th>時刻</th><th>番組</th><th>配信</th></tr>',
+        *rows, '</table>'], page)
+
+
+def render_index(page: str, data: dict) -> str:
+    months = [f'<li><a href="{_href("month/" + m["month"], page)}">{m["month"]}</a>'
+              f"（{m['days']}日）</li>" for m in reversed(data['months'])]
+    casters = [f"<li>{_caster_link(c['caster'], page)}（{c['count']}回、最終 {c['last']}）</li>"
+               for c in data['casters']]
+    return _html('放送アーカイブ', [
+        '<h2>月別</h2>', '<ul>', *months, '</ul>',
+        '<h2>キャスター別</h2>', '<ul>', *casters, '</ul>'], page)
+
+
+RENDERERS = {'day': render_day, 'month': render_month, 'caster': render_caster,
+             'index': render_index}
+
+
+def _write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def build(state: dict, out_dir: str = SITE_DIR) -> tuple[int, int, int]:
+    """
+    入力のハッシュが変わったページだけ書き、無くなったページは消す。
+
+    Returns:
+        (書いたページ数, 変更なしで飛ばしたページ数, 消したページ数)
+    """
+    pages = page_inputs(state['finals'])
+    written = skipped = 0
+    for page, data in pages.items():
+        h = input_hash(data)
+        base = os.path.join(out_dir, *page.split('/'))
+        if state['pages'].get(page) == h and os.path.exists(base + '.html'):
+            skipped += 1
+            continue
+        _write(base + '.json', json.dumps(data, ensure_ascii=False, indent=1) + '\n')
+        _write(base + '.html', RENDERERS[data['kind']](page, data))
+        state['pages'][page] = h
+        written += 1
+    removed = 0
+    for page in [p for p in state['pages'] if p not in pages]:
+        for ext in ('.html', '.json'):
+            path = os.path.join(out_dir, *page.split('/')) + ext
+            if os.path.exists(path):
+                os.remove(path)
+        del state['pages'][page]
+        removed += 1
+    return written, skipped, removed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='過去の放送一覧の静的サイト')
+    parser.add_argument('--dir', default=history_segments.HISTORY_DIR, help='履歴セグメントのディレクトリ')
+    parser.add_argument('--out', default=SITE_DIR, help='出力先のディレクトリ')
+    parser.add_argument('--rebuild', action='store_true', help='状態を捨てて全ページを書き直す')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    state = empty_state() if args.rebuild else load_state(args.out)
+    mark, before = state['watermark'], dict(state['pages'])
+    added = update(state, args.dir)
+    written, skipped, removed = build(state, args.out)
+    if args.rebuild or state['watermark'] != mark or state['pages'] != before:
+        save_state(state, args.out)
+    print(f"final {added}件を取り込み（ウォーターマーク {state['watermark'] or '-'}）: "
+          f"{written}ページ書き出し / {skipped}ページ変更なし / {removed}ページ削除"
+          f"（{(time.perf_counter() - t0) * 1000:.0f}ms）", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
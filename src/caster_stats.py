@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キャスター統計（履歴の final レコードから集計）
+
+final レコード（weather_bot.history_final_record、放送日ごとのフル時刻表）から
+キャスターごとの出演回数・枠別/番組別の内訳・初出演/最終出演・連続出演日数と、
+枠ごとの出演者の頻度を集計する。
+
+集計結果はスナップショット（caster_stats.json）に保存し、次回は「最後に処理した
+レコードの ts（ウォーターマーク）」より新しいレコードだけを足し込む。閉じた月の
+セグメントはウォーターマークより前なら開きもしないので、履歴が何年ぶんになっても
+毎回の集計は新しい月の分だけで済む。
+
+使い方:
+  python src/caster_stats.py                  # 更新して一覧表示
+  python src/caster_stats.py --top 10         # 出演回数上位10人
+  python src/caster_stats.py --slots          # 枠ごとの出演者頻度
+  python src/caster_stats.py --export csv     # CSV で標準出力へ
+  python src/caster_stats.py --rebuild        # スナップショットを捨てて作り直す
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from datetime import date, timedelta
+from typing import Optional
+
+import history_segments
+
+SNAPSHOT_FILE = 'caster_stats.json'
+SNAPSHOT_VERSION = 1
+
+
+def empty_snapshot() -> dict:
+    return {
+        'version': SNAPSHOT_VERSION,
+        'watermark': '',      # 最後に処理したレコードの ts
+        'latest_date': None,  # 処理した final のうち最新の放送日
+        'days': [],           # 処理済みの放送日（同じ日の final が重複しても二重に数えない）
+        'casters': {},        # 氏名 → {count, slots, programs, first, last, streak, best_streak}
+        'slots': {},          # 時刻 → {氏名: 回数}
+    }
+
+
+def load_snapshot(path: str = SNAPSHOT_FILE) -> dict:
+    """スナップショットを読む。無い・壊れている・版が違うなら空から。"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snap = json.load(f)
+            if snap.get('version') == SNAPSHOT_VERSION:
+                return snap
+        except Exception as e:
+            print(f"スナップショット読み込みエラー（作り直す）: {e}", file=sys.stderr)
+    return empty_snapshot()
+
+
+def save_snapshot(snap: dict, path: str = SNAPSHOT_FILE) -> None:
+    """スナップショットを書く（一時ファイル経由で置き換え）。"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(snap, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def add_final(snap: dict, record: dict) -> bool:
+    """
+    final レコード1件を集計に足す。
+
+    Returns:
+        足したら True（処理済みの放送日なら False）
+    """
+    day = record.get('date')
+    if not day or day in snap['days']:
+        return False
+    snap['days'].append(day)
+    d = date.fromisoformat(day)
+    for s in record.get('slots') or []:
+        name, t, program = s.get('caster'), s.get('time'), s.get('program') or ''
+        if not name or '・' not in program:
+            continue   # 深夜の無人枠
+        c = snap['casters'].setdefault(name, {'count': 0, 'slots': {}, 'programs': {},
+                                              'first': day, 'last': None,
+                                              'streak': 0, 'best_streak': 0})
+        c['count'] += 1
+        c['slots'][t] = c['slots'].get(t, 0) + 1
+        suffix = program.split('・')[-1]
+        c['programs'][suffix] = c['programs'].get(suffix, 0) + 1
+        c['first'] = min(c['first'], day)
+        last = date.fromisoformat(c['last']) if c['last'] else None
+        if last is None or d > last:   # 同じ日に2枠出ても連続日数は1日ぶん
+            c['streak'] = c['streak'] + 1 if last == d - timedelta(days=1) else 1
+            c['best_streak'] = max(c['best_streak'], c['streak'])
+            c['last'] = day
+        slot = snap['slots'].setdefault(t, {})
+        slot[name] = slot.get(name, 0) + 1
+    if snap['latest_date'] is None or day > snap['latest_date']:
+        snap['latest_date'] = day
+    return True
+
+
+def update(snap: dict, directory: str = history_segments.HISTORY_DIR) -> int:
+    """
+    ウォーターマークより新しい final レコードを足し込む。
+
+    Returns:
+        足し込んだ final の件数
+    """
+    finals, snap['watermark'] = history_segments.new_finals(snap['watermark'], set(snap['days']),
+                                                            directory)
+    return sum(add_final(snap, record) for record in finals)
+
+
+def current_streak(snap: dict, c: dict) -> int:
+    """最新の放送日まで続いている連続出演日数（途切れていれば0）。"""
+    return c['streak'] if c['last'] == snap['latest_date'] else 0
+
+
+# ============================ 出力 ============================
+def caster_rows(snap: dict, top: Optional[int] = None) -> list[dict]:
+    """キャスター別の行（出演回数の多い順）。"""
+    rows = [{'caster': name, 'count': c['count'], 'first': c['first'], 'last': c['last'],
+             'current_streak': current_streak(snap, c), 'best_streak': c['best_streak'],
+             'slots': dict(sorted(c['slots'].items())),
+             'programs': dict(sorted(c['programs'].items(), key=lambda kv: -kv[1]))}
+            for name, c in snap['casters'].items()]
+    rows.sort(key=lambda r: (-r['count'], r['caster']))
+    return rows[:top] if top else rows
+
+
+def print_casters(snap: dict, top: Optional[int]) -> None:
+    print(f"集計期間: {min(snap['days'], default='-')} 〜 {snap['latest_date'] or '-'}"
+          f"（{len(snap['days'])}日）")
+    for r in caster_rows(snap, top):
+        slots = ' '.join(f"{t}×{n}" for t, n in r['slots'].items())
+        print(f"{r['caster']:<10} {r['count']:>4}回  最終 {r['last']}  連続 {r['current_streak']}日"
+              f"（最長 {r['best_streak']}日）  {slots}")
+
+
+def print_slots(snap: dict, top: Optional[int]) -> None:
+    for t in sorted(snap['slots']):
+        ranking = sorted(snap['slots'][t].items(), key=lambda kv: (-kv[1], kv[0]))[:top or None]
+        print(f"{t}: " + ', '.join(f"{name}({n})" for name, n in ranking))
+
+
+def export(snap: dict, fmt: str) -> None:
+    """集計を標準出力へ書き出す（json / csv）。"""
+    rows = caster_rows(snap)
+    if fmt == 'json':
+        json.dump({'latest_date': snap['latest_date'], 'days': len(snap['days']),
+                   'casters': rows, 'slots': snap['slots']},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    slot_times = sorted(snap['slots'])
+    w = csv.writer(sys.stdout)
+    w.writerow(['caster', 'count', 'first', 'last', 'current_streak', 'best_streak'] + slot_times)
+    for r in rows:
+        w.writerow([r['caster'], r['count'], r['first'], r['last'], r['current_streak'],
+                    r['best_streak']] + [r['slots'].get(t, 0) for t in slot_times])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='キャスター統計')
+    parser.add_argument('--dir', default=history_segments.HISTORY_DIR, help='履歴セグメントのディレクトリ')
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE)
+    parser.add_argument('--rebuild', action='store_true', help='スナップショットを捨てて全履歴から集計し直す')
+    parser.add_argument('--top', type=int, help='上位N件だけ表示')
+    parser.add_argument('--slots', action='store_true', help='枠ごとの出演者頻度を表示')
+    parser.add_argument('--export', choices=('json', 'csv'), help='集計を標準出力へ書き出す')
+    args = parser.parse_args()
+
+    snap = empty_snapshot() if args.rebuild else load_snapshot(args.snapshot)
+    mark = snap['watermark']
+    added = update(snap, args.dir)
+    if args.rebuild or snap['watermark'] != mark:
+        save_snapshot(snap, args.snapshot)
+    print(f"final {added}件を追加集計（ウォーターマーク {snap['watermark'] or '-'}）", file=sys.stderr)
+
+    if args.export:
+        export(snap, args.export)
+    elif args.slots:
+        print_slots(snap, args.top)
+    else:
+        print_casters(snap, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+放送アーカイブの列形式エクスポート（NumPy。ダッシュボード・分析用）
+
+final レコード（weather_bot.history_final_record）の枠を1行にした列データを作る:
+
+  date     datetime64[D]  放送日
+  minute   int16          枠の開始（0時起点の分）
+  caster   int16          キャスター（casters の番号。-1 = 無人枠）
+  program  int16          番組名（programs の番号）
+  video    <U11           配信の動画ID（youtube の URL の末尾。無ければ ''）
+
+氏名・番組名は整数に置き換えて語彙（casters / programs）を別に持つので、日付 × 枠 ×
+キャスターの行列（誰がどの枠に出ているかのヒートマップ、ローテーション）が JSON を
+読み直さずに配列演算だけで作れる。
+
+保存先が .npz ならその1ファイル（無圧縮）、それ以外ならディレクトリに列ごとの .npy を
+置く（load(mmap=True) でメモリマップして読める）。caster_stats.py と同じく
+「最後に取り込んだレコードの ts（ウォーターマーク）」を持ち、次回は新しい final だけを足す。
+
+numpy は任意の依存（ボット本体は使わない）。無ければこのコマンドだけが使えない。
+
+使い方:
+  python src/export_columnar.py                        # 更新して概要を表示
+  python src/export_columnar.py --out columns/         # .npy のディレクトリに書く
+  python src/export_columnar.py --heatmap              # キャスター × 枠の出演回数（CSV）
+  python src/export_columnar.py --rebuild              # 作り直す
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from typing import Optional
+
+import history_segments
+
+try:
+    import numpy as np
+except ImportError:   # 任意の依存
+    np = None
+
+EXPORT_FILE = 'archive_columns.npz'
+EXPORT_VERSION = 1
+COLUMNS = ('date', 'minute', 'caster', 'program', 'video')
+_EPOCH_WEEKDAY = 3   # 1970-01-01 は木曜（月=0）
+
+
+def require_numpy() -> None:
+    if np is None:
+        sys.exit("numpy が必要です（pip install numpy）")
+
+
+def empty_columns() -> dict:
+    return {
+        'version': EXPORT_VERSION,
+        'watermark': '',
+        'casters': [],
+        'programs': [],
+        'date': np.zeros(0, dtype='datetime64[D]'),
+        'minute': np.zeros(0, dtype=np.int16),
+        'caster': np.zeros(0, dtype=np.int16),
+        'program': np.zeros(0, dtype=np.int16),
+        'video': np.zeros(0, dtype='<U11'),
+    }
+
+
+# ============================ 保存 / 読み込み ============================
+def _meta(cols: dict) -> dict:
+    return {k: cols[k] for k in ('version', 'watermark', 'casters', 'programs')}
+
+
+def save(cols: dict, path: str = EXPORT_FILE) -> None:
+    """列データを書く（.npz なら1ファイル、それ以外はディレクトリに列ごとの .npy）。"""
+    meta = json.dumps(_meta(cols), ensure_ascii=False)
+    if path.endswith('.npz'):
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, meta=np.array(meta), **{c: cols[c] for c in COLUMNS})
+        os.replace(tmp, path)
+        return
+    os.makedirs(path, exist_ok=True)
+    for c in COLUMNS:
+        np.save(os.path.join(path, f"{c}.npy"), cols[c])
+    # メタ情報は最後に置き換える（列を書いている途中で落ちても、前回のウォーターマークのまま）
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(meta)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def load(path: str = EXPORT_FILE, mmap: bool = False) -> dict:
+    """
+    列データを読む。無い・壊れている・版が違うなら空から。
+
+    Args:
+        mmap: ディレクトリ形式の時、列をメモリマップで読む（読み取り専用）
+    """
+    try:
+        if path.endswith('.npz'):
+            if os.path.exists(path):
+                with np.load(path) as z:
+                    meta = json.loads(str(z['meta']))
+                    cols = {c: z[c] for c in COLUMNS}
+                if meta.get('version') == EXPORT_VERSION:
+                    return {**meta, **cols}
+        elif os.path.exists(os.path.join(path, 'meta.json')):
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') == EXPORT_VERSION:
+                return {**meta, **{c: np.load(os.path.join(path, f"{c}.npy"),
+                                              mmap_mode='r' if mmap else None)
+                                   for c in COLUMNS}}
+    except Exception as e:
+        print(f"列データ読み込みエラー（作り直す）: {e}", file=sys.stderr)
+    return empty_columns()
+
+
+# ============================ 取り込み ============================
+def _code(vocab: list[str], index: dict, value: str) -> int:
+    if value not in index:
+        index[value] = len(vocab)
+        vocab.append(value)
+    return index[value]
+
+
+def update(cols: dict, directory: str = history_segments.HISTORY_DIR) -> int:
+    """
+    ウォーターマークより新しい final レコードを列に足す（取り込み済みの放送日は飛ばす）。
+
+    Returns:
+        足した final の件数
+    """
+    have = set(np.unique(cols['date']).astype(str))
+    finals, cols['watermark'] = history_segments.new_finals(cols['watermark'], have, directory)
+    caster_index = {name: i for i, name in enumerate(cols['casters'])}
+    program_index = {name: i for i, name in enumerate(cols['programs'])}
+    rows = {c: [] for c in COLUMNS}
+    for record in finals:
+        for s in record.get('slots') or []:
+            h, m = (s.get('time') or '0:0').split(':')
+            rows['date'].append(record['date'])
+            rows['minute'].append(int(h) * 60 + int(m))
+            rows['caster'].append(_code(cols['casters'], caster_index, s['caster'])
+                                  if s.get('caster') else -1)
+            rows['program'].append(_code(cols['programs'], program_index, s.get('program') or ''))
+            rows['video'].append((s.get('youtube') or '').rsplit('/', 1)[-1][-11:])
+    if finals:
+        new = {'date': np.array(rows['date'], dtype='datetime64[D]'),
+               'minute': np.array(rows['minute'], dtype=np.int16),
+               'caster': np.array(rows['caster'], dtype=np.int16),
+               'program': np.array(rows['program'], dtype=np.int16),
+               'video': np.array(rows['video'], dtype='<U11')}
+        for c in COLUMNS:
+            cols[c] = np.concatenate([cols[c], new[c]])
+        # 放送日・時刻順に並べ直す（閉じた月を後から足した場合も順序を保つ）
+        order = np.lexsort((cols['minute'], cols['date']))
+        for c in COLUMNS:
+            cols[c] = cols[c][order]
+    return len(finals)
+
+
+# ============================ 集計（配列演算） ============================
+def caster_counts(cols: dict) -> 'np.ndarray':
+    """キャスターごとの出演回数（casters の順）。"""
+    c = cols['caster']
+    return np.bincount(c[c >= 0], minlength=len(cols['casters']))
+
+
+def slot_minutes(cols: dict) -> 'np.ndarray':
+    """キャスターが出ている枠の開始（分）の一覧（昇順）。"""
+    return np.unique(cols['minute'][cols['caster'] >= 0])
+
+
+def caster_slot_counts(cols: dict) -> tuple['np.ndarray', 'np.ndarray']:
+    """
+    キャスター × 枠 の出演回数（ヒートマップの素）。
+
+    Returns:
+        (枠の開始（分）, 行列[キャスター番号, 枠])
+    """
+    mask = cols['caster'] >= 0
+    slots, slot_idx = np.unique(cols['minute'][mask], return_inverse=True)
+    flat = cols['caster'][mask].astype(np.int64) * len(slots) + slot_idx
+    counts = np.bincount(flat, minlength=len(cols['casters']) * len(slots))
+    return slots, counts.reshape(len(cols['casters']), len(slots))
+
+
+def weekday_counts(cols: dict) -> 'np.ndarray':
+    """キャスター × 曜日（月=0）の出演回数。"""
+    mask = cols['caster'] >= 0
+    weekday = (cols['date'][mask].astype(np.int64) + _EPOCH_WEEKDAY) % 7
+    flat = cols['caster'][mask].astype(np.int64) * 7 + weekday
+    return np.bincount(flat, minlength=len(cols['casters']) * 7).reshape(-1, 7)
+
+
+def date_slot_matrix(cols: dict) -> tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    放送日 × 枠 のキャスター番号の行列（ローテーションの表。出ていない所は -1）。
+
+    Returns:
+        (放送日, 枠の開始（分）, 行列[日, 枠])
+    """
+    mask = cols['caster'] >= 0
+    days, day_idx = np.unique(cols['date'][mask], return_inverse=True)
+    slots, slot_idx = np.unique(cols['minute'][mask], return_inverse=True)
+    matrix = np.full((len(days), len(slots)), -1, dtype=np.int16)
+    matrix[day_idx, slot_idx] = cols['caster'][mask]
+    return days, slots, matrix
+
+
+def appearance_gaps(cols: dict, caster: int) -> 'np.ndarray':
+    """あるキャスターの出演日の間隔（日数。同じ日に2枠出ても1日として数える）。"""
+    days = np.unique(cols['date'][cols['caster'] == caster])
+    return np.diff(days).astype(np.int64)
+
+
+def video_coverage(cols: dict) -> float:
+    """キャスター枠のうち配信リンクが付いている割合。"""
+    mask = cols['caster'] >= 0
+    return float((cols['video'][mask] != '').mean()) if mask.any() else 0.0
+
+
+# ============================ 出力 ============================
+def _hhmm(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def print_summary(cols: dict, top: Optional[int]) -> None:
+    days = np.unique(cols['date'])
+    span = f"{days[0]} 〜 {days[-1]}（{len(days)}日）" if len(days) else '-'
+    print(f"期間: {span}  行数: {len(cols['date'])}  キャスター: {len(cols['casters'])}"
+          f"  配信リンク: {video_coverage(cols):.0%}")
+    counts = caster_counts(cols)
+    for i in np.argsort(-counts, kind='stable')[:top or None]:
+        gaps = appearance_gaps(cols, int(i))
+        rotation = f"平均 {gaps.mean():.1f}日おき" if len(gaps) else '-'
+        print(f"{cols['casters'][i]:<10} {counts[i]:>4}回  {rotation}")
+
+
+def write_heatmap(cols: dict) -> None:
+    """キャスター × 枠の出演回数を CSV で標準出力へ。"""
+    slots, matrix = caster_slot_counts(cols)
+    w = csv.writer(sys.stdout)
+    w.writerow(['caster'] + [_hhmm(int(m)) for m in slots])
+    for i, name in enumerate(cols['casters']):
+        w.writerow([name] + matrix[i].tolist())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='放送アーカイブの列形式エクスポート')
+    parser.add_argument('--dir', default=history_segments.HISTORY_DIR, help='履歴セグメントのディレクトリ')
+    parser.add_argument('--out', default=EXPORT_FILE, help='保存先（.npz ならファイル、それ以外はディレクトリ）')
+    parser.add_argument('--rebuild', action='store_true', help='捨てて全履歴から作り直す')
+    parser.add_argument('--top', type=int, help='概要で上位N人だけ表示')
+    parser.add_argument('--heatmap', action='store_true', help='キャスター × 枠の出演回数を CSV で出す')
+    args = parser.parse_args()
+    require_numpy()
+
+    cols = empty_columns() if args.rebuild else load(args.out)
+    mark = cols['watermark']
+    added = update(cols, args.dir)
+    if args.rebuild or cols['watermark'] != mark:
+        save(cols, args.out)
+    print(f"final {added}件を追加（ウォーターマーク {cols['watermark'] or '-'}）", file=sys.stderr)
+
+    if args.heatmap:
+        write_heatmap(cols)
+    else:
+        print_summary(cols, args.top)
+
+
+if __name__ == '__main__':
+    main()
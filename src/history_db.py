@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+放送履歴（history/ の月別セグメント）の検索用インデックス（SQLite）
+
+履歴は追記専用で索引が無いので、「3月に○○さんが出た枠を全部」を知るには
+毎回全セグメントを読むことになる。ここでは履歴を SQLite に取り込み、日付・キャスター・
+番組・イベント種別で引けるようにする。
+
+  - 取り込みは差分だけ（セグメントごとに読んだバイト位置を覚えておき、続きから読む）
+  - セグメントが閉じられた（gzip になった）時は、その月だけ取り込み直す
+  - 検索の前に sync() で差分を取り込むので、いつも履歴どおり（ボット本体は DB に触らない。
+    Actions の実行は毎回 DB の無い所から始まるので、そこで作り直すと持ち時間を食う）
+  - DB は履歴から作り直せる派生物（git には載せない）
+
+使い方:
+  python src/history_db.py slots --caster 山岸愛梨 --from 2026-03-01 --to 2026-03-31
+  python src/history_db.py slots --program モーニング --from 2026-08-01
+  python src/history_db.py events --event change --from 2026-08-01
+  python src/history_db.py sync      # 取り込みだけ
+  python src/history_db.py rebuild   # 作り直し
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from typing import Optional
+
+import history_segments
+
+DB_FILE = 'history.sqlite'
+SCHEMA_VERSION = 2   # 変えたら既存の DB は作り直す（派生物なので捨ててよい）
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path   TEXT PRIMARY KEY,         -- セグメント名（'YYYY-MM'）
+    kind   TEXT NOT NULL,            -- hot / closed
+    offset INTEGER NOT NULL          -- ここまで取り込んだバイト位置（展開後）
+);
+CREATE TABLE IF NOT EXISTS events (
+    id     INTEGER PRIMARY KEY,
+    ts     TEXT NOT NULL,
+    date   TEXT NOT NULL,            -- 放送日(ISO)
+    event  TEXT NOT NULL,            -- announce / decision / change / decision+change / final
+    source TEXT NOT NULL,            -- 取り込み元セグメント
+    offset INTEGER NOT NULL,         -- 取り込み元での行頭バイト位置
+    record TEXT NOT NULL             -- 元の1行（JSON）
+);
+CREATE TABLE IF NOT EXISTS slots (
+    event_id   INTEGER NOT NULL REFERENCES events(id),
+    date       TEXT NOT NULL,
+    event      TEXT NOT NULL,
+    time       TEXT NOT NULL,
+    program    TEXT,                 -- final のみ（ツイート系履歴は番組名を持たない）
+    caster     TEXT,
+    caster_key TEXT,                 -- 空白を詰めた氏名（検索用）
+    youtube    TEXT
+);
+CREATE INDEX IF NOT EXISTS events_date ON events(date);
+CREATE INDEX IF NOT EXISTS events_event_date ON events(event, date);
+CREATE INDEX IF NOT EXISTS slots_caster ON slots(caster_key, date);
+CREATE INDEX IF NOT EXISTS slots_program ON slots(program, date);
+CREATE INDEX IF NOT EXISTS slots_date ON slots(date, time);
+"""
+
+
+def squash(s: Optional[str]) -> Optional[str]:
+    """全角/半角スペースを除去する（氏名の表記ゆれ吸収）。"""
+    return s.replace(' ', '').replace('　', '') if s else s
+
+
+def connect(db_path: str = DB_FILE) -> sqlite3.Connection:
+    """DB を開く（無ければスキーマごと作る。版が古ければ作り直す）。"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript('DROP TABLE IF EXISTS slots; DROP TABLE IF EXISTS events;'
+                           ' DROP TABLE IF EXISTS files;')
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _slot_rows(record: dict) -> list[tuple]:
+    """1レコードから slots 行 (time, program, caster, youtube) を作る。"""
+    if record.get('event') == 'final':
+        return [(s.get('time'), s.get('program'), s.get('caster'), s.get('youtube'))
+                for s in record.get('slots') or [] if s.get('time')]
+    return [(t, None, name, None) for t, name in (record.get('lineup') or {}).items()]
+
+
+def index_record(conn: sqlite3.Connection, record: dict, source: str, offset: int) -> None:
+    """1レコードを取り込む（コミットは呼び出し側）。"""
+    cur = conn.execute(
+        'INSERT INTO events (ts, date, event, source, offset, record) VALUES (?, ?, ?, ?, ?, ?)',
+        (record.get('ts', ''), record.get('date', ''), record.get('event', ''), source, offset,
+         json.dumps(record, ensure_ascii=False)))
+    conn.executemany(
+        'INSERT INTO slots (event_id, date, event, time, program, caster, caster_key, youtube)'
+        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(cur.lastrowid, record.get('date', ''), record.get('event', ''), t, prog, caster,
+          squash(caster), yt) for t, prog, caster, yt in _slot_rows(record)])
+
+
+def _forget_source(conn: sqlite3.Connection, source: str) -> None:
+    """取り込み元1セグメントぶんを消す（閉じられた・縮んだ＝作り直された時）。"""
+    conn.execute('DELETE FROM slots WHERE event_id IN (SELECT id FROM events WHERE source = ?)',
+                 (source,))
+    conn.execute('DELETE FROM events WHERE source = ?', (source,))
+    conn.execute('DELETE FROM files WHERE path = ?', (source,))
+
+
+def sync_segment(conn: sqlite3.Connection, month: str, path: str) -> int:
+    """
+    1セグメントの未取り込み分を取り込む。
+
+    Returns:
+        取り込んだレコード数
+    """
+    kind = 'closed' if path.endswith(history_segments.CLOSED_SUFFIX) else 'hot'
+    row = conn.execute('SELECT kind, offset FROM files WHERE path = ?', (month,)).fetchone()
+    offset = row['offset'] if row else 0
+    if row and (row['kind'] != kind or (kind == 'hot' and offset > os.path.getsize(path))):
+        _forget_source(conn, month)
+        offset = 0
+    added = 0
+    for pos, end, record in history_segments.iter_segment(path, start=offset):
+        index_record(conn, record, month, pos)
+        offset = end
+        added += 1
+    conn.execute('INSERT OR REPLACE INTO files (path, kind, offset) VALUES (?, ?, ?)',
+                 (month, kind, offset))
+    return added
+
+
+def sync(db_path: str = DB_FILE, directory: str = history_segments.HISTORY_DIR) -> int:
+    """履歴セグメントの未取り込み分を DB に取り込む。取り込んだレコード数を返す。"""
+    conn = connect(db_path)
+    try:
+        with conn:
+            return sum(sync_segment(conn, month, path)
+                       for month, path in history_segments.list_segments(directory))
+    finally:
+        conn.close()
+
+
+def rebuild(db_path: str = DB_FILE, directory: str = history_segments.HISTORY_DIR) -> int:
+    """DB を消して履歴から作り直す。"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    return sync(db_path, directory)
+
+
+# ============================ 検索 ============================
+def query_slots(conn: sqlite3.Connection, start: Optional[str] = None, end: Optional[str] = None,
+                caster: Optional[str] = None, program: Optional[str] = None,
+                event: str = 'final') -> list[dict]:
+    """
+    枠を検索する（既定は final＝実際の放送）。
+
+    Args:
+        start, end: 放送日の範囲（ISO、両端含む）
+        caster: 氏名（空白の有無は問わない）
+        program: 番組名（'モーニング' のように '・' より後ろだけでも可）
+        event: イベント種別（None なら全種別）
+
+    Returns:
+        [{date, time, program, caster, youtube, event}, ...]（日付・時刻順）
+    """
+    where, args = [], []
+    if event:
+        where.append('event = ?')
+        args.append(event)
+    if start:
+        where.append('date >= ?')
+        args.append(start)
+    if end:
+        where.append('date <= ?')
+        args.append(end)
+    if caster:
+        where.append('caster_key = ?')
+        args.append(squash(caster))
+    if program:
+        where.append('(program = ? OR program LIKE ?)')
+        args += [program, f'%・{program}']
+    sql = ('SELECT date, time, program, caster, youtube, event FROM slots'
+           + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY date, time')
+    return [dict(r) for r in conn.execute(sql, args)]
+
+
+def query_events(conn: sqlite3.Connection, start: Optional[str] = None, end: Optional[str] = None,
+                 event: Optional[str] = None) -> list[dict]:
+    """イベント（元レコードそのまま）を放送日・種別で検索する（記録順）。"""
+    where, args = [], []
+    if event:
+        where.append('event = ?')
+        args.append(event)
+    if start:
+        where.append('date >= ?')
+        args.append(start)
+    if end:
+        where.append('date <= ?')
+        args.append(end)
+    sql = ('SELECT record FROM events' + (' WHERE ' + ' AND '.join(where) if where else '')
+           + ' ORDER BY id')
+    return [json.loads(r['record']) for r in conn.execute(sql, args)]
+
+
+# ============================ CLI ============================
+def main() -> None:
+    parser = argparse.ArgumentParser(description='放送履歴の検索')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--dir', default=history_segments.HISTORY_DIR, help='履歴セグメントのディレクトリ')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('sync', help='未取り込み分を取り込む')
+    sub.add_parser('rebuild', help='作り直す')
+    p = sub.add_parser('slots', help='枠を検索')
+    p.add_argument('--from', dest='start')
+    p.add_argument('--to', dest='end')
+    p.add_argument('--caster')
+    p.add_argument('--program')
+    p.add_argument('--event', default='final', help="イベント種別（'all' で全種別）")
+    p = sub.add_parser('events', help='イベントを検索')
+    p.add_argument('--from', dest='start')
+    p.add_argument('--to', dest='end')
+    p.add_argument('--event')
+    args = parser.parse_args()
+
+    if args.cmd == 'rebuild':
+        print(f"{rebuild(args.db, args.dir)}件取り込み", file=sys.stderr)
+        return
+    added = sync(args.db, args.dir)
+    if args.cmd == 'sync':
+        print(f"{added}件取り込み", file=sys.stderr)
+        return
+    conn = connect(args.db)
+    try:
+        if args.cmd == 'slots':
+            rows = query_slots(conn, args.start, args.end, args.caster, args.program,
+                               None if args.event == 'all' else args.event)
+            for r in rows:
+                print(f"{r['date']} {r['time']} {r['program'] or '-'} {r['caster'] or '-'}"
+                      + (f" {r['youtube']}" if r['youtube'] else ''))
+        else:
+            for r in query_events(conn, args.start, args.end, args.event):
+                print(json.dumps(r, ensure_ascii=False))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
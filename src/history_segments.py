@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+放送履歴の月別セグメント
+
+履歴は毎回 git にコミットされるので、1本のファイルに追記し続けると clone/checkout が
+際限なく重くなる。そこで記録時刻(ts)の月ごとにファイルを分ける:
+
+  history/2026-08.jsonl      … 今月（追記先＝ホット。小さいまま）
+  history/2026-07.jsonl.gz   … 閉じた月（gzip。以後は変更しない＝git の差分も出ない）
+
+閉じる時、決定/変更レコードの lineup は同じ放送日の告知レコードとの差分
+（lineup_delta: {set: {時刻: 氏名}, del: [時刻]}）に置き換える。読み出し側
+（iter_records）が元の lineup に戻すので、利用側からは常に元のレコードに見える。
+"""
+import os
+import io
+import gzip
+import json
+from typing import Iterator, Optional
+
+HISTORY_DIR = 'history'
+HOT_SUFFIX = '.jsonl'
+CLOSED_SUFFIX = '.jsonl.gz'
+
+
+def segment_of(record: dict) -> str:
+    """レコードの入るセグメント名（記録時刻の年月 'YYYY-MM'。ts は JST の ISO 形式）。"""
+    return (record.get('ts') or '')[:7]
+
+
+def hot_path(month: str, directory: str = HISTORY_DIR) -> str:
+    return os.path.join(directory, month + HOT_SUFFIX)
+
+
+def closed_path(month: str, directory: str = HISTORY_DIR) -> str:
+    return os.path.join(directory, month + CLOSED_SUFFIX)
+
+
+def list_segments(directory: str = HISTORY_DIR) -> list[tuple[str, str]]:
+    """[(月, パス), ...] を古い順に返す。同じ月に両方あれば閉じた方を優先する。"""
+    if not os.path.isdir(directory):
+        return []
+    found = {}
+    for name in os.listdir(directory):
+        for suffix in (CLOSED_SUFFIX, HOT_SUFFIX):
+            if name.endswith(suffix):
+                month = name[:-len(suffix)]
+                if suffix == CLOSED_SUFFIX or month not in found:
+                    found[month] = os.path.join(directory, name)
+                break
+    return sorted(found.items())
+
+
+def open_segment(path: str):
+    """セグメントをバイナリで開く（閉じた月は gzip を透過的に展開）。"""
+    return gzip.open(path, 'rb') if path.endswith(CLOSED_SUFFIX) else open(path, 'rb')
+
+
+# ============================ 差分符号化 ============================
+def encode_deltas(records: list[dict]) -> list[dict]:
+    """決定/変更レコードの lineup を、同じセグメント内にある同日の告知との差分に置き換える。"""
+    announces = {}
+    out = []
+    for r in records:
+        if r.get('event') == 'announce' and isinstance(r.get('lineup'), dict):
+            announces[r.get('date')] = r['lineup']
+            out.append(r)
+            continue
+        base = announces.get(r.get('date'))
+        if base is None or not isinstance(r.get('lineup'), dict):
+            out.append(r)
+            continue
+        lineup = r['lineup']
+        delta = {'set': {t: v for t, v in lineup.items() if t not in base or base[t] != v},
+                 'del': [t for t in base if t not in lineup]}
+        out.append({('lineup_delta' if k == 'lineup' else k): (delta if k == 'lineup' else v)
+                    for k, v in r.items()})
+    return out
+
+
+def decode_delta(record: dict, announces: dict) -> dict:
+    """lineup_delta を元の lineup（時刻順）に戻す。差分でなければそのまま返す。"""
+    delta = record.get('lineup_delta')
+    if delta is None:
+        return record
+    lineup = dict(announces.get(record.get('date')) or {})
+    for t in delta.get('del', []):
+        lineup.pop(t, None)
+    lineup.update(delta.get('set', {}))
+    lineup = dict(sorted(lineup.items()))
+    return {('lineup' if k == 'lineup_delta' else k): (lineup if k == 'lineup_delta' else v)
+            for k, v in record.items()}
+
+
+# ============================ 読み出し ============================
+def iter_segment(path: str, start: int = 0) -> Iterator[tuple[int, int, dict]]:
+    """
+    1セグメントの (行頭, 行末の次, レコード) を順に返す（位置は展開後のバイトオフセット）。
+    差分レコードは元に戻して返す。書きかけの最終行・壊れた行は飛ばす。
+    start 以降だけ欲しい場合も、差分の基準になる告知を拾うため先頭から読む。
+    """
+    announces = {}
+    offset = 0
+    with open_segment(path) as f:
+        for raw in f:
+            pos = offset
+            offset += len(raw)
+            if not raw.endswith(b'\n'):
+                break
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('event') == 'announce' and isinstance(record.get('lineup'), dict):
+                announces[record.get('date')] = record['lineup']
+            if pos >= start:
+                yield pos, offset, decode_delta(record, announces)
+
+
+def iter_records(directory: str = HISTORY_DIR) -> Iterator[dict]:
+    """全セグメントのレコードを古い順に流し読みする。"""
+    for _, path in list_segments(directory):
+        for _, _, record in iter_segment(path):
+            yield record
+
+
+def new_finals(mark: str, seen: set, directory: str = HISTORY_DIR) -> tuple[list[dict], str]:
+    """
+    ウォーターマーク mark（レコードの ts）より新しい final レコードを集める。
+    ウォーターマークより前の月のセグメントは開かない。
+
+    同じ放送日の final が重なったら（再実行など）最初の1件だけを採る。final から作る
+    集計・書き出し（caster_stats / export_columnar / archive_site）はみなこれを通すので、
+    どれも同じ final を見る。
+
+    Args:
+        seen: 取り込み済みの放送日（その場で足す）
+
+    Returns:
+        (final レコードのリスト（記録順）, 新しいウォーターマーク)
+    """
+    finals = []
+    watermark = mark
+    for month, path in list_segments(directory):
+        if mark and month < mark[:7]:
+            continue
+        for _, _, record in iter_segment(path):
+            ts = record.get('ts') or ''
+            if ts <= mark:
+                continue
+            watermark = max(watermark, ts)
+            day = record.get('date')
+            if record.get('event') == 'final' and day and day not in seen:
+                seen.add(day)
+                finals.append(record)
+    return finals, watermark
+
+
+# ============================ 書き込み ============================
+def _dumps(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def close_segment(month: str, directory: str = HISTORY_DIR, delta: bool = True) -> Optional[str]:
+    """
+    ホットなセグメントを閉じる（差分符号化して gzip に置き換える）。
+
+    gzip はヘッダの時刻を0にして、中身が同じなら同じバイト列になるようにする
+    （git に無駄な差分を出さないため）。一時ファイルに書いてから rename するので、
+    途中で落ちても元のファイルは残る。
+
+    Returns:
+        閉じたセグメントのパス（ホットが無ければ None）
+    """
+    src = hot_path(month, directory)
+    if not os.path.exists(src):
+        return None
+    dst = closed_path(month, directory)
+    # 既に閉じた同じ月がある（後から足された）なら、その後ろに続ける
+    records = [r for _, _, r in iter_segment(dst)] if os.path.exists(dst) else []
+    records += [r for _, _, r in iter_segment(src)]
+    if delta:
+        records = encode_deltas(records)
+    buf = io.BytesIO()
+    with gzip.GzipFile(filename='', mode='wb', fileobj=buf, mtime=0) as gz:
+        for r in records:
+            gz.write(_dumps(r).encode('utf-8'))
+    tmp = dst + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, dst)
+    os.remove(src)
+    return dst
+
+
+def append(record: dict, directory: str = HISTORY_DIR, delta: bool = True) -> str:
+    """
+    レコードを今月のセグメントに追記する。前月以前のホットが残っていれば先に閉じる。
+
+    Returns:
+        追記先のパス
+    """
+    os.makedirs(directory, exist_ok=True)
+    month = segment_of(record)
+    for m, path in list_segments(directory):
+        if m < month and path.endswith(HOT_SUFFIX):
+            close_segment(m, directory, delta)
+    path = hot_path(month, directory)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(_dumps(record))
+    return path
+
+
+def migrate_legacy(legacy_file: str, directory: str = HISTORY_DIR, delta: bool = True) -> int:
+    """
+    1本の history.jsonl を月別セグメントに分けて消す（最新月以外は閉じる）。
+    既にあるセグメントには後ろに足す（レコードは失わない）。
+
+    Returns:
+        移したレコード数
+    """
+    if not os.path.exists(legacy_file):
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    by_month = {}
+    for _, _, record in iter_segment(legacy_file):
+        by_month.setdefault(segment_of(record), []).append(record)
+    for month, records in sorted(by_month.items()):
+        with open(hot_path(month, directory), 'a', encoding='utf-8') as f:
+            f.writelines(_dumps(r) for r in records)
+    months = sorted(by_month)
+    for month in months[:-1]:
+        close_segment(month, directory, delta)
+    os.remove(legacy_file)
+    return sum(len(v) for v in by_month.values())
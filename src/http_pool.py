@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+上流ページ取得用の HTTP クライアント（ホストごとの keep-alive プール、gzip/deflate 展開）
+
+urllib.request.urlopen は呼ぶたびに接続（TLS ハンドシェイク）を作り直し、圧縮も
+要求しない。YouTube の live / streams は同じホストで、しかも数MBの HTML なので、
+  - ホストごとに接続を持ち回す（使い終わった接続はプールに戻し、次の取得で再利用）
+  - Accept-Encoding: gzip, deflate を付け、受け取りながら展開する
+ようにする。先読みスレッドから同時に使えるよう、プールの出し入れはロックで守る。
+
+本文は Response.read(n) で少しずつ読める（途中で読むのをやめたら、その接続は
+プールに戻さずに閉じる）。4xx/5xx は urllib.error.HTTPError を投げるので、
+呼び出し側のエラー判定（ステータスの取り出し・リトライ可否）はそのまま使える。
+リダイレクト（301/302/303/307/308）は urlopen と同じく MAX_REDIRECTS 回まで辿り、
+それ以外の 3xx と辿りきれないリダイレクトも HTTPError にする（転送ページの本文を
+取得結果として返さない）。304 は例外にせず Response.status で返す。
+投稿先（Mastodon / Bluesky / webhook）への POST も同じプールを通す（post）。
+"""
+import ssl
+import zlib
+import threading
+import http.client
+import urllib.error
+from urllib.parse import urljoin, urlsplit
+from typing import Optional
+
+MAX_IDLE_PER_HOST = 4   # 先読みは同じホストに最大2本なので余裕を持たせた程度
+ACCEPT_ENCODING = 'gzip, deflate'
+READ_CHUNK = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class Response:
+    """
+    1回の応答。read() は展開後のバイト列を返す。with で使い、抜ける時に接続を返す。
+
+    Attributes:
+        status: HTTP ステータス
+        headers: 応答ヘッダ（.get で引ける）
+        wire_bytes: 実際に受信したバイト数（圧縮されたまま）
+    """
+
+    def __init__(self, pool: 'Pool', key: tuple, conn: http.client.HTTPConnection,
+                 resp: http.client.HTTPResponse):
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+        self.wire_bytes = 0
+        self._pool, self._key, self._conn, self._resp = pool, key, conn, resp
+        encoding = (resp.headers.get('Content-Encoding') or '').strip().lower()
+        # wbits=32+MAX_WBITS で gzip / zlib のどちらのヘッダも自動判別する
+        self._decoder = zlib.decompressobj(32 + zlib.MAX_WBITS) \
+            if encoding in ('gzip', 'x-gzip', 'deflate') else None
+        self._eof = False
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        """
+        展開後の本文を読む。amt を渡すと受信 amt バイトぶんずつ（展開後は増えうる）。
+        読み終わりは b''。
+        """
+        out = []
+        while not self._eof:
+            data = self._resp.read(amt) if amt else self._resp.read()
+            self.wire_bytes += len(data)
+            if not data:
+                self._eof = True
+            if self._decoder is None:
+                out.append(data)
+            else:
+                try:
+                    out.append(self._decoder.decompress(data) if data else self._decoder.flush())
+                except zlib.error as e:
+                    raise ValueError(f"本文の展開に失敗: {e}") from e
+            if amt is None:
+                continue
+            if out[-1]:
+                break
+        return b''.join(out)
+
+    def close(self) -> None:
+        """読み切っていれば接続をプールに返し、途中でやめたなら閉じる。"""
+        if self._conn is None:
+            return
+        reusable = self._eof and not self._resp.will_close
+        if not reusable:
+            self._resp.close()
+        self._pool._release(self._key, self._conn, reusable)
+        self._conn = None
+
+    def __enter__(self) -> 'Response':
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+
+class Pool:
+    """ホスト（スキーム・ホスト・ポート）ごとに空き接続を持ち回すプール。"""
+
+    def __init__(self, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple, list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+
+    def _new(self, key: tuple, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key: tuple, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        """空き接続を出す（無ければ作る）。(接続, 再利用か) を返す。"""
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return self._new(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, key: tuple, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def request(self, method: str, url: str, headers: Optional[dict] = None,
+                body: Optional[bytes] = None, timeout: float = 30) -> Response:
+        """
+        リクエストを送り、応答ヘッダまで受け取った Response を返す（本文は read で）。
+
+        リダイレクトは Location（元の URL 基準で解決）を MAX_REDIRECTS 回まで辿る。
+        303 と、POST への 301/302 は urlopen と同じく本文なしの GET に替える。
+
+        Raises:
+            urllib.error.HTTPError: 4xx / 5xx、304 以外で辿れない 3xx（本文は読み捨てて接続は返す）
+        """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            r = self._send(method, url, headers, body, timeout)
+            if r.status == 304 or not 300 <= r.status < 400:
+                break
+            location = r.headers.get('Location')
+            with r:
+                r.read()
+            if r.status not in REDIRECT_STATUSES or not location:
+                raise urllib.error.HTTPError(url, r.status, r.reason, r.headers, None)
+            target = urljoin(url, location)
+            if urlsplit(target).netloc != urlsplit(url).netloc:
+                # 投稿先のトークンを別のホストへ持ち出さない
+                headers = {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+            url = target
+            if r.status == 303 or (r.status in (301, 302) and method == 'POST'):
+                method, body = 'GET', None
+                headers = {k: v for k, v in headers.items()
+                           if k.lower() not in ('content-type', 'content-length')}
+        else:
+            raise urllib.error.HTTPError(url, r.status, f"リダイレクトが{MAX_REDIRECTS}回を超えた",
+                                         r.headers, None)
+        if r.status >= 400:
+            with r:
+                r.read()
+            raise urllib.error.HTTPError(url, r.status, r.reason, r.headers, None)
+        return r
+
+    def _send(self, method: str, url: str, headers: dict, body: Optional[bytes],
+              timeout: float) -> Response:
+        """
+        1回送って応答ヘッダまで受け取る（ステータスは見ない）。
+        再利用した接続が相手側で切られていた場合は、新しい接続で1回だけ送り直す。
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'https'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        headers = {'Accept-Encoding': ACCEPT_ENCODING, **headers}
+        conn, reused = self._acquire(key, timeout)
+        while True:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # 寝ている間に相手が切っていた接続。新しく張って1回だけ送り直す
+                conn, reused = self._new(key, timeout), False
+            except BaseException:
+                conn.close()
+                raise
+        return Response(self, key, conn, resp)
+
+    def close(self) -> None:
+        """空き接続を全部閉じる。"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_POOL = Pool()
+
+
+def get(url: str, headers: Optional[dict] = None, timeout: float = 30) -> Response:
+    """共有プールで GET する。"""
+    return _POOL.request('GET', url, headers, timeout=timeout)
+
+
+def post(url: str, body: bytes, headers: Optional[dict] = None, timeout: float = 30) -> Response:
+    """共有プールで POST する（投稿先の API・webhook 用）。"""
+    return _POOL.request('POST', url, headers, body, timeout)
+
+
+def close() -> None:
+    """共有プールの空き接続を閉じる。"""
+    _POOL.close()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+投稿先（X 以外の配信先を含む）と、投稿先ごとの本文の整形
+
+告知・決定/変更の本文（build_announce_tweet / build_change_tweet が X の上限で
+組んだもの）を、設定された投稿先すべてに出す。投稿先ごとに
+  - 文字数の上限と数え方（X は重み付き280、Mastodon は500字、Bluesky は300字）
+  - 1回の HTTP のタイムアウト
+を持ち、上限を超える件は行の切れ目で分けてスレッド（返信の連なり）にする。
+並列に出すのは weather_bot.publish で、X を主（結果で成否と固定ポストを決める）、
+それ以外を副（失敗しても照合は成功扱い、ログと計測に残す）とする。
+
+設定（環境変数。空なら使わない）:
+  MASTODON_BASE_URL + MASTODON_ACCESS_TOKEN   … Mastodon（MASTODON_VISIBILITY 既定 public）
+  BLUESKY_HANDLE + BLUESKY_APP_PASSWORD       … Bluesky（BLUESKY_SERVICE 既定 https://bsky.social）
+  WEBHOOK_URLS                                … webhook（カンマ区切り。Slack/Discord 互換の JSON）
+
+どの投稿先も URL を環境変数で替えられるので、手元の代役 HTTP サーバーに向けて試せる。
+"""
+import os
+import re
+import json
+import hashlib
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from typing import Callable, Optional
+
+import http_pool
+
+SINK_TIMEOUT_SEC = 15   # 副の投稿先の1リクエストの上限（X 側の持ち時間を食わないよう短め）
+# 副の投稿先を有効にする環境変数（simulate.py の代役はこれを外して本物に出さないようにする）
+SINK_ENV_VARS = ('MASTODON_BASE_URL', 'MASTODON_ACCESS_TOKEN', 'MASTODON_VISIBILITY',
+                 'BLUESKY_HANDLE', 'BLUESKY_APP_PASSWORD', 'BLUESKY_SERVICE', 'WEBHOOK_URLS')
+
+
+class PublishError(Exception):
+    """投稿先への投稿に失敗した。"""
+
+
+# ============================ 整形 ============================
+def fit(texts: list[str], limit: int, length: Callable[[str], int] = len) -> list[str]:
+    """
+    各件を上限に収める。超える件は行の切れ目で分ける（1行で超えるなら文字で切る）。
+    収まっている件はそのまま（X 向けに組んだ本文は、たいていどの投稿先にも収まる）。
+    """
+    out = []
+    for text in texts:
+        if length(text) <= limit:
+            out.append(text)
+            continue
+        part = ''
+        for line in text.split('\n'):
+            while length(line) > limit:   # 1行で上限を超える（まず無い）
+                n = limit
+                while length(line[:n]) > limit:
+                    n -= 1
+                if part:
+                    out.append(part)
+                    part = ''
+                out.append(line[:n])
+                line = line[n:]
+            joined = f"{part}\n{line}" if part else line
+            if part and length(joined) > limit:
+                out.append(part)
+                joined = line
+            part = joined
+        if part.strip():
+            out.append(part)
+    return out
+
+
+# ============================ 投稿先 ============================
+class Sink:
+    """
+    投稿先1つ。post は整形済みの本文を順に（2件目以降は返信で）出し、先頭の ID を返す。
+    失敗は PublishError などの例外で知らせる。
+    """
+    name = 'sink'
+    limit = 500
+    primary = False
+
+    def __init__(self, timeout: float = SINK_TIMEOUT_SEC):
+        self.timeout = timeout
+
+    def length(self, text: str) -> int:
+        return len(text)
+
+    def render(self, texts: list[str]) -> list[str]:
+        return fit(texts, self.limit, self.length)
+
+    def post(self, texts: list[str], meta: dict) -> str:
+        """
+        Args:
+            texts: render 済みの本文
+            meta: {'kind': 'announce'|'change', 'date': 放送日ISO, 'key': 冪等キー}
+        """
+        raise NotImplementedError
+
+
+class FunctionSink(Sink):
+    """関数で出す投稿先（X。weather_bot.post_thread を包む）。関数が None を返したら失敗。"""
+
+    def __init__(self, name: str, func: Callable[[list[str]], Optional[str]], limit: int,
+                 length: Callable[[str], int] = len, primary: bool = False):
+        super().__init__()
+        self.name, self.func, self.limit, self.primary = name, func, limit, primary
+        self._length = length
+
+    def length(self, text: str) -> int:
+        return self._length(text)
+
+    def post(self, texts: list[str], meta: dict) -> str:
+        post_id = self.func(texts)
+        if not post_id:
+            raise PublishError(f"{self.name}: 投稿できず")
+        return post_id
+
+
+def _post_json(url: str, payload: dict, timeout: float, headers: Optional[dict] = None) -> dict:
+    """JSON を POST して応答の JSON を返す（本文が空なら {}）。4xx/5xx は HTTPError。"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    h = {'Content-Type': 'application/json; charset=utf-8', 'Accept': 'application/json'}
+    h.update(headers or {})
+    with http_pool.post(url, body, h, timeout=timeout) as resp:
+        raw = resp.read()
+    return json.loads(raw) if raw.strip() else {}
+
+
+class MastodonSink(Sink):
+    """Mastodon（POST /api/v1/statuses）。Idempotency-Key を付けるので送り直しても二重にならない。"""
+    name = 'mastodon'
+    limit = 500
+
+    def __init__(self, base_url: str, token: str, visibility: str = 'public',
+                 timeout: float = SINK_TIMEOUT_SEC):
+        super().__init__(timeout)
+        self.base_url, self.token, self.visibility = base_url.rstrip('/'), token, visibility
+
+    def post(self, texts: list[str], meta: dict) -> str:
+        head_id = prev_id = None
+        for i, text in enumerate(texts):
+            payload = {'status': text, 'visibility': self.visibility}
+            if prev_id:
+                payload['in_reply_to_id'] = prev_id
+            got = _post_json(f"{self.base_url}/api/v1/statuses", payload, self.timeout,
+                             {'Authorization': f"Bearer {self.token}",
+                              'Idempotency-Key': f"{meta['key']}/{i}"})
+            if not got.get('id'):
+                raise PublishError(f"mastodon: 応答に id が無い（{i + 1}件目）")
+            prev_id = str(got['id'])
+            head_id = head_id or prev_id
+        return head_id
+
+
+_HASHTAG_RE = re.compile(r'(?<!\S)#(\S+)')
+
+
+class BlueskySink(Sink):
+    """
+    Bluesky（AT Protocol の com.atproto.repo.createRecord）。セッションは使い回し、
+    期限切れ（400/401）なら1回だけ取り直す。ハッシュタグは facet を付けてタグにする。
+    上限は書記素300だが、ここではコードポイントで数える（絵文字の結合は使っていない）。
+    """
+    name = 'bluesky'
+    limit = 300
+
+    def __init__(self, handle: str, app_password: str, service: str = 'https://bsky.social',
+                 timeout: float = SINK_TIMEOUT_SEC):
+        super().__init__(timeout)
+        self.handle, self.app_password, self.service = handle, app_password, service.rstrip('/')
+        self._session: Optional[dict] = None
+
+    def _xrpc(self, method: str, payload: dict, auth: bool = True) -> dict:
+        headers = {'Authorization': f"Bearer {self._session['accessJwt']}"} if auth else None
+        return _post_json(f"{self.service}/xrpc/{method}", payload, self.timeout, headers)
+
+    def _login(self) -> None:
+        self._session = self._xrpc('com.atproto.server.createSession',
+                                   {'identifier': self.handle, 'password': self.app_password},
+                                   auth=False)
+
+    @staticmethod
+    def facets(text: str) -> list[dict]:
+        """ハッシュタグの facet（位置は UTF-8 のバイトオフセット）。"""
+        out = []
+        for m in _HASHTAG_RE.finditer(text):
+            start = len(text[:m.start()].encode('utf-8'))
+            out.append({'index': {'byteStart': start,
+                                  'byteEnd': start + len(m.group(0).encode('utf-8'))},
+                        'features': [{'$type': 'app.bsky.richtext.facet#tag', 'tag': m.group(1)}]})
+        return out
+
+    def _create(self, record: dict) -> dict:
+        payload = {'repo': self._session['did'], 'collection': 'app.bsky.feed.post',
+                   'record': record}
+        try:
+            return self._xrpc('com.atproto.repo.createRecord', payload)
+        except Exception as e:
+            if getattr(e, 'code', None) not in (400, 401):
+                raise
+            self._login()   # アクセストークンの期限切れ。取り直して1回だけ送り直す
+            payload['repo'] = self._session['did']
+            return self._xrpc('com.atproto.repo.createRecord', payload)
+
+    def post(self, texts: list[str], meta: dict) -> str:
+        if self._session is None:
+            self._login()
+        root = parent = None
+        for text in texts:
+            record = {'$type': 'app.bsky.feed.post', 'text': text,
+                      'createdAt': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+                      'langs': ['ja']}
+            tags = self.facets(text)
+            if tags:
+                record['facets'] = tags
+            if parent:
+                record['reply'] = {'root': root, 'parent': parent}
+            got = self._create(record)
+            if not got.get('uri'):
+                raise PublishError("bluesky: 応答に uri が無い")
+            parent = {'uri': got['uri'], 'cid': got.get('cid')}
+            root = root or parent
+        return root['uri']
+
+
+class WebhookSink(Sink):
+    """
+    webhook（Slack の text / Discord の content の両方を入れた JSON）。スレッドは無いので
+    全件を1通にまとめ、上限（Discord の2000字）を超える時だけ分けて送る。
+    """
+    name = 'webhook'
+    limit = 2000
+
+    def __init__(self, url: str, timeout: float = SINK_TIMEOUT_SEC):
+        super().__init__(timeout)
+        self.url = url
+        # 同じホストに複数の URL があっても別の投稿先として扱う（送信待ちの sinks・結果の突き合わせに
+        # 使う名前なので、設定の並び順が変わっても同じ URL なら同じ名前になるよう URL のハッシュで）
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:8]
+        self.name = f"webhook:{urlsplit(url).hostname}#{digest}"
+
+    def render(self, texts: list[str]) -> list[str]:
+        return fit(["\n\n".join(texts)], self.limit, self.length)
+
+    def post(self, texts: list[str], meta: dict) -> str:
+        for text in texts:
+            _post_json(self.url, {'text': text, 'content': text, 'kind': meta['kind'],
+                                  'date': meta['date'], 'key': meta['key']}, self.timeout)
+        return meta['key']
+
+
+def configured_sinks(env=os.environ) -> list[Sink]:
+    """環境変数で設定された副の投稿先（X 以外）。"""
+    sinks: list[Sink] = []
+    if env.get('MASTODON_BASE_URL') and env.get('MASTODON_ACCESS_TOKEN'):
+        sinks.append(MastodonSink(env['MASTODON_BASE_URL'], env['MASTODON_ACCESS_TOKEN'],
+                                  env.get('MASTODON_VISIBILITY') or 'public'))
+    if env.get('BLUESKY_HANDLE') and env.get('BLUESKY_APP_PASSWORD'):
+        sinks.append(BlueskySink(env['BLUESKY_HANDLE'], env['BLUESKY_APP_PASSWORD'],
+                                 env.get('BLUESKY_SERVICE') or 'https://bsky.social'))
+    for url in (env.get('WEBHOOK_URLS') or '').split(','):
+        if url.strip():
+            sinks.append(WebhookSink(url.strip()))
+    return sinks
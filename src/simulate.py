@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+照合処理（reconcile）のタイムトラベル・シミュレータ
+
+番組表のスナップショット列を時刻つきで再生し、reconcile() を同じプロセスの中で
+何百回も回す。HTTP と X は手元の代役に差し替え、状態は作業ディレクトリ（既定は一時
+ディレクトリ）に置くので、本番の状態・キャッシュには触らない。数か月ぶんの毎時実行が
+数秒で終わり、出たツイートと履歴を残す＝変更が実際の流れでどう振る舞うかを事前に見られる。
+
+スナップショットの入手元:
+  --snapshots DIR   記録したスナップショット。DIR/<YYYYMMDDTHHMM>/ に上流ページ
+                    （timetable.json / timetable.html / youtube_live.html / youtube_streams.html）。
+                    欠けたページは直前のスナップショットのものを使う。
+                    本番で環境変数 SNAPSHOT_DIR を指定しておくと、この形で貯まる。
+  --from-history    履歴（history/）から番組表の移り変わりを組み立てる。
+                    各時刻の番組表は「その時点までに記録された告知/決定/変更」の内容、
+                    配信一覧は final の配信リンクから作る（検知時刻は本番の問い合わせ間隔に依る
+                    ので、履歴と完全には一致しない）。
+
+使い方:
+  python src/simulate.py --from-history --start 2026-06-01 --end 2026-08-31
+  python src/simulate.py --from-history --adaptive               # 常駐モードの間隔で回す
+  python src/simulate.py --snapshots snapshots/ --every 30 --out sim_out
+  python src/simulate.py --from-history --post-failure-rate 0.3  # 投稿を3割失敗させる
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import random
+import bisect
+import shutil
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import urllib.error
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+import weather_bot as wb
+import history_segments
+
+SLOT_LENGTH_MIN = 180   # 配信一覧に載るまでの目安（キャスター枠は3時間）
+
+PagesAt = Callable[[datetime], Optional[dict]]   # 時刻 → {URL: 本文(bytes)}（無ければ None）
+
+
+# ============================ 記録したスナップショット ============================
+def load_snapshot_dir(directory: str) -> list[tuple[datetime, dict]]:
+    """
+    DIR/<YYYYMMDDTHHMM>/ を時刻順に読む。欠けたページは直前のものを引き継ぐ。
+
+    Returns:
+        [(時刻, {URL: 本文}), ...]（timetable.json がそろった時点から）
+    """
+    snapshots, pages = [], {}
+    for name in sorted(os.listdir(directory)):
+        try:
+            ts = datetime.strptime(name, wb.SNAPSHOT_TS_FORMAT).replace(tzinfo=wb.JST)
+        except ValueError:
+            continue
+        for url, fname in wb.SNAPSHOT_FILES.items():
+            path = os.path.join(directory, name, fname)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    pages[url] = f.read()
+        if wb.TIMETABLE_JSON_URL in pages:
+            snapshots.append((ts, dict(pages)))
+    return snapshots
+
+
+def recorded_source(directory: str) -> tuple[list[datetime], PagesAt]:
+    """
+    記録したスナップショットを「その時刻に見えていたページ」として返す。
+
+    Returns:
+        (記録時刻の一覧, 時刻 → ページ)
+    """
+    snapshots = load_snapshot_dir(directory)
+    if not snapshots:
+        raise ValueError(f"スナップショットがありません: {directory}")
+    times = [ts for ts, _ in snapshots]
+
+    def pages_at(now: datetime) -> Optional[dict]:
+        i = bisect.bisect_right(times, now)
+        return snapshots[i - 1][1] if i else None
+
+    return times, pages_at
+
+
+# ============================ 履歴から組み立てる ============================
+def caster_codes(names) -> tuple[dict, str]:
+    """
+    氏名 → キャスターコード と、それを解決できる timetable.html 相当のページを作る。
+    既知の氏名はフォールバック辞書のコード、未知の氏名は詰めた氏名をコードにする。
+    """
+    known = {wb._squash(v): k for k, v in wb.FALLBACK_CASTER_KANJI.items()}
+    kanji = dict(wb.FALLBACK_CASTER_KANJI)
+    codes = {}
+    for name in names:
+        code = known.get(wb._squash(name)) or wb._squash(name)
+        codes[name] = code
+        kanji.setdefault(code, name)
+
+    def js(func: str, table: dict) -> str:
+        body = ''.join(f' if(x == "{k}"){{ ret_name = "{v}"; }}\n' for k, v in table.items())
+        return f'function {func}(x){{\n var ret_name = x;\n{body} return ret_name;\n}}\n'
+
+    html = ('<html><body><script>\n' + js('caster_trans', wb.FALLBACK_CASTER_TRANS)
+            + js('caster_kanji', kanji) + '</script></body></html>')
+    return codes, html
+
+
+def day_order(t: str) -> int:
+    """放送日内の並び（05:00 始まり、翌0〜4時台は末尾）。"""
+    return (wb.slot_minutes(t) - wb.DAY_START_HOUR * 60) % (24 * 60)
+
+
+def history_source(directory: str) -> tuple[datetime, datetime, PagesAt]:
+    """
+    履歴から各時刻の上流ページを組み立てる。
+
+    放送日 D の出演者は、その時刻までに記録された D の告知/決定/変更/final のうち最新のもの。
+    まだ何も記録されていなくても、前日21時（告知時刻）を過ぎていれば最初の記録
+    （＝告知の元になった番組表）を見せる。番組名と無人枠は final から取る。
+    """
+    lineups: dict[str, list[tuple[datetime, dict]]] = {}
+    programs: dict[str, dict] = {}
+    videos: dict[tuple[str, str], str] = {}
+    names = set()
+    for r in history_segments.iter_records(directory):
+        try:
+            ts = datetime.fromisoformat(r['ts']).astimezone(wb.JST)
+        except (KeyError, ValueError):
+            continue
+        day = r.get('date')
+        if r.get('event') == 'final':
+            lineup = {s['time']: s.get('caster') for s in r.get('slots') or []
+                      if wb.is_caster_program(s.get('program') or '')}
+            programs[day] = {s['time']: s.get('program') or '' for s in r.get('slots') or []}
+            for s in r.get('slots') or []:
+                m = re.search(r'([A-Za-z0-9_-]{11})$', s.get('youtube') or '')
+                if m:
+                    videos[(day, s['time'])] = m.group(1)
+        elif isinstance(r.get('lineup'), dict):
+            lineup = r['lineup']
+        else:
+            continue
+        names.update(n for n in lineup.values() if n)
+        lineups.setdefault(day, []).append((ts, lineup))
+    if not lineups:
+        raise ValueError(f"履歴がありません: {directory}")
+    for v in lineups.values():
+        v.sort(key=lambda x: x[0])
+    codes, caster_html = caster_codes(names)
+    first = min(v[0][0] for v in lineups.values())
+    last = max(v[-1][0] for v in lineups.values())
+
+    def lineup_at(day: date, now: datetime) -> dict:
+        seen = lineups.get(day.isoformat())
+        if not seen:
+            return {}
+        i = bisect.bisect_right([ts for ts, _ in seen], now)
+        if i:
+            return seen[i - 1][1]
+        announce_at = datetime.combine(day - timedelta(days=1), datetime.min.time(), wb.JST) \
+            + timedelta(hours=wb.ANNOUNCE_HOUR)
+        return seen[0][1] if now >= announce_at else {}
+
+    def slots_of(day: date) -> dict:
+        progs = dict(wb.STANDARD_SLOTS)
+        progs.update(programs.get(day.isoformat(), {}))
+        return progs
+
+    def timetable(now: datetime) -> list[dict]:
+        tb = wb.today_bday(now)
+        entries = []
+        for day in (tb, tb + timedelta(days=1)):
+            lineup = lineup_at(day, now)
+            for t, program in sorted(slots_of(day).items(), key=lambda kv: day_order(kv[0])):
+                if day == tb and t == '05:00':
+                    continue   # 05:00 は翌放送日への繰り上げの合図（進行中の日には付けない）
+                name = lineup.get(t) if wb.is_caster_program(program) else None
+                entries.append({'hour': t, 'title': program, 'caster': codes.get(name, '') if name else ''})
+        return entries
+
+    def title(day: date, program: str, name: str, status: str) -> str:
+        return (f"【{status}】最新天気ニュース・地震情報 {day.year}年{day.month}月{day.day}日"
+                f"／〈ウェザーニュースLiVE{wb.program_suffix(program)}・{wb._squash(name)}／解説〉")
+
+    def video(day: date, t: str) -> str:
+        return videos.get((day.isoformat(), t)) \
+            or hashlib.sha256(f"{day}{t}".encode()).hexdigest()[:11]
+
+    def youtube(now: datetime) -> tuple[str, str]:
+        tb = wb.today_bday(now)
+        nodes, live = [], '<html><head><title>ウェザーニュース</title></head></html>'
+        for back in range(3):
+            day = tb - timedelta(days=back)
+            start = datetime.combine(day, datetime.min.time(), wb.JST)
+            lineup = lineup_at(day, now)
+            for t, program in sorted(slots_of(day).items(), key=lambda kv: -day_order(kv[0])):
+                name = lineup.get(t)
+                if not name or not wb.is_caster_program(program):
+                    continue
+                begin = start + timedelta(minutes=day_order(t) + wb.DAY_START_HOUR * 60)
+                if begin + timedelta(minutes=SLOT_LENGTH_MIN) <= now:
+                    nodes.append('{"videoRenderer":{"videoId":"%s","title":{"runs":[{"text":"%s"}]}}},'
+                                 % (video(day, t), title(day, program, name, 'ライブ配信終了')))
+                elif begin <= now:
+                    live = (f'<html><head><title>{title(day, program, name, "LIVE")}</title>'
+                            f'<link rel="canonical" href="https://www.youtube.com/watch?v='
+                            f'{video(day, t)}"></head></html>')
+        streams = ('<html><body><script>var ytInitialData = {"contents":['
+                   + ''.join(nodes) + ']};</script></body></html>')
+        return live, streams
+
+    def pages_at(now: datetime) -> Optional[dict]:
+        live, streams = youtube(now)
+        return {
+            wb.TIMETABLE_JSON_URL: json.dumps(timetable(now), ensure_ascii=False).encode('utf-8'),
+            wb.TIMETABLE_HTML_URL: caster_html.encode('utf-8'),
+            wb.YOUTUBE_LIVE_URL: live.encode('utf-8'),
+            wb.YOUTUBE_STREAMS_URL: streams.encode('utf-8'),
+        }
+
+    return first, last, pages_at
+
+
+# ============================ 代役（HTTP・X） ============================
+class FakeResponse:
+    """http_pool.Response の代役（本文をそのまま少しずつ返す）。"""
+
+    def __init__(self, status: int, body: bytes, etag: str):
+        self.status = status
+        self.headers = {'ETag': etag}
+        self.wire_bytes = 0
+        self._body = body
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        start = self.wire_bytes
+        data = self._body[start:] if amt is None else self._body[start:start + amt]
+        self.wire_bytes += len(data)
+        return data
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+def install_stand_ins(current: dict, tweets: list, post_failure_rate: float = 0.0,
+                      seed: int = 0) -> list:
+    """
+    HTTP の取得（http_pool.get）を「いま見えているページ」（current の中身）を返す代役に、
+    投稿と固定を tweets に記録するだけの代役に差し替える。ETag は本文のハッシュなので、
+    中身が変わらなければ本物どおり 304 になる。
+    副の投稿先（Mastodon/Bluesky/webhook）は設定の環境変数を外して X だけにし、
+    HTTP の POST（http_pool.post）は失敗させる（秘密情報のあるシェルで回しても本物に出さない）。
+    STATE_BACKEND も外して既定（作業ディレクトリの JSON）に戻す（絶対パスの sqlite を
+    指していると、本番の追跡状態を読み書きしてしまう）。
+
+    post_failure_rate を渡すと、その割合の投稿を失敗させる（送信待ちの送り直しを見る用。
+    乱数は seed で固定するので、同じ指定なら同じ所で失敗する）。
+    """
+    rng = random.Random(seed)
+    failed = []
+    def get(url: str, headers: Optional[dict] = None, timeout: float = 30) -> FakeResponse:
+        url = re.sub(r'[?&]tm=\d+$', '', url)
+        body = current.get(url)
+        if body is None:
+            raise urllib.error.HTTPError(url, 404, 'Not Found', {}, None)
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakeResponse(304, b'', etag)
+        return FakeResponse(200, body, etag)
+
+    def post_to_twitter(text: str, reply_to: Optional[str] = None) -> Optional[str]:
+        if post_failure_rate and rng.random() < post_failure_rate:
+            failed.append(wb.now_jst().isoformat())
+            return None
+        tweet_id = str(len(tweets) + 1)
+        tweets.append({'id': tweet_id, 'ts': wb.now_jst().isoformat(), 'reply_to': reply_to,
+                       'pinned': False, 'text': text})
+        return tweet_id
+
+    def pin_tweet(tweet_id: str) -> bool:
+        tweets[int(tweet_id) - 1]['pinned'] = True
+        return True
+
+    def post(url: str, body: bytes, headers: Optional[dict] = None, timeout: float = 30):
+        raise RuntimeError(f"再生中は POST しない: {url}")
+
+    for key in wb.publishers.SINK_ENV_VARS + ('STATE_BACKEND',):
+        os.environ.pop(key, None)
+    wb._SINKS = None         # 次に作る時は X だけになる
+    wb._STATE_STORE = None   # 次に開く時は作業ディレクトリの JSON になる
+    wb.http_pool.get = get
+    wb.http_pool.post = post
+    wb.post_to_twitter = post_to_twitter
+    wb.pin_tweet = pin_tweet
+    if post_failure_rate:
+        # 同じ実行の中での送り直しは実時間で待つので、再生では次の実行に回す
+        wb.retry_outbox = lambda outbox, today: False
+    return failed
+
+
+# ============================ 再生 ============================
+def simulate(pages_at: PagesAt, start: datetime, end: datetime, workdir: str,
+             every: timedelta = timedelta(hours=1), adaptive: bool = False,
+             times: Optional[list[datetime]] = None, log_file=None,
+             post_failure_rate: float = 0.0) -> dict:
+    """
+    start から end まで reconcile() を繰り返す（作業ディレクトリは workdir）。
+
+    Args:
+        every: 実行間隔（adaptive=False の時）
+        adaptive: 常駐モードと同じ next_poll_at で次の実行時刻を決める
+        times: 実行時刻の一覧（記録したスナップショットをその時刻どおりに再生する時）
+        post_failure_rate: 投稿を失敗させる割合（install_stand_ins）
+
+    Returns:
+        {runs, failures, skipped, tweets, failed_posts, elapsed_sec}
+    """
+    tweets, current = [], {}
+    failed_posts = install_stand_ins(current, tweets, post_failure_rate)
+    for key in ('SKIP_TWEET_FLAG', 'ANNOUNCE_TEST', 'SNAPSHOT_DIR'):
+        os.environ.pop(key, None)
+    cwd = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    wb._HTTP_CACHE = None
+    wb._CASTER_MAPS = None
+    runs = failures = skipped = 0
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stderr(log_file or io.StringIO()):
+            pending = iter([t for t in times if start <= t <= end]) if times is not None else None
+            now = next(pending, None) if pending else start
+            os.environ['TEST_NOW'] = (now or start).isoformat()
+            wb.ensure_history_file()
+            wb.ensure_cache_files()
+            while now is not None and now <= end:
+                os.environ['TEST_NOW'] = now.isoformat()
+                pages = pages_at(now)
+                if pages is None:
+                    skipped += 1
+                else:
+                    current.clear()
+                    current.update(pages)
+                    wb.reset_run_caches()
+                    runs += 1
+                    try:
+                        ok = wb.reconcile()
+                    except Exception as e:
+                        wb.log(f"照合中の想定外のエラー: {e}")
+                        ok = False
+                    failures += not ok
+                if pending:
+                    now = next(pending, None)
+                elif adaptive:
+                    announced = (wb.load_saved_data() or {}).get('announced_date') == \
+                        (wb.today_bday(now) + timedelta(days=1)).isoformat()
+                    now = max(wb.next_poll_at(now, announced), now + timedelta(minutes=1))
+                else:
+                    now += every
+    finally:
+        os.environ.pop('TEST_NOW', None)
+        os.chdir(cwd)
+    with open(os.path.join(workdir, 'tweets.jsonl'), 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(t, ensure_ascii=False) + '\n' for t in tweets)
+    return {'runs': runs, 'failures': failures, 'skipped': skipped, 'tweets': tweets,
+            'failed_posts': failed_posts, 'elapsed_sec': time.perf_counter() - t0}
+
+
+def summarize(result: dict, workdir: str) -> None:
+    """実行回数・ツイートの内訳・出来た履歴のイベント数を表示する。"""
+    tweets = result['tweets']
+    heads = [t for t in tweets if not t['reply_to']]
+    announces = sum(t['text'].startswith('📺') for t in heads)
+    print(f"実行 {result['runs']}回（失敗 {result['failures']} / ページ無しで飛ばし {result['skipped']}）"
+          f" {result['elapsed_sec']:.1f}秒（{result['runs'] / max(result['elapsed_sec'], 1e-9):.0f}回/秒）")
+    print(f"ツイート {len(tweets)}件: 告知 {announces} / 決定・変更 {len(heads) - announces}"
+          f" / スレッドの続き {len(tweets) - len(heads)} / 固定 {sum(t['pinned'] for t in tweets)}")
+    if result.get('failed_posts'):
+        texts = [t['text'] for t in heads]
+        print(f"失敗させた投稿 {len(result['failed_posts'])}回 / 同じ本文の二重投稿 {len(texts) - len(set(texts))}件")
+    events = {}
+    for r in history_segments.iter_records(os.path.join(workdir, history_segments.HISTORY_DIR)):
+        events[r.get('event')] = events.get(r.get('event'), 0) + 1
+    print("履歴: " + (', '.join(f"{k} {v}" for k, v in sorted(events.items())) or 'なし'))
+
+
+def parse_time(s: str) -> datetime:
+    dt = datetime.fromisoformat(s)
+    return dt.replace(tzinfo=wb.JST) if dt.tzinfo is None else dt.astimezone(wb.JST)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--snapshots', metavar='DIR', help='記録したスナップショットのディレクトリ')
+    src.add_argument('--from-history', action='store_true', help='履歴から番組表の移り変わりを組み立てる')
+    parser.add_argument('--history-dir', default=history_segments.HISTORY_DIR,
+                        help='--from-history で読む履歴セグメントのディレクトリ')
+    parser.add_argument('--start', help='開始時刻（JST、既定は入手元の最初）')
+    parser.add_argument('--end', help='終了時刻（JST、既定は入手元の最後）')
+    parser.add_argument('--every', type=int,
+                        help='実行間隔（分）。既定はスナップショットなら記録時刻どおり、履歴なら60分')
+    parser.add_argument('--adaptive', action='store_true', help='常駐モードの間隔（next_poll_at）で回す')
+    parser.add_argument('--out', help='作業ディレクトリ（状態・履歴・tweets.jsonl を残す。既定は一時ディレクトリ）')
+    parser.add_argument('--verbose', action='store_true', help='ボットのログを標準エラーに出す')
+    parser.add_argument('--post-failure-rate', type=float, default=0.0,
+                        help='この割合の投稿を失敗させる（送信待ちの送り直しを見る。0〜1）')
+    parser.add_argument('--show', type=int, default=0, help='最後のN件のツイート本文を表示する')
+    args = parser.parse_args()
+
+    times = None
+    if args.snapshots:
+        recorded, pages_at = recorded_source(os.path.abspath(args.snapshots))
+        first, last = recorded[0], recorded[-1]
+        if not (args.every or args.adaptive):
+            times = recorded   # 記録した時刻どおりに再生（ページが実行時刻とずれない）
+    else:
+        first, last, pages_at = history_source(os.path.abspath(args.history_dir))
+    start = parse_time(args.start) if args.start else first
+    end = parse_time(args.end) if args.end else last
+    if args.out and os.path.exists(os.path.join(args.out, wb.DATA_FILE)):
+        sys.exit(f"{args.out} には既に状態があります（別のディレクトリを指定してください）")
+    workdir = os.path.abspath(args.out) if args.out else tempfile.mkdtemp(prefix='simulate_')
+    every = args.every or 60
+    pace = '記録時刻どおり' if times else ('常駐モードの間隔' if args.adaptive else f'{every}分おき')
+    print(f"{start.isoformat(timespec='minutes')} 〜 {end.isoformat(timespec='minutes')}"
+          f" を{pace}で再生", file=sys.stderr)
+
+    result = simulate(pages_at, start, end, workdir, timedelta(minutes=every), args.adaptive,
+                      times, sys.stderr if args.verbose else None, args.post_failure_rate)
+    summarize(result, workdir)
+    for t in result['tweets'][-args.show:] if args.show else []:
+        print(f"\n--- {t['ts'][:16]}{' (返信)' if t['reply_to'] else ''}{' (固定)' if t['pinned'] else ''}\n"
+              + t['text'])
+    if args.out:
+        print(f"出力: {workdir}（tweets.jsonl, history/, schedule_data.json）")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+追跡状態の保存先（差し替え可能なバックエンド）
+
+追跡状態（schedule_data.json の中身）は次の6つの区画に分けて持つ
+（outbox と days は任意の区画 OPTIONAL_SECTIONS。空ならチェックサムにも出力にも含めない）:
+
+  target          … target_date / target_date_str / timetable_digest
+  announced_date  … 最後に告知した放送日
+  tweeted         … 最後に告知/通知したキャスター表（差分の基準）
+  full            … 追跡中の放送日のフル時刻表
+  outbox          … まだ出し切っていない投稿と、出した投稿の冪等キー（空なら書かない）
+  days            … 追跡日より後の放送日ごとのフル時刻表（空なら書かない）
+
+保存時は区画ごとのダイジェストを前回読んだ/書いたものと比べ、変わった区画だけを
+書く（何も変わっていなければ書かない）。全体には形式の版・保存回数(revision)・
+チェックサムを付け、読み込み時に照合する。
+
+壊れていた場合（JSON として読めない・チェックサム不一致・版が新しすぎる）は
+StateCorruptError を投げる。黙って空の状態から始めると「全枠が未定から決定」の
+誤通知や二重告知になるので、復旧は人が判断する。
+
+バックエンド:
+  json    … JSON ファイル（既定。一時ファイルに書いて fsync → rename で置き換える）。
+            1枠1行で書くので、git の差分は変わった枠の行だけになる
+  sqlite  … SQLite（区画ごとの行。変わった区画だけ UPDATE）
+  memory  … プロセス内（テスト・シミュレーション用）
+
+環境変数 STATE_BACKEND で選ぶ（'json' / 'sqlite' / 'sqlite:パス' / 'memory'）。
+"""
+import os
+import json
+import sqlite3
+import hashlib
+from typing import Optional
+
+STATE_VERSION = 2
+SECTIONS = {
+    'target': ('target_date', 'target_date_str', 'timetable_digest'),
+    'announced_date': ('announced_date',),
+    'tweeted': ('tweeted',),
+    'full': ('full',),
+    'outbox': ('outbox',),
+    'days': ('days',),
+}
+# 後から足した区画。空(None)の間は書かず、チェックサムにも入れない（前からあるファイルがそのまま読める）
+OPTIONAL_SECTIONS = ('outbox', 'days')
+DEFAULT_SQLITE_FILE = 'schedule_state.sqlite'
+
+
+class StateCorruptError(Exception):
+    """保存済みの状態が壊れている（自動では初期化しない）。"""
+
+
+# ============================ 区画 ============================
+def _canonical(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def section_digest(value) -> str:
+    return hashlib.sha256(_canonical(value).encode('utf-8')).hexdigest()[:16]
+
+
+def checksum(sections: dict) -> str:
+    """全区画のチェックサム（区画名順のダイジェストを連ねたもののハッシュ）。"""
+    joined = ''.join(f"{name}={section_digest(sections.get(name))};" for name in SECTIONS
+                     if name not in OPTIONAL_SECTIONS or sections.get(name) is not None)
+    return 'sha256:' + hashlib.sha256(joined.encode('utf-8')).hexdigest()
+
+
+def split_state(state: dict) -> dict:
+    """平らな状態 dict を区画に分ける（announced_date 等の1キーの区画は値そのもの）。"""
+    out = {}
+    for name, keys in SECTIONS.items():
+        out[name] = state.get(keys[0]) if len(keys) == 1 else {k: state.get(k) for k in keys}
+    return out
+
+
+def join_sections(sections: dict, meta: dict) -> dict:
+    """区画とメタ情報（revision / timestamp、旧形式にだけあるキー）を平らな状態 dict に戻す。"""
+    state = {}
+    for name, keys in SECTIONS.items():
+        value = sections.get(name)
+        if len(keys) == 1:
+            state[keys[0]] = value
+        else:
+            state.update({k: (value or {}).get(k) for k in keys})
+    state.update(meta.get('legacy') or {})
+    state['revision'] = meta.get('revision', 0)
+    state['timestamp'] = meta.get('timestamp')
+    return state
+
+
+# ============================ 共通部分 ============================
+class StateStore:
+    """
+    バックエンドの共通部分。派生クラスは _read / _write を実装する。
+
+    _read() は (区画, メタ情報) か None（まだ何も無い）を返し、壊れていれば
+    StateCorruptError を投げる。_write(changed, sections, meta) は changed に挙がった
+    区画とメタ情報を書く（sections は全区画）。
+    """
+    name = 'base'
+
+    def __init__(self):
+        self._digests: dict[str, str] = {}   # 最後に読んだ/書いた区画のダイジェスト
+        self._revision = 0
+
+    def load(self) -> Optional[dict]:
+        """状態を読む。無ければ None。壊れていれば StateCorruptError。"""
+        got = self._read()
+        if got is None:
+            self._digests, self._revision = {}, 0
+            return None
+        sections, meta = got
+        # 旧形式は次の保存で全区画を書いて新形式にする
+        self._digests = {} if 'legacy' in meta else \
+            {name: section_digest(sections.get(name)) for name in SECTIONS}
+        self._revision = meta.get('revision', 0)
+        return join_sections(sections, meta)
+
+    def save(self, state: dict) -> list[str]:
+        """
+        状態を書く。前回読んだ/書いた時から変わった区画だけを書く。
+
+        Returns:
+            書いた区画の名前（何も変わっていなければ空で、何も書かない）
+        """
+        if not self._digests:
+            # 読まずに書く場合（保存先を切り替えた直後など）は、今ある分と比べる
+            try:
+                self.load()
+            except StateCorruptError:
+                self._digests = {}   # 上書きで直す（読む側では止めているので、ここは明示の保存）
+        sections = split_state(state)
+        digests = {name: section_digest(value) for name, value in sections.items()}
+        changed = [name for name in SECTIONS if self._digests.get(name) != digests[name]]
+        if not changed:
+            return []
+        meta = {'version': STATE_VERSION, 'revision': self._revision + 1,
+                'timestamp': state.get('timestamp'), 'checksum': checksum(sections)}
+        self._write(changed, sections, meta)
+        self._digests, self._revision = digests, meta['revision']
+        return changed
+
+    def _read(self) -> Optional[tuple[dict, dict]]:
+        raise NotImplementedError
+
+    def _write(self, changed: list[str], sections: dict, meta: dict) -> None:
+        raise NotImplementedError
+
+
+def _verify(sections: dict, meta: dict, where: str) -> None:
+    version = meta.get('version')
+    if not isinstance(version, int) or version > STATE_VERSION:
+        raise StateCorruptError(f"{where}: 未対応の版 {version!r}")
+    if meta.get('checksum') != checksum(sections):
+        raise StateCorruptError(f"{where}: チェックサム不一致（途中で切れたか、手で書き換えられた）")
+
+
+# ============================ JSON ファイル ============================
+def _dump_section(value) -> str:
+    """
+    区画を書く。リストは1要素1行、dict は1キー1行（枠が1つ変わっても差分はその行だけ。
+    dict の中身は1行なので、放送日ごとの days なら変わった日の行だけになる）。
+    """
+    if isinstance(value, list) and value:
+        rows = ',\n'.join('    ' + json.dumps(v, ensure_ascii=False) for v in value)
+        return f"[\n{rows}\n  ]"
+    if isinstance(value, dict) and value:
+        rows = ',\n'.join(f"    {json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}"
+                           for k, v in value.items())
+        return f"{{\n{rows}\n  }}"
+    return json.dumps(value, ensure_ascii=False)
+
+
+class JsonFileStore(StateStore):
+    """
+    JSON ファイル。同じディレクトリの一時ファイルに書いて fsync してから rename で
+    置き換えるので、途中で落ちても前回の状態か今回の状態のどちらかが残る。
+
+    ファイルは1つなので書く時は全体を書き直すが、変わっていない区画は前回と同じ
+    文字列になる（git の差分は変わった区画の行だけ）。版の無い旧形式（区画に
+    分ける前の schedule_data.json）も読め、次の保存で新形式になる。
+    """
+    name = 'json'
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._text: dict[str, str] = {}   # 区画ごとの書き出し済み文字列
+
+    def _read(self) -> Optional[tuple[dict, dict]]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            raise StateCorruptError(f"{self.path}: 読めない（{e}）") from e
+        if not isinstance(doc, dict):
+            raise StateCorruptError(f"{self.path}: オブジェクトではない")
+        if 'version' not in doc:
+            # 旧形式（平らな dict、チェックサム無し）。tweeted 以前の programs は
+            # そのまま呼び出し側に渡す（tweeted への正規化は呼び出し側がやる）
+            self._text = {}
+            legacy = {'programs': doc['programs']} if 'programs' in doc else {}
+            return split_state(doc), {'revision': 0, 'timestamp': doc.get('timestamp'),
+                                      'legacy': legacy}
+        sections = {name: doc.get(name) for name in SECTIONS}
+        _verify(sections, doc, self.path)
+        self._text = {}
+        return sections, doc
+
+    def _write(self, changed: list[str], sections: dict, meta: dict) -> None:
+        for name in SECTIONS:
+            if name in changed or name not in self._text:
+                self._text[name] = _dump_section(sections[name])
+        head = [f'  "{k}": {json.dumps(meta[k], ensure_ascii=False)}'
+                for k in ('version', 'revision', 'timestamp', 'checksum')]
+        body = [f'  "{name}": {self._text[name]}' for name in SECTIONS
+                if name not in OPTIONAL_SECTIONS or sections[name] is not None]
+        text = '{\n' + ',\n'.join(head + body) + '\n}\n'
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+# ============================ SQLite ============================
+class SqliteStore(StateStore):
+    """
+    SQLite。区画ごとに1行（本文 JSON とダイジェスト）、メタ情報は meta 表。
+    変わった区画の行とメタ情報を1トランザクションで更新する。
+    """
+    name = 'sqlite'
+
+    def __init__(self, path: str = DEFAULT_SQLITE_FILE):
+        super().__init__()
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute('CREATE TABLE IF NOT EXISTS sections '
+                     '(name TEXT PRIMARY KEY, body TEXT NOT NULL, digest TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        return conn
+
+    def _read(self) -> Optional[tuple[dict, dict]]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute('SELECT name, body, digest FROM sections').fetchall()
+                meta = {k: json.loads(v) for k, v in conn.execute('SELECT key, value FROM meta')}
+            finally:
+                conn.close()
+        except (sqlite3.DatabaseError, ValueError) as e:
+            raise StateCorruptError(f"{self.path}: 読めない（{e}）") from e
+        if not rows and not meta:
+            return None
+        sections = {name: None for name in SECTIONS}
+        for name, body, digest in rows:
+            try:
+                sections[name] = json.loads(body)
+            except ValueError as e:
+                raise StateCorruptError(f"{self.path}: 区画 {name} が読めない（{e}）") from e
+            if section_digest(sections[name]) != digest:
+                raise StateCorruptError(f"{self.path}: 区画 {name} のダイジェスト不一致")
+        _verify(sections, meta, self.path)
+        return sections, meta
+
+    def _write(self, changed: list[str], sections: dict, meta: dict) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO sections (name, body, digest) VALUES (?, ?, ?)',
+                    [(name, _canonical(sections[name]), section_digest(sections[name]))
+                     for name in changed])
+                conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                 [(k, json.dumps(v, ensure_ascii=False)) for k, v in meta.items()])
+        finally:
+            conn.close()
+
+
+# ============================ プロセス内 ============================
+class MemoryStore(StateStore):
+    """プロセス内に持つだけ（テスト・シミュレーション用）。区画は JSON 文字列で持ち、呼び出し側と共有しない。"""
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._sections: dict[str, str] = {}
+        self._meta: dict = {}
+
+    def _read(self) -> Optional[tuple[dict, dict]]:
+        if not self._meta:
+            return None
+        sections = {name: json.loads(self._sections[name]) if name in self._sections else None
+                    for name in SECTIONS}
+        _verify(sections, self._meta, 'memory')
+        return sections, dict(self._meta)
+
+    def _write(self, changed: list[str], sections: dict, meta: dict) -> None:
+        for name in changed:
+            self._sections[name] = _canonical(sections[name])
+        self._meta = dict(meta)
+
+
+def open_store(spec: Optional[str], json_path: str) -> StateStore:
+    """
+    STATE_BACKEND の指定からバックエンドを作る。
+
+    Args:
+        spec: 'json'（既定）/ 'sqlite' / 'sqlite:パス' / 'memory'
+        json_path: json バックエンドのファイル
+    """
+    kind, _, arg = (spec or 'json').partition(':')
+    if kind == 'json':
+        return JsonFileStore(arg or json_path)
+    if kind == 'sqlite':
+        return SqliteStore(arg or DEFAULT_SQLITE_FILE)
+    if kind == 'memory':
+        return MemoryStore()
+    raise ValueError(f"未知の状態バックエンド: {spec}")
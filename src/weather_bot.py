@@ -18,20 +18,68 @@
   - 番組表JSON:  https://site.weathernews.jp/site/live/json/timetable.json
   - コード→漢字名: timetable.html の caster_trans/caster_kanji を実行時抽出（失敗時は内蔵辞書）
 
+起動方法:
+  - python src/weather_bot.py           : 1回だけ照合して終了（GitHub Actions の毎時実行）
+  - python src/weather_bot.py --daemon  : 常駐して内部スケジューラで照合を繰り返す
+      告知時刻の前後と各枠の開始前は密に、深夜は疎に問い合わせる。SIGTERM/SIGINT で
+      実行中の照合を終えてから止まる。履歴に決定/変更が十分あれば、その時間帯分布から
+      作ったポーリング計画に従う。
+  - python src/weather_bot.py --serve [HOST:]PORT : 常駐モードに加えて読み取りAPI（JSON）を立てる
+      GET /lineup（追跡日の tweeted/full と後の日の時刻表）, /now（放送中と次の枠）,
+      /history（直近の履歴イベント）。照合のたびにメモリ上の応答を作り直し、ETag が
+      一致すれば 304 を返す。上流にも状態ファイルにも触れずに読めるので、他の道具は
+      schedule_data.json や番組表を直接取りに行かずにこちらを読む。既定は 127.0.0.1:8080
+  - python src/weather_bot.py --polling-plan [--cron] : 履歴からポーリング計画を出力する
+      （--cron なら GitHub Actions の schedule に貼れる UTC の cron 行）
+
 テスト用環境変数:
   - SKIP_TWEET_FLAG=true : 投稿・保存をスキップ（dry-run）
   - TEST_NOW=2026-06-20T21:30 : 現在時刻を上書き
   - ANNOUNCE_TEST=true : 時刻に関係なく告知判定を走らせる
+
+計測:
+  各実行の段階ごとの所要時間・HTTP/投稿/固定の呼び出し（時間・バイト数・結果）・
+  リトライ回数を bot_result.json に書く。環境変数 METRICS_TEXTFILE にパスを渡すと
+  同じ内容を Prometheus の textfile 形式でも書き出す（node_exporter の textfile collector 用）。
+
+投稿先:
+  X が主（成否・固定ポストは X の結果で決める）。MASTODON_* / BLUESKY_* / WEBHOOK_URLS が
+  設定されていれば、同じ本文を並列で副の投稿先にも出す（publishers.py）。
+  X に出した件数は状態に数え、無料枠（24時間17件・月500件）を越えそうなら X には出さず待つ。
+  COALESCE_WINDOW_MIN（分。既定0＝まとめない）を設定すると、開始まで余裕のある枠の決定/変更を
+  その間保留してまとめて出す（次の照合が窓を越えるなら保留しない。毎時の cron では窓を60分より
+  長くしないと効かない。常駐モード向け）。
+
+追跡状態:
+  既定は schedule_data.json（変わった区画だけ書き換え、版・チェックサム付き）。
+  環境変数 STATE_BACKEND=sqlite[:パス] / memory で保存先を替えられる（state_store.py）。
+  壊れていたら黙って初期化せず、照合を失敗で終える。
 """
 import os
 import re
 import sys
 import json
 import time
-import urllib.request
+import codecs
+import random
+import signal
+import bisect
+import argparse
+import hashlib
+import threading
+import http.client
+import urllib.error
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, date, timezone, timedelta
 from typing import Optional
 
+import history_segments
+import http_pool
+import publishers
+import state_store
+
 # ============================ 定数 ============================
 JST = timezone(timedelta(hours=9))
 TIMETABLE_JSON_URL = "https://site.weathernews.jp/site/live/json/timetable.json"
@@ -42,16 +90,41 @@ YOUTUBE_STREAMS_URL = "https://www.youtube.com/@weathernews/streams"
 # 動画IDは終了後のアーカイブと同じなので、放送中に押さえておけば取りこぼさない。
 YOUTUBE_LIVE_URL = "https://www.youtube.com/@weathernews/live"
 DATA_FILE = 'schedule_data.json'
-HISTORY_FILE = 'history.jsonl'   # 統計・長期記録用の追記専用ログ（判断には不使用）
+HTTP_CACHE_FILE = 'http_cache.json'   # 条件付きGET用（URLごとの ETag/Last-Modified/本文ダイジェスト/本文）
+CASTER_MAPS_FILE = 'caster_maps.json'  # timetable.html から抽出したキャスター対応表の保存先
+CASTER_MAPS_TTL_SEC = 7 * 24 * 3600    # 対応表の入れ替わりは年に数回。期限内はページを取りに行かない
+# 統計・長期記録用の追記専用ログ（判断には不使用）。記録月ごとのセグメントに分けて置く
+# （今月=history/YYYY-MM.jsonl、閉じた月=.jsonl.gz。history_segments.py）
+HISTORY_DIR = history_segments.HISTORY_DIR
+LEGACY_HISTORY_FILE = 'history.jsonl'   # 分割前の1本ファイル。あれば最初の実行で分割する
 
 # 翌日告知を出す時刻（JST）。この時刻以降の最初の実行で告知する。
 ANNOUNCE_HOUR = 21
 # 放送日の境界（05:00開始）
 DAY_START_HOUR = 5
 
+# 常駐モードの問い合わせ間隔（秒）。304 で済む問い合わせが大半なので、密にしても負荷は小さい。
+DAEMON_DENSE_SEC = 10 * 60    # 告知時刻〜告知するまで / 各枠の開始前
+DAEMON_NORMAL_SEC = 30 * 60   # 日中のそれ以外
+DAEMON_SPARSE_SEC = 60 * 60   # 告知後〜朝の最初の枠の前（深夜）
+DENSE_BEFORE_SLOT_MIN = 60    # 枠の開始何分前から密にするか
+CRON_INTERVAL_SEC = 60 * 60   # 常駐でない時の照合の間隔（GitHub Actions の毎時 cron）
+
+# 履歴から作るポーリング計画。1日の問い合わせ回数の予算を、決定/変更が起きてきた時間帯に厚く配る。
+POLL_BUDGET_PER_DAY = 72      # 1日あたりの問い合わせ回数（各時1回の下限を含む）
+POLL_MAX_PER_HOUR = 6         # 1時間あたりの上限（10分おき）
+POLL_MINUTE_OFFSET = 17       # :00 は Actions が混むので外す（cron と同じ）
+PLAN_MIN_EVENTS = 20          # これ未満の履歴しか無ければ計画は作らない（静的な間隔を使う）
+CHANGE_EVENTS = ('decision', 'change', 'decision+change')
+
 MAX_RETRIES = 5
-RETRY_DELAY_SEC = 15
+RETRY_BASE_SEC = 2       # 指数バックオフの初項（2, 4, 8, ... 秒を上限に一様ジッタ）
+RETRY_MAX_SEC = 20       # 1回の待ちの上限
 HTTP_TIMEOUT_SEC = 30
+# 1回の実行の持ち時間。job は timeout-minutes: 5 で、checkout/pip に1分ほど取られる。
+RUN_BUDGET_SEC = 210
+# 投稿・固定のために最後まで取っておく時間。取得系のリトライはここに食い込まない。
+POST_RESERVE_SEC = 45
 USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
               '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
 
@@ -82,7 +155,43 @@ FALLBACK_CASTER_KANJI = {
     'tanabe': '田辺 真南葉', 'matsumoto': '松本 真央',
 }
 _CASTER_MAPS = None
+_CASTER_MAPS_REFRESHED = False   # この実行で timetable.html を取り直したか（未知コードでの再取得は1回だけ）
 _YOUTUBE_ARCHIVES = None   # 1回の実行につき1度だけ取得（None=未取得）
+_ARCHIVE_INDEX = None      # _YOUTUBE_ARCHIVES の (放送日, 番組) 索引（None=未作成）
+_ARCHIVE_HORIZON: Optional[date] = None   # 配信一覧を遡る最も古い放送日（None=上限まで読む）
+_STATE_STORE: Optional[state_store.StateStore] = None   # 追跡状態の保存先（state_backend()）
+_SINKS: Optional[list] = None   # 投稿先（publish_sinks()）
+_DAEMON_MODE = False   # 常駐モードで動いているか（next_run_gap）
+_READ_CACHE: Optional[dict] = None   # 読み取りAPIの応答（build_read_cache。None=APIを立てていない）
+
+# 1回の実行で使う上流ページ（URL, キャッシュ回避クエリを付けるか, 条件付きGETにするか）。
+# 実行の頭で並列に先読みする。
+PREFETCH_TARGETS = (
+    (TIMETABLE_JSON_URL, True, True),
+    (TIMETABLE_HTML_URL, True, False),
+    (YOUTUBE_LIVE_URL, False, False),
+    (YOUTUBE_STREAMS_URL, False, False),
+)
+# 上流ページの保存名。環境変数 SNAPSHOT_DIR があれば取得のたびに
+# <SNAPSHOT_DIR>/<実行時刻 YYYYMMDDTHHMM>/<保存名> に本文を残す（simulate.py で再生する）
+SNAPSHOT_FILES = {
+    TIMETABLE_JSON_URL: 'timetable.json',
+    TIMETABLE_HTML_URL: 'timetable.html',
+    YOUTUBE_LIVE_URL: 'youtube_live.html',
+    YOUTUBE_STREAMS_URL: 'youtube_streams.html',
+}
+SNAPSHOT_TS_FORMAT = '%Y%m%dT%H%M'
+_PREFETCH_POOL: Optional[ThreadPoolExecutor] = None
+_PREFETCH: dict[str, Future] = {}   # 先読み中の取得（URL→Future）。受け取ったら消す
+_HTTP_CACHE = None                   # HTTP_CACHE_FILE の中身（None=未読込）
+_HTTP_CACHE_LOCK = threading.Lock()  # 先読みスレッドから同時に触るため
+_RUN_DEADLINE = None                 # 実行の締切（time.monotonic 基準）。None=無制限
+_RUN_STARTED = None                  # 実行の開始（time.perf_counter 基準）
+_RUN_METRICS = {'phases': {}, 'calls': [], 'retries': {}}   # この実行の計測（write_result で書き出す）
+_METRICS_LOCK = threading.Lock()     # 先読みスレッドからも記録するため
+_PHASE = None                        # 計測中の段階 (名前, 開始時刻)
+_TWITTER_CLIENT = None               # tweepy.Client（使い回す）
+_OAUTH_SESSION = None                # 固定ポスト用の OAuth1Session（使い回す）
 
 
 # ============================ ユーティリティ ============================
@@ -126,15 +235,341 @@ def slot_minutes(hhmm: str) -> int:
     return int(h) * 60 + int(m)
 
 
+# ============================ リトライ方針 / 持ち時間 ============================
+def start_run_clock(budget_sec: float = RUN_BUDGET_SEC) -> None:
+    """この実行の持ち時間を計り始める（reconcile の頭で呼ぶ）。計測もここで空にする。"""
+    global _RUN_DEADLINE, _RUN_STARTED, _RUN_METRICS, _PHASE
+    _RUN_DEADLINE = time.monotonic() + budget_sec
+    _RUN_STARTED = time.perf_counter()
+    with _METRICS_LOCK:
+        _RUN_METRICS = {'phases': {}, 'calls': [], 'retries': {}}
+    _PHASE = None
+
+
+def remaining_sec() -> float:
+    """持ち時間の残り秒数（計測していなければ無限大）。"""
+    if _RUN_DEADLINE is None:
+        return float('inf')
+    return _RUN_DEADLINE - time.monotonic()
+
+
+def request_timeout(reserve: float = POST_RESERVE_SEC) -> float:
+    """1リクエストのタイムアウト。HTTP_TIMEOUT_SEC と「残り − 取り置き」の小さい方（最低3秒）。"""
+    return max(3.0, min(HTTP_TIMEOUT_SEC, remaining_sec() - reserve))
+
+
+def error_status(e: Exception) -> Optional[int]:
+    """例外からHTTPステータスを取り出す（urllib / requests / tweepy）。無ければ None。"""
+    code = getattr(e, 'code', None)
+    if isinstance(code, int):
+        return code
+    resp = getattr(e, 'response', None)
+    status = getattr(resp, 'status_code', None) if resp is not None else None
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(e: Exception) -> bool:
+    """
+    やり直して直りうる失敗か。
+      - 5xx / 408 / 425 / 429   → やり直す
+      - その他の 4xx            → やり直さない（認証・重複投稿・URL違いは何度やっても同じ）
+      - タイムアウト・接続断    → やり直す
+      - 本文が壊れている/空     → やり直す（取得途中で切れた等）
+    """
+    status = error_status(e)
+    if status is not None:
+        return status >= 500 or status in (408, 425, 429)
+    return isinstance(e, (OSError, ValueError, http.client.HTTPException))
+
+
+# ============================ 計測 ============================
+def phase(name: Optional[str]) -> None:
+    """
+    reconcile の段階を切り替える（直前の段階の所要時間を記録して次を計り始める）。
+    None なら閉じるだけ。途中で return しても write_result が閉じるので、段階ごとに
+    with で囲む必要は無い。
+    """
+    global _PHASE
+    now = time.perf_counter()
+    if _PHASE is not None:
+        prev, started = _PHASE
+        with _METRICS_LOCK:
+            phases = _RUN_METRICS['phases']
+            phases[prev] = round(phases.get(prev, 0) + now - started, 4)
+    _PHASE = (name, now) if name else None
+
+
+@contextmanager
+def span(kind: str, target: str):
+    """
+    外部呼び出し1回の所要時間を記録する。呼び出し側は yield された dict に
+    bytes / status を書き足せる。例外は status に型名を残してそのまま投げる。
+    """
+    rec = {'kind': kind, 'target': target}
+    started = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec['status'] = error_status(e) or type(e).__name__
+        raise
+    finally:
+        rec['sec'] = round(time.perf_counter() - started, 4)
+        with _METRICS_LOCK:
+            _RUN_METRICS['calls'].append(rec)
+
+
+def note_retry(what: str) -> None:
+    """リトライ1回を数える（RetryPolicy が待つたびに呼ぶ）。"""
+    with _METRICS_LOCK:
+        retries = _RUN_METRICS['retries']
+        retries[what] = retries.get(what, 0) + 1
+
+
+def run_metrics() -> dict:
+    """この実行の計測（段階・呼び出し・リトライ・全体の秒数）。"""
+    phase(None)
+    with _METRICS_LOCK:
+        m = {'phases': dict(_RUN_METRICS['phases']), 'calls': list(_RUN_METRICS['calls']),
+             'retries': dict(_RUN_METRICS['retries'])}
+    m['duration_sec'] = round(time.perf_counter() - _RUN_STARTED, 4) if _RUN_STARTED else None
+    return m
+
+
+def _prom_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus(path: str, success: bool, metrics: dict) -> None:
+    """計測を Prometheus の textfile 形式で書く（一時ファイル経由で置き換え）。"""
+    lines = [
+        '# HELP wnl_bot_run_success 1 if the last run succeeded',
+        '# TYPE wnl_bot_run_success gauge',
+        f'wnl_bot_run_success {int(success)}',
+        '# HELP wnl_bot_run_timestamp_seconds Unix time the last run finished',
+        '# TYPE wnl_bot_run_timestamp_seconds gauge',
+        f'wnl_bot_run_timestamp_seconds {now_jst().timestamp():.0f}',
+        '# HELP wnl_bot_run_duration_seconds Wall time of the last run',
+        '# TYPE wnl_bot_run_duration_seconds gauge',
+        f'wnl_bot_run_duration_seconds {metrics["duration_sec"] or 0}',
+        '# HELP wnl_bot_phase_duration_seconds Wall time per reconcile phase',
+        '# TYPE wnl_bot_phase_duration_seconds gauge',
+    ]
+    lines += [f'wnl_bot_phase_duration_seconds{{phase="{_prom_label(k)}"}} {v}'
+              for k, v in metrics['phases'].items()]
+    # 呼び出しは (種類, 対象) ごとに合計する（リトライで同じ対象が複数回ありうる）
+    calls = {}
+    for c in metrics['calls']:
+        agg = calls.setdefault((c['kind'], c['target']), {'count': 0, 'sec': 0.0, 'bytes': 0})
+        agg['count'] += 1
+        agg['sec'] += c['sec']
+        agg['bytes'] += c.get('bytes') or 0
+    for name, key, help_text in (('calls', 'count', 'Number of external calls'),
+                                 ('call_duration_seconds', 'sec', 'Total wall time of external calls'),
+                                 ('call_bytes', 'bytes', 'Bytes received by external calls')):
+        lines += [f'# HELP wnl_bot_{name} {help_text} in the last run',
+                  f'# TYPE wnl_bot_{name} gauge']
+        lines += [f'wnl_bot_{name}{{kind="{_prom_label(kind)}",target="{_prom_label(target)}"}} '
+                  f'{round(agg[key], 4)}' for (kind, target), agg in calls.items()]
+    lines += ['# HELP wnl_bot_retries Retries per operation in the last run',
+              '# TYPE wnl_bot_retries gauge']
+    lines += [f'wnl_bot_retries{{what="{_prom_label(k)}"}} {v}' for k, v in metrics['retries'].items()]
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, path)
+
+
+class RetryPolicy:
+    """
+    ネットワーク呼び出しの再試行方針（指数バックオフ＋ジッタ、実行の持ち時間つき）。
+
+    待ってから再試行すると残りが reserve を割る場合は、待たずに諦める。
+    取得系は reserve=POST_RESERVE_SEC で投稿の時間を残し、投稿系は reserve=0 で最後まで使う。
+    """
+
+    def __init__(self, attempts: int = MAX_RETRIES, base: float = RETRY_BASE_SEC,
+                 cap: float = RETRY_MAX_SEC, reserve: float = POST_RESERVE_SEC):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.reserve = reserve
+
+    def call(self, fn, what: str):
+        """fn() を方針どおりに呼ぶ。最後の失敗（またはやり直さない失敗）はそのまま投げる。"""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.attempts or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+                if remaining_sec() - delay < self.reserve:
+                    log(f"{what}: {e} → 持ち時間が足りないのでリトライしない")
+                    raise
+                log(f"{what}: {e} → {delay:.1f}秒後にリトライ ({attempt}/{self.attempts})")
+                note_retry(what)
+                time.sleep(delay)
+
+
+FETCH_RETRY = RetryPolicy()                        # 番組表JSON（無いと何もできない）
+AUX_RETRY = RetryPolicy(attempts=2)                # 対応表・YouTube（無くても続行できる付加情報）
+POST_RETRY = RetryPolicy(attempts=3, reserve=0)    # 投稿・固定
+
+
 # ============================ HTTP / キャスター対応表 ============================
-def http_get(url: str, cache_bust: bool = True) -> str:
-    """URLをGETして本文(UTF-8)を返す。cache_bust=True でキャッシュ回避クエリを付与。"""
+def http_get(url: str, cache_bust: bool = True, conditional: bool = False) -> str:
+    """
+    URLをGETして本文(UTF-8)を返す。cache_bust=True でキャッシュ回避クエリを付与。
+
+    conditional=True なら前回の ETag/Last-Modified を付けて問い合わせ、304 なら
+    保存済みの本文を返す（キャッシュは元のURLをキーにするのでクエリ付与と併用できる）。
+    BOUNDED_READS に載っているページ（YouTube）は、要る所まで読んだら途中で打ち切る。
+    """
+    key = url
+    headers = {'User-Agent': USER_AGENT}
+    cached = http_cache_entry(key) if conditional else None
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
     if cache_bust:
         sep = '&' if '?' in url else '?'
         url = f"{url}{sep}tm={int(time.time() * 1000)}"
-    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
-    with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT_SEC) as resp:
-        return resp.read().decode('utf-8', errors='replace')
+    bounded = BOUNDED_READS.get(key)
+    with span('http', SNAPSHOT_FILES.get(key, key)) as rec:
+        with http_pool.get(url, headers, timeout=request_timeout()) as resp:
+            if bounded:
+                make_stop, max_bytes = bounded
+                body = read_bounded(resp, make_stop(), max_bytes, rec)
+            else:
+                body = resp.read()
+            rec['status'] = resp.status
+            rec['wire_bytes'] = resp.wire_bytes
+            etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        if resp.status == 304:
+            if not (cached and cached.get('body') is not None):
+                raise urllib.error.HTTPError(key, 304, 'Not Modified (保存済みの本文なし)', None, None)
+            log(f"304 Not Modified: {key}")
+            record_snapshot(key, cached['body'])
+            return cached['body']
+        rec['bytes'] = len(body)
+    text = body.decode('utf-8', errors='replace')
+    record_snapshot(key, text)
+    if conditional:
+        store_http_cache(key, {
+            'etag': etag,
+            'last_modified': last_modified,
+            'digest': hashlib.sha256(body).hexdigest(),
+            'body': text,
+        })
+    return text
+
+
+def read_bounded(resp, stop, max_bytes: int, rec: dict) -> bytes:
+    """
+    本文を少しずつ読み、stop(新しく届いた断片の文字列) が True を返すか、展開後で
+    max_bytes に達したらそこで読むのをやめる（残りは受信しない。接続はプールに戻さず閉じる）。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts, size = [], 0
+    while True:
+        chunk = resp.read(http_pool.READ_CHUNK)
+        if not chunk:
+            break
+        parts.append(chunk)
+        size += len(chunk)
+        if stop(decoder.decode(chunk)):
+            rec['stopped'] = 'found'
+            break
+        if size >= max_bytes:
+            rec['stopped'] = 'cap'
+            log(f"{rec['target']}: {max_bytes // 1024}KB で打ち切り")
+            break
+    return b''.join(parts)
+
+
+def record_snapshot(url: str, text: str) -> None:
+    """SNAPSHOT_DIR が指定されていれば、取得した本文を実行時刻のスナップショットとして保存する。"""
+    directory = os.getenv('SNAPSHOT_DIR')
+    name = SNAPSHOT_FILES.get(url)
+    if not directory or not name:
+        return
+    try:
+        path = os.path.join(directory, now_jst().strftime(SNAPSHOT_TS_FORMAT))
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+    except Exception as e:
+        log(f"スナップショット保存エラー: {e}")
+
+
+def _load_http_cache() -> dict:
+    """HTTP_CACHE_FILE を読む（ロック保持中に呼ぶ）。壊れていれば空から始める。"""
+    global _HTTP_CACHE
+    if _HTTP_CACHE is None:
+        _HTTP_CACHE = {}
+        if os.path.exists(HTTP_CACHE_FILE):
+            try:
+                with open(HTTP_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    _HTTP_CACHE = json.load(f)
+            except Exception as e:
+                log(f"HTTPキャッシュ読み込みエラー（無視して取り直す）: {e}")
+    return _HTTP_CACHE
+
+
+def http_cache_entry(url: str) -> Optional[dict]:
+    """URLの条件付きGETキャッシュ（etag, last_modified, digest, body）。無ければ None。"""
+    with _HTTP_CACHE_LOCK:
+        return _load_http_cache().get(url)
+
+
+def store_http_cache(url: str, entry: dict) -> None:
+    """条件付きGETキャッシュを更新して書き出す（中身が変わった時だけ呼ばれる）。"""
+    with _HTTP_CACHE_LOCK:
+        cache = _load_http_cache()
+        cache[url] = entry
+        if is_dry_run():
+            return
+        try:
+            with open(HTTP_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log(f"HTTPキャッシュ保存エラー: {e}")
+
+
+def http_cache_digest(url: str) -> Optional[str]:
+    """最後に受け取った本文のダイジェスト（304 でも同じ値）。未取得なら None。"""
+    entry = http_cache_entry(url)
+    return entry.get('digest') if entry else None
+
+
+def start_prefetch(targets=PREFETCH_TARGETS) -> None:
+    """
+    上流ページの取得をまとめて並列に走らせておく。
+
+    取得はそれぞれ最大 HTTP_TIMEOUT_SEC かかりうるので、順に取ると待ちが足し算になる。
+    先に全部投げておけば、1回の実行の待ちは一番遅いページぶんで済む。
+    結果（失敗時は例外）は fetch_text() で受け取る。
+    """
+    global _PREFETCH_POOL
+    if _PREFETCH_POOL is None:
+        _PREFETCH_POOL = ThreadPoolExecutor(max_workers=len(PREFETCH_TARGETS),
+                                            thread_name_prefix='prefetch')
+    for url, cache_bust, conditional in targets:
+        if url not in _PREFETCH:
+            _PREFETCH[url] = _PREFETCH_POOL.submit(http_get, url, cache_bust, conditional)
+
+
+def fetch_text(url: str, cache_bust: bool = True, conditional: bool = False) -> str:
+    """
+    URLの本文を返す。先読み済みならその結果を受け取り、無ければその場で取得する。
+    先読みぶんは1回限り（リトライ時は取り直す）。
+    """
+    fut = _PREFETCH.pop(url, None)
+    if fut is not None:
+        return fut.result()
+    return http_get(url, cache_bust, conditional)
 
 
 def parse_js_caster_map(html: str, func_name: str) -> dict:
@@ -154,25 +589,82 @@ def parse_js_caster_map(html: str, func_name: str) -> dict:
     return {k: v for k, v in pairs}
 
 
-def get_caster_maps() -> tuple[dict, dict]:
+def load_caster_maps_cache() -> Optional[dict]:
+    """保存済みのキャスター対応表 {fetched_at, version, trans, kanji}。無い/壊れていれば None。"""
+    if not os.path.exists(CASTER_MAPS_FILE):
+        return None
+    try:
+        with open(CASTER_MAPS_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if cache.get('kanji') else None
+    except Exception as e:
+        log(f"キャスター対応表キャッシュの読み込みエラー: {e}")
+        return None
+
+
+def caster_maps_stale(cache: Optional[dict] = None) -> bool:
+    """保存済みの対応表が無いか、TTL を過ぎているか。"""
+    cache = cache if cache is not None else load_caster_maps_cache()
+    if not cache or not cache.get('fetched_at'):
+        return True
+    try:
+        age = (now_jst() - datetime.fromisoformat(cache['fetched_at'])).total_seconds()
+    except ValueError:
+        return True
+    return age >= CASTER_MAPS_TTL_SEC
+
+
+def save_caster_maps_cache(trans_map: dict, kanji_map: dict) -> None:
+    """抽出した対応表を保存する。version は中身のハッシュ（変わった時だけログに出す）。"""
+    version = hashlib.sha256(json.dumps([trans_map, kanji_map], ensure_ascii=False,
+                                        sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    old = load_caster_maps_cache()
+    if old and old.get('version') != version:
+        log(f"キャスター対応表が更新された: {old.get('version')} → {version}")
+    if is_dry_run():
+        return
+    try:
+        with open(CASTER_MAPS_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': now_jst().isoformat(), 'version': version,
+                       'trans': trans_map, 'kanji': kanji_map},
+                      f, ensure_ascii=False, indent=2, sort_keys=True)
+    except Exception as e:
+        log(f"キャスター対応表キャッシュの保存エラー: {e}")
+
+
+def get_caster_maps(refresh: bool = False) -> tuple[dict, dict]:
     """
     キャスターコード正規化表 / 漢字名表を取得する（プロセス内キャッシュ）。
-    まず timetable.html から動的抽出し、失敗時はフォールバック辞書を使う。
+
+    普段は CASTER_MAPS_FILE の保存分を使い、TTL 切れか refresh=True（未知コードに
+    出会った時）だけ timetable.html から抽出し直す。取れなければ期限切れの保存分、
+    それも無ければフォールバック辞書を使う。
     """
-    global _CASTER_MAPS
-    if _CASTER_MAPS is not None:
+    global _CASTER_MAPS, _CASTER_MAPS_REFRESHED
+    if _CASTER_MAPS is not None and not refresh:
+        return _CASTER_MAPS
+
+    cache = load_caster_maps_cache()
+    if not refresh and not caster_maps_stale(cache):
+        _CASTER_MAPS = (cache.get('trans') or {}, cache['kanji'])
         return _CASTER_MAPS
 
     trans_map, kanji_map = {}, {}
+    _CASTER_MAPS_REFRESHED = True
     try:
-        html = http_get(TIMETABLE_HTML_URL)
+        html = AUX_RETRY.call(lambda: fetch_text(TIMETABLE_HTML_URL), 'timetable.html')
         trans_map = parse_js_caster_map(html, 'caster_trans')
         kanji_map = parse_js_caster_map(html, 'caster_kanji')
         log(f"キャスター対応表を抽出: 正規化{len(trans_map)}件 / 漢字{len(kanji_map)}件")
     except Exception as e:
         log(f"キャスター対応表の抽出に失敗: {e}")
 
-    if not kanji_map:
+    if kanji_map:
+        save_caster_maps_cache(trans_map, kanji_map)
+    elif cache:
+        log("ページからの抽出に失敗 → 保存済みの対応表を使用")
+        trans_map, kanji_map = cache.get('trans') or {}, cache['kanji']
+    else:
         log("ページからの抽出に失敗 → ハードコード辞書を使用")
         trans_map = dict(FALLBACK_CASTER_TRANS)
         kanji_map = dict(FALLBACK_CASTER_KANJI)
@@ -184,11 +676,17 @@ def get_caster_maps() -> tuple[dict, dict]:
 def resolve_caster_name(code: str) -> tuple[str, str]:
     """
     キャスターコードを (漢字名, プロフィールURL) に解決する。
-    サイトと同じ2段変換（caster_trans → caster_kanji）。未知コードは漢字名にコードを返す。
+    サイトと同じ2段変換（caster_trans → caster_kanji）。
+
+    未知コードなら、この実行でまだ取り直していなければ対応表を取り直して再挑戦し、
+    それでも無ければフォールバック辞書、最後はコードそのものを漢字名として返す。
     """
     trans_map, kanji_map = get_caster_maps()
-    normalized = trans_map.get(code, code)
-    name = kanji_map.get(normalized)
+    if trans_map.get(code, code) not in kanji_map and not _CASTER_MAPS_REFRESHED:
+        log(f"未知のキャスターコード: '{code}' → 対応表を取り直す")
+        trans_map, kanji_map = get_caster_maps(refresh=True)
+    normalized = trans_map.get(code, FALLBACK_CASTER_TRANS.get(code, code))
+    name = kanji_map.get(normalized) or FALLBACK_CASTER_KANJI.get(normalized)
     profile_url = f"https://weathernews.jp/wnl/caster/{normalized}.html"
     if not name:
         log(f"未知のキャスターコード: '{code}' (正規化: '{normalized}')")
@@ -199,27 +697,24 @@ def resolve_caster_name(code: str) -> tuple[str, str]:
 # ============================ 取得 & 放送日付与 ============================
 def fetch_entries() -> Optional[list[dict]]:
     """
-    JSON APIから生の番組表エントリ列を取得する（リトライ付き）。
+    JSON APIから生の番組表エントリ列を取得する（FETCH_RETRY でリトライ）。
 
     Returns:
         [{hour, title, caster}, ...]（時系列）。総失敗時は None。
     """
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            raw = http_get(TIMETABLE_JSON_URL)
-            entries = json.loads(raw)
-            if isinstance(entries, list) and entries:
-                log(f"JSON API: {len(entries)}エントリ取得")
-                return entries
-            log("JSON APIのデータが空")
-        except Exception as e:
-            log(f"JSON API取得エラー: {e}")
-
-        if attempt < MAX_RETRIES:
-            log(f"{RETRY_DELAY_SEC}秒後にリトライ ({attempt}/{MAX_RETRIES})")
-            time.sleep(RETRY_DELAY_SEC)
+    def attempt() -> list[dict]:
+        entries = json.loads(fetch_text(TIMETABLE_JSON_URL, conditional=True))
+        if not (isinstance(entries, list) and entries):
+            raise ValueError("JSON APIのデータが空")
+        return entries
 
-    return None
+    try:
+        entries = FETCH_RETRY.call(attempt, 'JSON API')
+    except Exception as e:
+        log(f"JSON API取得エラー: {e}")
+        return None
+    log(f"JSON API: {len(entries)}エントリ取得")
+    return entries
 
 
 def today_bday(now: datetime) -> date:
@@ -236,18 +731,18 @@ def today_bday(now: datetime) -> date:
     return now.date() if now.hour >= DAY_START_HOUR else now.date() - timedelta(days=1)
 
 
-def assign_broadcast_dates(entries: list[dict], now: datetime) -> list[dict]:
+def assign_broadcast_dates(entries: list[dict], now: datetime) -> dict[date, list[dict]]:
     """
-    時系列エントリ列の各枠に「放送日(bday)」を付与する。
+    時系列エントリ列の各枠に「放送日(bday)」を付与し、放送日ごとに分ける（1回の走査で）。
 
     放送日は 05:00 区切り。先頭(進行中の放送日)を today_bday とし、
     リスト中で 05:00 を跨ぐ度に翌放送日へ繰り上げる。キャスター枠(05:00〜20:00)は
     同一放送日内に収まるので、これで各枠の表示日付が一意に定まる。
 
     Returns:
-        [{hour, title, caster, bday(date)}, ...]
+        {放送日: [{hour, title, caster, bday(date)}, ...]}（放送日の古い順、各日は時系列順）
     """
-    out = []
+    out: dict[date, list[dict]] = {}
     cur = today_bday(now)
     for e in entries:
         hour = (e.get('hour') or '').strip()
@@ -256,7 +751,7 @@ def assign_broadcast_dates(entries: list[dict], now: datetime) -> list[dict]:
         if hour == '05:00':
             # 05:00 を跨ぐ度に翌放送日へ（先頭=進行中の放送日からの最初の05:00を含む）
             cur = cur + timedelta(days=1)
-        out.append({
+        out.setdefault(cur, []).append({
             'hour': hour,
             'title': (e.get('title') or '').strip(),
             'caster': (e.get('caster') or '').strip(),
@@ -273,7 +768,7 @@ def is_caster_program(title: str) -> bool:
     return '・' in title
 
 
-def lineup_for(dated: list[dict], target: date, pad_standard: bool) -> list[dict]:
+def lineup_for(dated: dict[date, list[dict]], target: date, pad_standard: bool) -> list[dict]:
     """
     指定放送日のラインナップを組む。
 
@@ -287,9 +782,7 @@ def lineup_for(dated: list[dict], target: date, pad_standard: bool) -> list[dict
         時刻順のラインナップ
     """
     by_time = {}
-    for e in dated:
-        if e['bday'] != target:
-            continue
+    for e in dated.get(target, ()):
         if not is_caster_program(e['title']):
             continue  # 深夜無人枠はスキップ
         t = e['hour']
@@ -392,15 +885,15 @@ def programs_equal(a: list[dict], b: list[dict]) -> bool:
 # 1つぶんで数える範囲は twitter-text の設定に合わせてある。
 TWEET_MAX_WEIGHTED = 280
 _WEIGHT_ONE_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+# コードポイント → 重み の表（範囲の最後まで。そこから先は全部2）
+_WEIGHT_TABLE = bytes(1 if any(lo <= cp <= hi for lo, hi in _WEIGHT_ONE_RANGES) else 2
+                      for cp in range(_WEIGHT_ONE_RANGES[-1][1] + 1))
 
 
 def weighted_len(text: str) -> int:
     """Xの数え方での文字数を返す。"""
-    total = 0
-    for ch in text:
-        cp = ord(ch)
-        total += 1 if any(lo <= cp <= hi for lo, hi in _WEIGHT_ONE_RANGES) else 2
-    return total
+    table, n = _WEIGHT_TABLE, len(_WEIGHT_TABLE)
+    return sum(table[cp] if cp < n else 2 for cp in map(ord, text))
 
 
 def build_announce_tweet(target: date, lineup: list[dict]) -> str:
@@ -418,25 +911,27 @@ def slot_name(p: dict) -> str:
 
 
 def build_change_tweet(target: date, lineup: list[dict], decisions: list,
-                       changes: list, detect_time: str) -> tuple[str, bool]:
+                       changes: list, detect_time: str) -> tuple[list[str], bool]:
     """
     決定/変更の通知ツイートを生成する。
 
     その日1日の枠を全部載せ、変わった枠にだけ注記を付ける。こうすると通知そのものが
     フル時刻表として読める＝固定ポストに差し替えても訪問者から時刻表が消えない。
 
-    枠数や氏名の長さで文字数上限を超えうるので、収まるまで注記を削る:
+    枠数や氏名の長さで文字数上限を超えうるので、収まる中で一番詳しい注記を選ぶ:
         full  … (○○から変更:14:30)
         short … (○○から変更)
         mark  … 🆕 だけ付ける
-    それでも収まらない時だけ、変わった枠のみの旧形式に落とす。
+    各行の文字数は1回だけ数え、どの段階が収まるかは足し算で決める（組み直して数え直さない）。
+    mark でも収まらない時は、full の注記のままリプライのスレッドに分けて1日ぶんを載せきる。
 
     Returns:
-        (ツイート本文, 1日分が載っているか)
-        後者が False の通知は固定ポストにしない（時刻表として不完全なため）。
+        (ツイート本文のリスト（2件以上ならスレッド）, 1件に1日分が載っているか)
+        後者が False の通知は固定ポストにしない（1件目だけでは時刻表として不完全なため）。
     """
     dec = {t for t, _ in decisions}
     chg = {t: old for t, old, _ in changes}
+    levels = ('full', 'short', 'mark')
 
     def note(t: str, level: str) -> str:
         if t not in dec and t not in chg:
@@ -448,56 +943,154 @@ def build_change_tweet(target: date, lineup: list[dict], decisions: list,
             return f" (未定から決定{suffix})"
         return f" ({chg[t].replace(' ', '')}から変更{suffix})"
 
-    def render(level: str) -> str:
-        lines = ["📢 【番組表変更のお知らせ】", "",
-                 f"📺 {format_jp_date(target)} WNL番組表(更新)", ""]
-        for p in lineup:
-            lines.append(f"{p['time']}- {slot_name(p)}{note(p['time'], level)}")
-        lines += ["", "#ウェザーニュース #番組表"]
-        return "\n".join(lines)
-
-    for level in ('full', 'short', 'mark'):
-        text = render(level)
-        if weighted_len(text) <= TWEET_MAX_WEIGHTED:
-            return text, True
-
-    # 枠が異常に多い日の保険。変わった枠だけを並べる（＝固定はしない）。
-    items = [(t, f"{t}- {new.replace(' ', '')} (未定から決定:{detect_time})")
-             for t, new in decisions]
-    items += [(t, f"{t}- {new.replace(' ', '')} ({old.replace(' ', '')}から変更:{detect_time})")
-              for t, old, new in changes]
-    items.sort(key=lambda x: slot_minutes(x[0]))
-    body = ["📢 【番組表変更のお知らせ】", "",
-            f"📺 {format_jp_date(target)} WNL番組表(更新)", ""]
-    body += [line for _, line in items]
-    body += ["", "#ウェザーニュース #番組表"]
-    return "\n".join(body), False
+    title = f"📺 {format_jp_date(target)} WNL番組表(更新)"
+    head = ["📢 【番組表変更のお知らせ】", "", title, ""]
+    foot = ["", "#ウェザーニュース #番組表"]
+    base = [f"{p['time']}- {slot_name(p)}" for p in lineup]
+    notes = {lv: [note(p['time'], lv) for p in lineup] for lv in levels}
+    base_w = [weighted_len(x) for x in base]
+    note_w = {lv: [weighted_len(x) for x in notes[lv]] for lv in levels}
+    # 改行は1つ1文字。固定部（見出し・ハッシュタグ）と各行の本体は全段階で共通
+    fixed_w = sum(map(weighted_len, head + foot)) + len(head) + len(foot) + len(base) - 1
+
+    for lv in levels:
+        if fixed_w + sum(base_w) + sum(note_w[lv]) <= TWEET_MAX_WEIGHTED:
+            lines = [b + n for b, n in zip(base, notes[lv])]
+            return ["\n".join(head + lines + foot)], True
+
+    # 枠が異常に多い日。1日ぶんを落とさずスレッドに分ける（各件に通し番号、ハッシュタグは1件目）。
+    lines = [b + n for b, n in zip(base, notes['full'])]
+    widths = [bw + nw + 1 for bw, nw in zip(base_w, note_w['full'])]   # +1 = 改行
+
+    def header(i: int, n) -> list[str]:
+        if i == 0:
+            return head[:2] + [f"{title} ({i + 1}/{n})", ""]
+        return [f"📺 {format_jp_date(target)} WNL番組表(続き {i + 1}/{n})", ""]
+
+    def overhead(i: int) -> int:
+        # 通し番号は最大桁（99/99）で見積もる＝詰め直しが要らない
+        block = header(i, 99) + (foot if i == 0 else [])
+        return sum(weighted_len(x) + 1 for x in block)
+
+    parts, used = [[]], 0
+    for line, w in zip(lines, widths):
+        if parts[-1] and used + w > TWEET_MAX_WEIGHTED - overhead(len(parts) - 1):
+            parts.append([])
+            used = 0
+        parts[-1].append(line)
+        used += w
+    texts = ["\n".join(header(i, len(parts)) + body + (foot if i == 0 else []))
+             for i, body in enumerate(parts)]
+    return texts, False
 
 
 # ============================ Twitter投稿 ============================
-def post_to_twitter(tweet_text: str) -> Optional[str]:
-    """ツイートを投稿する。環境変数のAPIキーで認証。成功でツイートID、失敗でNone。"""
-    try:
+def twitter_client():
+    """
+    投稿用の tweepy.Client（プロセス内で1つを使い回す）。
+
+    Client は requests のセッションを持っているので、使い回せばスレッドの続きや
+    常駐モードの次の投稿で接続（TLS）を張り直さずに済む。
+    """
+    global _TWITTER_CLIENT
+    if _TWITTER_CLIENT is None:
         import tweepy
-        client = tweepy.Client(
+        _TWITTER_CLIENT = tweepy.Client(
             consumer_key=os.getenv('TWITTER_API_KEY'),
             consumer_secret=os.getenv('TWITTER_API_SECRET'),
             access_token=os.getenv('TWITTER_ACCESS_TOKEN'),
             access_token_secret=os.getenv('TWITTER_ACCESS_TOKEN_SECRET'),
-            wait_on_rate_limit=True
+            wait_on_rate_limit=False
         )
-        response = client.create_tweet(text=tweet_text)
+    return _TWITTER_CLIENT
+
+
+def oauth_session():
+    """固定ポスト用の OAuth1Session（twitter_client と同じく使い回す）。"""
+    global _OAUTH_SESSION
+    if _OAUTH_SESSION is None:
+        from requests_oauthlib import OAuth1Session
+        _OAUTH_SESSION = OAuth1Session(
+            client_key=os.getenv('TWITTER_API_KEY'),
+            client_secret=os.getenv('TWITTER_API_SECRET'),
+            resource_owner_key=os.getenv('TWITTER_ACCESS_TOKEN'),
+            resource_owner_secret=os.getenv('TWITTER_ACCESS_TOKEN_SECRET'),
+        )
+    return _OAUTH_SESSION
+
+
+# 出ているがIDの分からないツイート（post_to_twitter が重複の 403 を受けた時に返す）
+UNKNOWN_TWEET_ID = 'unknown'
+
+
+def is_duplicate_post(e: Exception) -> bool:
+    """X の「同じ内容のツイートは投稿できない」（403。v1.1 のエラーコード 187）か。"""
+    if error_status(e) != 403:
+        return False
+    if 187 in (getattr(e, 'api_codes', None) or []):
+        return True
+    messages = getattr(e, 'api_messages', None) or [str(e)]
+    return any('duplicate' in str(m).lower() for m in messages)
+
+
+def post_to_twitter(tweet_text: str, reply_to: Optional[str] = None) -> Optional[str]:
+    """
+    ツイートを投稿する。環境変数のAPIキーで認証。成功でツイートID、失敗でNone。
+    reply_to を渡すとそのツイートへの返信（スレッドの続き）にする。
+
+    5xx・429・通信断は POST_RETRY で持ち時間の範囲だけやり直す（wait_on_rate_limit で
+    15分待つと job の timeout を越えるので使わない）。同文の再投稿は X 側が 403 で弾く。
+    応答を受け取れずに送り直した（前回の実行を含む）結果の 403 なら、最初の試行で出ている
+    ので出せた扱いにする（IDは分からないので UNKNOWN_TWEET_ID を返す）。失敗扱いにすると
+    送信待ちが同じ本文を送っては 403 を受け続け、後ろの通知まで止まる。
+    """
+    try:
+        client = twitter_client()
+
+        def attempt():
+            with span('post', 'x') as rec:
+                response = client.create_tweet(text=tweet_text, in_reply_to_tweet_id=reply_to)
+                rec['status'] = 'ok'
+                return response
+
+        response = POST_RETRY.call(attempt, 'ツイート')
         if response.data:
             tweet_id = str(response.data['id'])
             log(f"ツイート成功: https://twitter.com/i/web/status/{tweet_id}")
             return tweet_id
     except Exception as e:
+        if is_duplicate_post(e):
+            log(f"同じ内容のツイートが既に出ている（前の試行で投稿済み。IDは不明）: {e}")
+            return UNKNOWN_TWEET_ID
         log(f"ツイートエラー: {e}")
         if hasattr(e, 'response') and e.response is not None:
             log(f"詳細: {e.response.text}")
     return None
 
 
+def post_thread(texts: list[str]) -> Optional[str]:
+    """
+    スレッドとして順に投稿する（2件目以降は直前への返信）。先頭のツイートIDを返す。
+
+    先頭が出れば通知としては成功扱い（状態を進める）。続きが失敗したらそこで打ち切って
+    ログに残す（次回に同じ先頭から出し直すと重複になるため、やり直さない）。
+    """
+    head_id = prev_id = None
+    for i, text in enumerate(texts):
+        tweet_id = post_to_twitter(text, reply_to=prev_id)
+        if not tweet_id:
+            if head_id:
+                log(f"スレッド {i + 1}/{len(texts)} 件目の投稿失敗。以降は出さない")
+            break
+        head_id = head_id or tweet_id
+        if tweet_id == UNKNOWN_TWEET_ID:
+            if i + 1 < len(texts):
+                log(f"スレッド {i + 1}/{len(texts)} 件目は投稿済み（IDは不明）。返信先が分からないので以降は出さない")
+            break
+        prev_id = tweet_id
+    return head_id
+
+
 def pin_tweet(tweet_id: str) -> bool:
     """
     ツイートをプロフィールの固定ポストにする。
@@ -510,15 +1103,18 @@ def pin_tweet(tweet_id: str) -> bool:
     固定できる投稿は1件だけなので、新しく固定すれば前日ぶんは自動で外れる。
     """
     try:
-        from requests_oauthlib import OAuth1Session
-        session = OAuth1Session(
-            client_key=os.getenv('TWITTER_API_KEY'),
-            client_secret=os.getenv('TWITTER_API_SECRET'),
-            resource_owner_key=os.getenv('TWITTER_ACCESS_TOKEN'),
-            resource_owner_secret=os.getenv('TWITTER_ACCESS_TOKEN_SECRET'),
-        )
-        resp = session.post('https://api.twitter.com/1.1/account/pin_tweet.json',
-                            data={'id': tweet_id}, timeout=30)
+        session = oauth_session()
+
+        def attempt():
+            with span('pin', 'x') as rec:
+                r = session.post('https://api.twitter.com/1.1/account/pin_tweet.json',
+                                 data={'id': tweet_id}, timeout=request_timeout(reserve=0))
+                rec['status'] = r.status_code
+            if r.status_code >= 500 or r.status_code == 429:
+                r.raise_for_status()   # やり直す対象として POST_RETRY に渡す
+            return r
+
+        resp = POST_RETRY.call(attempt, '固定ポスト')
         if resp.status_code == 200:
             log(f"固定ポストに設定: {tweet_id}")
             return True
@@ -528,17 +1124,333 @@ def pin_tweet(tweet_id: str) -> bool:
     return False
 
 
+# ============================ 配信（X ＋ 副の投稿先） ============================
+def publish_sinks() -> list[publishers.Sink]:
+    """投稿先（先頭が主の X、続いて環境変数で設定された副の投稿先）。1回だけ作って使い回す。"""
+    global _SINKS
+    if _SINKS is None:
+        x = publishers.FunctionSink('x', lambda texts: post_thread(texts), TWEET_MAX_WEIGHTED,
+                                    weighted_len, primary=True)
+        _SINKS = [x] + publishers.configured_sinks()
+        if len(_SINKS) > 1:
+            log(f"投稿先: {', '.join(s.name for s in _SINKS)}")
+    return _SINKS
+
+
+def post_key(day: date, event: str, lineup: list[dict]) -> str:
+    """
+    投稿の冪等キー（放送日・イベント・ラインナップのハッシュ）。
+    本文の検知時刻の注記などが違っても、同じ日の同じ内容なら同じキーになる。
+    """
+    rows = sorted((p['time'], p.get('caster') if is_confirmed(p) else None) for p in lineup)
+    digest = hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+    return f"{day.isoformat()}:{event}:{digest}"
+
+
+def publish(meta: dict, texts: list[str], only: Optional[list[str]] = None) -> dict:
+    """
+    本文を投稿先に並列で出す。投稿先ごとに本文を上限に合わせて整形する。
+
+    主（X）は結果が出るまで待つ（投稿自体が POST_RETRY で持ち時間の範囲だけやり直す）。
+    副の投稿先は各自のタイムアウトと残り時間の短い方だけ待ち、失敗・時間切れは
+    ログと計測（kind=publish）に残す。
+
+    Args:
+        meta: {'kind', 'date', 'key'}（投稿先に渡す。key は Mastodon の Idempotency-Key 等）
+        only: 出す投稿先の名前（None なら全部）
+
+    Returns:
+        {投稿先の名前: 投稿ID（失敗・時間切れは None）}
+    """
+    sinks = [s for s in publish_sinks() if only is None or s.name in only]
+    results = {s.name: None for s in sinks}
+
+    def deliver(sink: publishers.Sink) -> str:
+        with span('publish', sink.name) as rec:
+            rendered = sink.render(texts)
+            post_id = sink.post(rendered, meta)
+            rec['status'], rec['posts'] = 'ok', len(rendered)
+            return post_id
+
+    def run_inline(sink: publishers.Sink) -> None:
+        try:
+            results[sink.name] = deliver(sink)
+        except Exception as e:
+            log(f"{sink.name} への投稿失敗: {e}")
+
+    primary = [s for s in sinks if s.primary]
+    others = [s for s in sinks if not s.primary]
+    if not others:
+        for sink in primary:
+            run_inline(sink)
+        return results
+    pool = ThreadPoolExecutor(max_workers=len(others), thread_name_prefix='publish')
+    try:
+        futures = [(s.name, pool.submit(deliver, s)) for s in others]
+        for sink in primary:
+            run_inline(sink)
+        wait_until = time.monotonic() + min(max(s.timeout for s in others),
+                                            max(0.0, remaining_sec()))
+        for name, fut in futures:
+            try:
+                results[name] = fut.result(timeout=max(0.0, wait_until - time.monotonic()))
+                log(f"{name} へ投稿")
+            except FutureTimeout:
+                log(f"{name} への投稿が時間切れ（待たずに進む）")
+            except Exception as e:
+                log(f"{name} への投稿失敗: {e}")
+    finally:
+        pool.shutdown(wait=False)
+    return results
+
+
+# ============================ 送信待ち（outbox） ============================
+# 投稿は「組んだ本文を送信待ちに積む → 状態と一緒に保存 → 送る」の順にする。送れなかった分は
+# 状態（outbox 区画）に残り、同じ実行の残り時間と次の実行の冒頭で送り直す（次の実行で差分を
+# 組み直して別の投稿にしない）。送った投稿の冪等キーを覚えておき、同じキーは二度積まない。
+OUTBOX_SENT_KEEP = 50         # 覚えておく送信済みキーの数（数日ぶん）
+OUTBOX_MAX_ATTEMPTS = 6       # 副の投稿先を諦めるまでの試行回数（主は放送日が過ぎるまで諦めない）
+OUTBOX_RETRY_GAP_SEC = 20     # 同じ実行の中で送り直すまでの最低間隔
+
+
+def empty_outbox() -> dict:
+    """
+    投稿まわりの状態（状態の outbox 区画）。
+      pending … 送信待ち / sent … 送信済みの冪等キー（記録用。重複の判定には使わない）
+      quota   … X に出した投稿数（quota_left）/ held_since … 変更通知を保留し始めた時刻（coalesce_hold）
+    """
+    return {'pending': [], 'sent': [], 'quota': {'recent': [], 'month': None, 'month_count': 0},
+            'held_since': None}
+
+
+def load_outbox(saved: dict) -> dict:
+    """保存済みの outbox 区画を読む（古い形で欠けているキーは空で補う）。"""
+    outbox = empty_outbox()
+    outbox.update(saved.get('outbox') or {})
+    return outbox
+
+
+def enqueue_post(outbox: dict, event: str, day: date, texts: list[str], lineup: list[dict],
+                 pin: bool) -> bool:
+    """
+    投稿を送信待ちに積む。同じ冪等キーが送信待ちにあれば積まない。
+    送信済みとは突き合わせない（ラインナップが一度前の状態に戻ってまた変わった時の通知は、
+    内容が前と同じでも新しい変更なので出す）。
+
+    Args:
+        event: 'announce' / 'decision' / 'change' / 'decision+change'
+        pin: 主に出せたら固定ポストにするか
+
+    Returns:
+        積んだら True
+    """
+    key = post_key(day, event, lineup)
+    if any(e['key'] == key for e in outbox['pending']):
+        log(f"同じ投稿が送信待ち（{key}）。積まない")
+        return False
+    if event != 'announce':
+        # まだどこにも出ていない同じ日の変更通知は、この通知（その日1日ぶんを載せる）に含まれる
+        superseded = [e for e in outbox['pending'] if e['kind'] == 'change'
+                      and e['date'] == day.isoformat() and e['sinks'] == e.get('all_sinks')]
+        for e in superseded:
+            log(f"送信待ち {e['key']} はこの通知に含まれるので捨てる")
+            outbox['pending'].remove(e)
+    sinks = [s.name for s in publish_sinks()]
+    outbox['pending'].append({
+        'key': key, 'kind': 'announce' if event == 'announce' else 'change', 'event': event,
+        'date': day.isoformat(), 'texts': texts, 'pin': pin,
+        'sinks': sinks, 'all_sinks': list(sinks), 'attempts': 0,
+        'queued': now_jst().isoformat(),
+    })
+    return True
+
+
+def primary_sink_name() -> str:
+    return next(s.name for s in publish_sinks() if s.primary)
+
+
+def drain_outbox(outbox: dict, today: date) -> bool:
+    """
+    送信待ちを古い順に1回ずつ送る。放送日が過ぎた投稿は捨てる。
+    主（X）に出せなかった投稿があれば、それより後の投稿は主には出さない（X での順序を守る）。
+    投稿数の枠が足りない投稿は主にだけ出さずに残す（後ろの告知は取り置きの枠で出す）。
+    主に出せたら（固定ポストが要るなら固定して）、副が残っていても主へは二度と出さない。
+
+    Returns:
+        送信待ちが変わったら True（＝保存が要る）
+    """
+    primary = primary_sink_name()
+    blocked = False
+    changed = False
+    now = now_jst()
+    for entry in list(outbox['pending']):
+        if date.fromisoformat(entry['date']) < today:
+            log(f"送信待ち {entry['key']} は放送日が過ぎたので捨てる（未送信: {', '.join(entry['sinks'])}）")
+            outbox['pending'].remove(entry)
+            changed = True
+            continue
+        hold_primary = blocked
+        if primary in entry['sinks'] and not blocked and not quota_allows(outbox, entry, now):
+            # 枠待ちは失敗ではないので後ろの投稿は止めない（告知は取り置きの枠で出せる）
+            log(f"X の投稿数の枠が残り {quota_left(outbox, now)}件。{entry['key']} は X に出さず待つ")
+            hold_primary = True
+        targets = [name for name in entry['sinks'] if not (hold_primary and name == primary)]
+        if not targets:
+            continue
+        # 投稿先に渡すキーは積んだ時刻で1件ずつ別にする（同じ内容の通知が戻ってきても
+        # Mastodon の Idempotency-Key で前の投稿と同一視されないように）
+        results = publish({'kind': entry['kind'], 'date': entry['date'],
+                           'key': f"{entry['key']}@{entry['queued']}"},
+                          entry['texts'], only=targets)
+        entry['attempts'] += 1
+        entry['sinks'] = [name for name in entry['sinks'] if not results.get(name)]
+        changed = True
+        if results.get(primary):
+            quota_use(outbox, len(entry['texts']), now)
+        if results.get(primary) and entry['pin']:
+            # 固定ポストは付加情報。失敗しても投稿は済んでいるので送り直さない
+            if results[primary] == UNKNOWN_TWEET_ID:
+                log(f"送信待ち {entry['key']} は X に投稿済みだがIDが分からないので固定しない")
+            else:
+                pin_tweet(results[primary])
+        if primary in entry['sinks']:
+            if not hold_primary:
+                log(f"送信待ち {entry['key']} を {primary} に出せず（{entry['attempts']}回目）。後で送り直す")
+                blocked = True
+            continue
+        if entry['sinks'] and entry['attempts'] < OUTBOX_MAX_ATTEMPTS:
+            continue   # 副だけ残っている。次の実行で送り直す
+        if entry['sinks']:
+            log(f"送信待ち {entry['key']}: {', '.join(entry['sinks'])} は {entry['attempts']}回で諦める")
+        outbox['pending'].remove(entry)
+        outbox['sent'] = (outbox['sent'] + [entry['key']])[-OUTBOX_SENT_KEEP:]
+    return changed
+
+
+def retry_outbox(outbox: dict, today: date) -> bool:
+    """
+    主に出せていない送信待ちを、この実行の残り時間で送り直す（間隔は倍々に空ける。
+    投稿の取り置き POST_RESERVE_SEC を残せない所でやめ、残りは次の実行の冒頭で送る）。
+
+    Returns:
+        送信待ちが変わったら True
+    """
+    primary = primary_sink_name()
+    gap, changed = OUTBOX_RETRY_GAP_SEC, False
+    while any(primary in e['sinks'] for e in outbox['pending']):
+        head = next(e for e in outbox['pending'] if primary in e['sinks'])
+        if not quota_allows(outbox, head, now_jst()):
+            break   # 枠が空くのを待つのは次の実行以降
+        delay = random.uniform(gap / 2, gap)
+        if remaining_sec() - delay < POST_RESERVE_SEC:
+            log("送信待ちが残っているが持ち時間が足りない。次の実行で送る")
+            break
+        log(f"送信待ちを {delay:.0f}秒後に送り直す")
+        note_retry('送信待ち')
+        time.sleep(delay)
+        changed = drain_outbox(outbox, today) or changed
+        gap *= 2
+    return changed
+
+
+# ============================ 投稿数の予算 / 変更のまとめ出し ============================
+# X の無料枠は投稿数に上限がある（ユーザーごとに24時間で17件、月に500件）。上限に当たると
+# 429 が返り、待てば job の timeout を越える。そこで出した投稿数を状態に数えておき、
+#   - 上限に達していたら X には出さず送信待ちに残す（他の投稿先には出す）
+#   - 最後の ANNOUNCE_RESERVE 件は告知のために取っておく（変更通知では使わない）
+# ようにする。数えるのは X に出した件数（スレッドの続きも1件）。
+X_POSTS_PER_DAY = 17
+X_POSTS_PER_MONTH = 500
+ANNOUNCE_RESERVE = 2
+# 変更通知のまとめ出し。決定/変更を見つけても、変わった枠の開始まで余裕があれば
+# COALESCE_WINDOW_MIN 分だけ保留する。保留中は基準（tweeted）を進めないので、次の照合の差分に
+# その間の決定/変更がすべて入り、1件の通知にまとまる。開始が COALESCE_IMMINENT_MIN 分以内の
+# 枠が含まれていれば保留しない（始まる枠の通知は遅らせない）。既定の 0 ならまとめない
+# （毎時の cron では1回保留するだけで通知が1時間遅れるので、使うのは常駐モードで）。
+COALESCE_WINDOW_MIN = int(os.getenv('COALESCE_WINDOW_MIN') or 0)
+COALESCE_IMMINENT_MIN = 150
+
+
+def quota_left(outbox: dict, now: datetime) -> int:
+    """X にあと何件出せるか（24時間の枠と月の枠の小さい方）。古い記録はここで捨てる。"""
+    q = outbox['quota']
+    since = now - timedelta(hours=24)
+    q['recent'] = [ts for ts in q['recent'] if datetime.fromisoformat(ts) > since]
+    month = now.strftime('%Y-%m')
+    if q['month'] != month:
+        q['month'], q['month_count'] = month, 0
+    return min(X_POSTS_PER_DAY - len(q['recent']), X_POSTS_PER_MONTH - q['month_count'])
+
+
+def quota_allows(outbox: dict, entry: dict, now: datetime) -> bool:
+    """送信待ちの1件を X に出す余裕があるか（変更通知は告知用の取り置きを残す）。"""
+    reserve = 0 if entry['kind'] == 'announce' else ANNOUNCE_RESERVE
+    return quota_left(outbox, now) - reserve >= len(entry['texts'])
+
+
+def quota_use(outbox: dict, posts: int, now: datetime) -> None:
+    """X に出した件数を数える。"""
+    quota_left(outbox, now)
+    q = outbox['quota']
+    q['recent'] += [now.isoformat(timespec='seconds')] * posts
+    q['month_count'] += posts
+
+
+def coalesce_hold(outbox: dict, target: date, slot_times: list[str], now: datetime,
+                  next_gap: timedelta) -> bool:
+    """
+    見つけた決定/変更の通知を保留するか（保留を始める時は held_since を記録する）。
+    次の照合が保留の窓の終わり以降になるなら、今出す（窓より長く遅らせない）。
+
+    Args:
+        slot_times: 決定/変更のあった枠の時刻
+        next_gap: 次の照合までの見込み（next_run_gap）
+    """
+    if COALESCE_WINDOW_MIN <= 0:
+        return False
+    day_start = datetime.combine(target, datetime.min.time(), JST)
+    first = min(day_start + timedelta(minutes=slot_minutes(t)) for t in slot_times)
+    if first - now <= timedelta(minutes=COALESCE_IMMINENT_MIN):
+        return False
+    held = outbox['held_since']
+    start = datetime.fromisoformat(held) if held else now
+    if now + next_gap >= start + timedelta(minutes=COALESCE_WINDOW_MIN):
+        return False
+    if held is None:
+        outbox['held_since'] = now.isoformat(timespec='seconds')
+    return True
+
+
+def next_run_gap(now: datetime, announced: bool) -> timedelta:
+    """次の照合までの見込み（常駐モードなら poll_interval、それ以外は毎時の cron）。"""
+    if _DAEMON_MODE:
+        return timedelta(seconds=poll_interval(now, announced))
+    return timedelta(seconds=CRON_INTERVAL_SEC)
+
+
 # ============================ 永続化 ============================
+def state_backend() -> state_store.StateStore:
+    """追跡状態の保存先（STATE_BACKEND で選ぶ。既定は DATA_FILE の JSON）。1回だけ作って使い回す。"""
+    global _STATE_STORE
+    if _STATE_STORE is None:
+        _STATE_STORE = state_store.open_store(os.getenv('STATE_BACKEND'), DATA_FILE)
+    return _STATE_STORE
+
+
 def save_data(target: date, tweeted: list[dict], full: list[dict],
-              announced_date: Optional[str]) -> None:
+              announced_date: Optional[str], timetable_digest: Optional[str] = None,
+              outbox: Optional[dict] = None, days: Optional[dict] = None) -> None:
     """
-    追跡状態を保存する。
+    追跡状態を保存する（変わった区画だけ。state_store.py）。
 
     Args:
         target: 追跡中の放送日
         tweeted: 最後に告知/通知したキャスター表（決定・変更の差分基準＝フォロワー認識）
         full: その放送日のフル時刻表（全枠を蓄積したもの。アーカイブ/final用）
         announced_date: 最後に告知した放送日(ISO) ※idempotency用
+        timetable_digest: この状態を導いた timetable.json のダイジェスト（無変化判定用）
+        outbox: 送信待ち（empty_outbox の形。None なら保存済みのものを残す）
+        days: 追跡日より後の放送日ごとのフル時刻表（track_future_days。None なら保存済みのものを残す）
     """
     data = {
         'target_date': target.isoformat(),
@@ -546,29 +1458,122 @@ def save_data(target: date, tweeted: list[dict], full: list[dict],
         'announced_date': announced_date,
         'tweeted': tweeted,
         'full': full,
+        'timetable_digest': timetable_digest,
+        'outbox': outbox,
+        'days': days,
         'timestamp': now_jst().isoformat(),
     }
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        log(f"保存: target={target.isoformat()} tweeted={len(tweeted)} full={len(full)} announced={announced_date}")
+        keep = [k for k in ('outbox', 'days') if data[k] is None]
+        if keep:
+            prev = load_saved_data() or {}
+            data.update({k: prev.get(k) for k in keep})
+        with span('state', state_backend().name):
+            changed = state_backend().save(data)
+        log(f"保存: target={target.isoformat()} tweeted={len(tweeted)} full={len(full)} "
+            f"announced={announced_date} 区画={','.join(changed) or 'なし'}")
     except Exception as e:
         log(f"保存エラー: {e}")
 
 
-def load_saved_data() -> Optional[dict]:
-    """保存済みの追跡状態を読み込む。無ければ None。"""
-    if not os.path.exists(DATA_FILE):
-        return None
+def save_outbox(outbox: dict) -> None:
+    """送信待ちだけを保存する（他の区画は保存済みのまま。書くのは outbox 区画だけ）。"""
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        state = load_saved_data()
+        if state is None:
+            return
+        state.update(outbox=outbox, timestamp=now_jst().isoformat())
+        with span('state', state_backend().name):
+            state_backend().save(state)
+        log(f"送信待ちを保存: 残り{len(outbox['pending'])}件")
     except Exception as e:
-        log(f"読み込みエラー: {e}")
-        return None
+        log(f"保存エラー: {e}")
+
+
+def load_saved_data() -> Optional[dict]:
+    """
+    保存済みの追跡状態を読み込む。無ければ None。
+
+    Raises:
+        state_store.StateCorruptError: 壊れている（空の状態として扱うと誤通知になるので、呼び出し側で止める）
+    """
+    return state_backend().load()
 
 
 # ============================ YouTubeアーカイブ ============================
+# 放送中ページで要るのは <head> の canonical と <title> だけ
+_LIVE_CANONICAL_RE = re.compile(
+    r'<link rel="canonical" href="https://www\.youtube\.com/watch\?v=([A-Za-z0-9_-]{11})"')
+_LIVE_TITLE_RE = re.compile(r'<title>(.*?)</title>', re.S)
+YOUTUBE_LIVE_MAX_BYTES = 2 * 1024 * 1024      # 放送中ページの読み込み上限（展開後）
+YOUTUBE_STREAMS_MAX_BYTES = 12 * 1024 * 1024  # 配信一覧の読み込み上限（展開後）
+STREAMS_OLDER_TITLES = 3   # 遡る日より古いタイトルをこれだけ見たら、その日の分は出そろったとみなす
+
+
+def live_page_stop():
+    """
+    放送中ページ用: canonical と <title> がそろった所で止める。
+    見つかった方は覚えておき、断片ごとには未発見の方だけを、持ち越した末尾と新しい断片で探す
+    （これまでの断片を毎回つなぎ直さない）。
+    """
+    patterns = [_LIVE_CANONICAL_RE, _LIVE_TITLE_RE]
+    tail = ''
+
+    def stop(chunk: str) -> bool:
+        nonlocal tail
+        text = tail + chunk
+        patterns[:] = [p for p in patterns if not p.search(text)]
+        tail = text[-4096:]   # 境目をまたぐタグ1つぶん（<title> も canonical も高々数百字）
+        return not patterns
+    return stop
+
+
+def streams_page_stop():
+    """
+    配信一覧用: _ARCHIVE_HORIZON より古い放送日のタイトルが STREAMS_OLDER_TITLES 件
+    出てきた所で止める（一覧は新しい順なので、それより後に要る日のタイトルは無い）。
+    断片の境目をまたぐトークンは、最後に一致した所から後ろを次の断片に持ち越して拾う。
+    """
+    horizon = _ARCHIVE_HORIZON
+    tail, older = '', 0
+
+    def stop(chunk: str) -> bool:
+        nonlocal tail, older
+        if horizon is None:
+            return False
+        text = tail + chunk
+        last = 0
+        for m in _YT_TOKEN_RE.finditer(text):
+            last = m.end()
+            if not m.group(2):
+                continue
+            title = _U_ESCAPE_RE.sub(lambda u: chr(int(u.group(1), 16)), m.group(2))
+            days = []
+            for d in _TITLE_DATE_RE.finditer(title):
+                try:
+                    days.append(date(int(d.group(1)), int(d.group(2)), int(d.group(3))))
+                except ValueError:
+                    continue
+            if days and max(days) < horizon:
+                older += 1
+        tail = text[last:][-4096:]   # トークン1つぶん（タイトルは高々2KB強）あれば足りる
+        return older >= STREAMS_OLDER_TITLES
+    return stop
+
+
+# http_get で途中打ち切りにするページ（URL → (止める判定を作る関数, 読み込み上限)）
+BOUNDED_READS = {
+    YOUTUBE_LIVE_URL: (live_page_stop, YOUTUBE_LIVE_MAX_BYTES),
+    YOUTUBE_STREAMS_URL: (streams_page_stop, YOUTUBE_STREAMS_MAX_BYTES),
+}
+
+
+def set_archive_horizon(day: Optional[date]) -> None:
+    """配信一覧をどの放送日まで遡って読むか（先読みを始める前に決める）。"""
+    global _ARCHIVE_HORIZON
+    _ARCHIVE_HORIZON = day
+
+
 def fetch_live_stream() -> Optional[tuple[str, str]]:
     """
     いま放送中の配信の (動画ID, タイトル) を取る。無ければ None。
@@ -578,11 +1583,9 @@ def fetch_live_stream() -> Optional[tuple[str, str]]:
     枠が終わるのを待たずにその場でリンクを確定できる。
     """
     try:
-        html = http_get(YOUTUBE_LIVE_URL, cache_bust=False)
-        vid = re.search(
-            r'<link rel="canonical" href="https://www\.youtube\.com/watch\?v=([A-Za-z0-9_-]{11})"',
-            html)
-        title = re.search(r'<title>(.*?)</title>', html, re.S)
+        html = AUX_RETRY.call(lambda: fetch_text(YOUTUBE_LIVE_URL, cache_bust=False), 'YouTube live')
+        vid = _LIVE_CANONICAL_RE.search(html)
+        title = _LIVE_TITLE_RE.search(html)
         if vid and title:
             return vid.group(1), title.group(1)
     except Exception as e:
@@ -596,6 +1599,7 @@ def fetch_youtube_archives() -> list[tuple[str, str]]:
 
     放送中の1本を先頭に置き、続けて配信一覧（直近3日程度）を並べる。
     一覧は終わった枠しか載らないので、放送中の枠は前者でしか拾えない。
+    どちらのページも要る所まで読んだら受信を打ち切る（BOUNDED_READS）。
     取得・解析に失敗しても Bot 本体は止めない（空リストを返してリンク無しで続行）。
     """
     global _YOUTUBE_ARCHIVES
@@ -607,91 +1611,162 @@ def fetch_youtube_archives() -> list[tuple[str, str]]:
         _YOUTUBE_ARCHIVES.append(live)
         log(f"放送中の配信: {live[0]}")
     try:
-        html = http_get(YOUTUBE_STREAMS_URL, cache_bust=False)
-        # ページ内のJSONは \uXXXX でエスケープされているので先に戻す
-        html = re.sub(r'\\u([0-9a-fA-F]{4})', lambda m: chr(int(m.group(1), 16)), html)
-        # 動画IDとタイトルは別ノードにあるため、タイトル直前のIDを対応付ける
-        ids = [(m.start(), m.group(1))
-               for m in re.finditer(r'"(?:videoId|contentId)":"([A-Za-z0-9_-]{11})"', html)]
-        seen = set()
-        for m in re.finditer(r'"(?:content|simpleText|text)":"(【[^"]{10,220})"', html):
-            before = [v for pos, v in ids if pos < m.start()]
-            if not before:
-                continue
-            pair = (before[-1], m.group(1))
-            if pair[1] in seen:
-                continue
-            seen.add(pair[1])
-            _YOUTUBE_ARCHIVES.append(pair)
+        html = AUX_RETRY.call(lambda: fetch_text(YOUTUBE_STREAMS_URL, cache_bust=False),
+                              'YouTube streams')
+        _YOUTUBE_ARCHIVES.extend(parse_youtube_streams(html))
         log(f"YouTube配信: {len(_YOUTUBE_ARCHIVES)}件（放送中含む）")
     except Exception as e:
         log(f"YouTube配信一覧の取得に失敗（リンク無しで続行）: {e}")
     return _YOUTUBE_ARCHIVES
 
 
+# 配信一覧ページ内のJSONから拾う2種類のトークン。動画IDとタイトルは別ノードにあるので、
+# ページ順に1回だけ走査して「直前に出てきたID」をタイトルに対応付ける。
+# タイトルは \uXXXX エスケープのまま拾い（【 も \u3010 で来うる）、一致した部分だけ戻す。
+_YT_TOKEN_RE = re.compile(
+    r'"(?:videoId|contentId)":"([A-Za-z0-9_-]{11})"'
+    r'|"(?:content|simpleText|text)":"((?:【|\\u3010)[^"]{10,2000})"')
+_U_ESCAPE_RE = re.compile(r'\\u([0-9a-fA-F]{4})')
+YT_TITLE_MIN, YT_TITLE_MAX = 10, 220   # 【 の後ろの文字数（エスケープを戻した後）
+
+
+def parse_youtube_streams(html: str) -> list[tuple[str, str]]:
+    """
+    配信一覧ページから (動画ID, タイトル) をページ順に取り出す（同じタイトルは最初の1件）。
+
+    ページ全体のコピーを作らない1パスの走査なので、ページの大きさに比例した時間で済む。
+    """
+    out, seen = [], set()
+    last_id = None
+    for m in _YT_TOKEN_RE.finditer(html):
+        if m.group(1):
+            last_id = m.group(1)
+            continue
+        if last_id is None:
+            continue
+        title = _U_ESCAPE_RE.sub(lambda u: chr(int(u.group(1), 16)), m.group(2))
+        if not (YT_TITLE_MIN <= len(title) - 1 <= YT_TITLE_MAX) or title in seen:
+            continue
+        seen.add(title)
+        out.append((last_id, title))
+    return out
+
+
 def _squash(s: str) -> str:
     """全角/半角スペースを除去する（タイトルは詰め書き、キャスター名は空白入りのため）。"""
     return s.replace(' ', '').replace('　', '')
 
 
-def match_archive(archives: list[tuple[str, str]], bday: date,
-                  program: str, caster: str) -> Optional[str]:
+_TITLE_DATE_RE = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')   # タイトル側はゼロ埋めしない
+# 〈ウェザーニュースLiVEコーヒータイム・白井ゆかり／山口剛央〉 → 番組 'コーヒータイム', 出演 '白井ゆかり／山口剛央'
+_TITLE_PROGRAM_RE = re.compile(r'ウェザーニュースLiVE・?([^・／〈〉]+)・([^〈〉]*)')
+
+
+def program_suffix(program: str) -> str:
+    """番組名の '・' より後ろ（'ウェザーニュースLiVE・モーニング' → 'モーニング'）。無ければ空文字。"""
+    return program.split('・')[-1].strip() if '・' in program else ''
+
+
+def index_archives(archives: list[tuple[str, str]]) -> dict:
     """
-    放送日・番組名・キャスター名がすべて一致する配信を探し、動画IDを返す。
+    配信一覧を (放送日, 番組) で引ける索引にする（1回の実行で1度だけ作る）。
 
     タイトル例:
       【ライブ配信終了】最新天気ニュース・地震情報 2026年7月30日(木)／…
       〈ウェザーニュースLiVEコーヒータイム・白井ゆかり／山口剛央〉
+
+    Returns:
+        {(date, 番組suffix): {'names': {出演者名: 動画ID}, 'titles': [(詰めたタイトル, 動画ID), ...]}}
+        いずれも一覧の並び順で最初のものを優先する。
     """
-    suffix = program.split('・')[-1].strip() if '・' in program else ''
+    index = {}
+    for vid, title in archives:
+        t = _squash(title)
+        days = set()
+        for m in _TITLE_DATE_RE.finditer(t):
+            try:
+                days.add(date(int(m.group(1)), int(m.group(2)), int(m.group(3))))
+            except ValueError:
+                continue
+        for m in _TITLE_PROGRAM_RE.finditer(t):
+            suffix = m.group(1)
+            names = [n for n in m.group(2).split('／') if n]
+            for d in days:
+                bucket = index.setdefault((d, suffix), {'names': {}, 'titles': []})
+                for n in names:
+                    bucket['names'].setdefault(n, vid)
+                bucket['titles'].append((t, vid))
+    return index
+
+
+def match_archive(index: dict, bday: date, program: str, caster: str) -> Optional[str]:
+    """放送日・番組名・キャスター名がすべて一致する配信を索引から探し、動画IDを返す。"""
+    suffix = program_suffix(program)
     if not suffix or not caster:
         return None
-    jp_date = f"{bday.year}年{bday.month}月{bday.day}日"   # タイトル側はゼロ埋めしない
+    bucket = index.get((bday, suffix))
+    if not bucket:
+        return None
     name = _squash(caster)
-    for vid, title in archives:
-        t = _squash(title)
-        if jp_date in t and 'ウェザーニュースLiVE' in t and suffix in t and name in t:
-            return vid
-    return None
+    vid = bucket['names'].get(name)
+    if vid:
+        return vid
+    # 出演者欄の区切りが想定と違うタイトル向け（詰めたタイトルに名前が含まれれば可）
+    return next((v for t, v in bucket['titles'] if name in t), None)
+
+
+def links_pending(full: list[dict], target: date, now: datetime) -> bool:
+    """始まった（＝配信が立っているはずの）キャスター枠で、配信リンクが未解決のものがあるか。"""
+    day_start = datetime.combine(target, datetime.min.time(), JST)
+    return any(p.get('caster') and is_caster_program(p.get('program', '')) and not p.get('youtube')
+               and day_start + timedelta(minutes=slot_minutes(p['time'])) <= now
+               for p in full)
 
 
 def resolve_youtube_links(full: list[dict], target: date) -> list[dict]:
+    """1日ぶんのフル時刻表に配信リンクを埋める（resolve_youtube_links_days の1日版）。"""
+    return resolve_youtube_links_days({target: full})[target]
+
+
+def resolve_youtube_links_days(days: dict[date, list[dict]]) -> dict[date, list[dict]]:
     """
-    フル時刻表の未解決枠に配信アーカイブのURLを埋める（キャスター番組のみ）。
+    放送日ごとのフル時刻表の未解決枠に配信アーカイブのURLを埋める（キャスター番組のみ）。
 
+    配信一覧の取得と索引づくりは1回の実行で1度だけで、何日ぶんでも1パスで照合する。
     深夜の無人枠はタイトルにキャスター名が無く誤対応しうるので対象外。
     見つからなければ何もしない（次の実行で再挑戦する）。
     """
-    pending = [p for p in full
+    global _ARCHIVE_INDEX
+    pending = [(d, p) for d, full in days.items() for p in full
                if p.get('caster') and is_caster_program(p.get('program', '')) and not p.get('youtube')]
     if not pending:
-        return full
+        return days
     archives = fetch_youtube_archives()
     if not archives:
-        return full
+        return days
     # リンクは付加情報。ここで転んでも告知・変更通知は止めない。
     try:
-        for p in pending:
-            vid = match_archive(archives, target, p.get('program', ''), p['caster'])
+        if _ARCHIVE_INDEX is None:
+            _ARCHIVE_INDEX = index_archives(archives)
+        for d, p in pending:
+            vid = match_archive(_ARCHIVE_INDEX, d, p.get('program', ''), p['caster'])
             if vid:
                 p['youtube'] = f"https://youtu.be/{vid}"
-                log(f"配信リンク: {target} {p['time']} {p['caster']} -> {p['youtube']}")
+                log(f"配信リンク: {d} {p['time']} {p['caster']} -> {p['youtube']}")
     except Exception as e:
         log(f"配信リンクの照合に失敗（リンク無しで続行）: {e}")
-    return full
+    return days
 
 
 # ============================ フル時刻表 & 履歴 ============================
-def full_slots_for(dated: list[dict], target: date) -> list[dict]:
+def full_slots_for(dated: dict[date, list[dict]], target: date) -> list[dict]:
     """
     指定放送日の【全枠】を返す（キャスター番組も深夜無人も含む、フル時刻表用）。
 
     各枠: {time, program(番組名), caster(漢字名 or None)}
     """
     by_time = {}
-    for e in dated:
-        if e['bday'] != target:
-            continue
+    for e in dated.get(target, ()):
         code = e.get('caster') or ''
         name = resolve_caster_name(code)[0] if code else None
         by_time[e['hour']] = {'time': e['hour'], 'program': e['title'], 'caster': name}
@@ -735,6 +1810,24 @@ def union_full(acc: list[dict], current: list[dict]) -> list[dict]:
     return sorted(base.values(), key=lambda p: slot_minutes(p['time']))
 
 
+def track_future_days(days: dict, dated: dict[date, list[dict]], tracked: date) -> None:
+    """
+    追跡日より後の放送日（番組表に載った分すべて）のフル時刻表を蓄積する（状態の days 区画）。
+    載った時点から残しておくので、翌々日の枠も出た時から取りこぼさない。追跡日以前の分は捨てる
+    （追跡日になった日は、その時に days から引き継ぐ）。
+
+    Args:
+        days: {放送日ISO: {'full': フル時刻表}}（その場で更新する）
+    """
+    for key in [k for k in days if k <= tracked.isoformat()]:
+        del days[key]
+    for bday in dated:
+        if bday > tracked:
+            key = bday.isoformat()
+            days[key] = {'full': union_full((days.get(key) or {}).get('full') or [],
+                                            full_slots_for(dated, bday))}
+
+
 def full_equal(a: list[dict], b: list[dict]) -> bool:
     """2つのフル時刻表が同一か（時刻・番組・キャスター・配信リンク観点）。"""
     def key(s):
@@ -744,27 +1837,54 @@ def full_equal(a: list[dict], b: list[dict]) -> bool:
 
 
 def ensure_history_file() -> None:
-    """history.jsonl が無ければ空で作る。
+    """履歴セグメントが1つも無ければ今月分を空で作る（分割前の history.jsonl が残っていれば先に分割）。
     イベント（告知/決定/変更/final）の無い「確定だけ」のrunでは append_history が
     呼ばれずファイルが生成されない。すると Actions の commit step（file_pattern に
-    history.jsonl を含む）が `pathspec did not match any files` で落ちる。これを防ぐ。
+    history/ を含む）が `pathspec did not match any files` で落ちる。これを防ぐ。
     """
-    if not os.path.exists(HISTORY_FILE):
-        try:
-            open(HISTORY_FILE, 'a', encoding='utf-8').close()
-        except Exception as e:
-            log(f"履歴ファイル作成エラー: {e}")
+    try:
+        moved = history_segments.migrate_legacy(LEGACY_HISTORY_FILE, HISTORY_DIR)
+        if moved:
+            log(f"{LEGACY_HISTORY_FILE} を月別セグメントに分割: {moved}件")
+        path = history_segments.hot_path(now_jst().strftime('%Y-%m'), HISTORY_DIR)
+        if not history_segments.list_segments(HISTORY_DIR):
+            os.makedirs(HISTORY_DIR, exist_ok=True)
+            open(path, 'a', encoding='utf-8').close()
+    except Exception as e:
+        log(f"履歴ファイル作成エラー: {e}")
+
+
+def ensure_cache_files() -> None:
+    """
+    コミット対象のキャッシュ（HTTP_CACHE_FILE / CASTER_MAPS_FILE）が無ければ空で作る。
+    ensure_history_file と同じく、取得が走らなかったrunで commit step が落ちないように。
+    """
+    for path in (HTTP_CACHE_FILE, CASTER_MAPS_FILE):
+        if not os.path.exists(path):
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write('{}\n')
+            except Exception as e:
+                log(f"キャッシュファイル作成エラー: {e}")
 
 
 def append_history(record: dict) -> None:
-    """history.jsonl に1行追記する（統計・長期記録用。失敗してもBot本体は止めない）。"""
+    """
+    今月の履歴セグメントに1行追記する（統計・長期記録用。失敗してもBot本体は止めない）。
+    月が替わっていれば前月のセグメントを閉じてから書く。
+    検索用インデックス（history_db.py）はここでは触らない（検索する時に差分を取り込む）。
+    """
     try:
-        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        history_segments.append(record, HISTORY_DIR)
     except Exception as e:
         log(f"履歴追記エラー: {e}")
 
 
+def iter_history():
+    """全履歴セグメントを古い順に1行ずつ読んでレコードを返すジェネレータ（壊れた行は飛ばす）。"""
+    return history_segments.iter_records(HISTORY_DIR)
+
+
 def history_tweet_record(target: date, event: str, lineup: list[dict]) -> dict:
     """ツイート系履歴（告知/決定/変更）。lineup は {時刻: キャスター名 or null}。"""
     return {
@@ -788,6 +1908,87 @@ def history_final_record(target: date, full: list[dict]) -> dict:
     }
 
 
+# ============================ ポーリング計画（履歴から学習） ============================
+def change_histogram(records) -> list[list[float]]:
+    """
+    決定/変更イベントの 曜日(月=0) × 時(0-23) のヒストグラム。
+
+    ts は「気づいた時刻」で、実際の変化はその前の問い合わせ間隔のどこか。
+    毎時実行なら平均して30分前なので、30分戻した時刻の枠に数える。
+    """
+    hist = [[0.0] * 24 for _ in range(7)]
+    for r in records:
+        if r.get('event') not in CHANGE_EVENTS or not r.get('ts'):
+            continue
+        try:
+            ts = datetime.fromisoformat(r['ts']).astimezone(JST) - timedelta(minutes=30)
+        except ValueError:
+            continue
+        hist[ts.weekday()][ts.hour] += 1
+    return hist
+
+
+def polling_plan(hist: list[list[float]], budget: int = POLL_BUDGET_PER_DAY) -> dict:
+    """
+    ヒストグラムからポーリング計画を作る。
+
+    各時に最低1回を置き、残りの予算を（曜日ごとに）イベント数に応じて配る。
+    同じ時のイベントが少ない曜日も他の曜日の傾向を借りられるよう、全曜日の合計を半分混ぜる。
+
+    Returns:
+        {'events': 総数, 'budget': 予算, 'plan': {曜日: {時: [分, ...]}}}  ※キーは文字列
+    """
+    total_by_hour = [sum(hist[d][h] for d in range(7)) / 7 for h in range(24)]
+    plan = {}
+    for d in range(7):
+        weight = [hist[d][h] + 0.5 * total_by_hour[h] for h in range(24)]
+        counts = [1] * 24
+        # 1回ずつ「1回あたりのイベント数」が一番大きい時へ足していく（ドント方式）
+        for _ in range(max(0, budget - 24)):
+            cand = [(weight[h] / counts[h], h) for h in range(24)
+                    if counts[h] < POLL_MAX_PER_HOUR and weight[h] > 0]
+            if not cand:
+                break   # 履歴に出てこない時間帯へは配らない（予算を使い切らなくてよい）
+            counts[max(cand)[1]] += 1
+        plan[str(d)] = {str(h): sorted((POLL_MINUTE_OFFSET + k * 60 // n) % 60 for k in range(n))
+                        for h, n in enumerate(counts)}
+    events = int(sum(map(sum, hist)))
+    return {'events': events, 'budget': budget, 'plan': plan}
+
+
+def build_polling_plan() -> Optional[dict]:
+    """履歴を流し読みして計画を作る。イベントが PLAN_MIN_EVENTS 未満なら None。"""
+    plan = polling_plan(change_histogram(iter_history()))
+    if plan['events'] < PLAN_MIN_EVENTS:
+        return None
+    return plan
+
+
+def next_planned_poll(plan: dict, now: datetime) -> datetime:
+    """計画上、now より後の最初の問い合わせ時刻。"""
+    base = now.replace(minute=0, second=0, microsecond=0)
+    for h in range(24 * 8):
+        slot = base + timedelta(hours=h)
+        for minute in plan['plan'][str(slot.weekday())][str(slot.hour)]:
+            at = slot.replace(minute=minute)
+            if at > now:
+                return at
+    return now + timedelta(seconds=DAEMON_NORMAL_SEC)
+
+
+def plan_to_cron(plan: dict) -> list[str]:
+    """計画を GitHub Actions 用の cron 行（UTC）にする。同じ分・曜日の時はまとめる。"""
+    groups = {}
+    for d in range(7):
+        for h in range(24):
+            # JST → UTC（9時間戻す。日付を跨ぐと曜日も1つ戻る）
+            utc_h, utc_d = (h - 9) % 24, (d - (1 if h < 9 else 0)) % 7
+            key = (','.join(map(str, plan['plan'][str(d)][str(h)])), (utc_d + 1) % 7)  # cron は日曜=0
+            groups.setdefault(key, []).append(utc_h)
+    return [f"- cron: '{minutes} {','.join(map(str, sorted(hours)))} * * {dow}'"
+            for (minutes, dow), hours in sorted(groups.items(), key=lambda kv: (kv[0][1], kv[0][0]))]
+
+
 # ============================ reconcile（中核） ============================
 def reconcile() -> bool:
     """
@@ -801,20 +2002,23 @@ def reconcile() -> bool:
         正常終了で True
     """
     now = now_jst()
+    start_run_clock()
     log(f"=== reconcile 開始 {now.strftime('%Y-%m-%d %H:%M')} ===")
 
-    entries = fetch_entries()
-    if not entries:
-        log("番組表が取得できず。処理中断")
+    phase('load_state')
+    try:
+        saved = load_saved_data() or {}
+    except state_store.StateCorruptError as e:
+        # 空の状態で続けると全枠の誤通知・二重告知になる。直すまで毎回失敗させて気づけるようにする
+        log(f"追跡状態が壊れているため中断（自動では初期化しない）: {e}")
         return False
-    dated = assign_broadcast_dates(entries, now)
-
-    saved = load_saved_data() or {}
     # tweeted = 判断の基準。新フォーマットがあればそれ、無ければ旧 programs を正規化して引き継ぐ。
     tweeted = saved.get('tweeted') or normalize_lineup(saved.get('programs', []))
     full_acc = saved.get('full') or []
     announced_date = saved.get('announced_date')
     saved_target = saved.get('target_date')
+    outbox = load_outbox(saved)
+    days = dict(saved.get('days') or {})   # 追跡日より後の放送日のフル時刻表
 
     tb = today_bday(now)
     tomorrow = tb + timedelta(days=1)
@@ -824,9 +2028,48 @@ def reconcile() -> bool:
     # 既に告知済みなら announced_date==tomorrow で弾かれる（idempotent・二重告知なし）。
     announce_now = (now.hour >= ANNOUNCE_HOUR) or (now.hour < DAY_START_HOUR) \
         or (os.getenv('ANNOUNCE_TEST') == 'true')
+    announce_pending = announce_now and announced_date != tomorrow.isoformat()
+    # 時刻だけで生じる仕事（告知・再アンカー・配信リンク待ち・保留中の変更通知）があるか。
+    # 無ければ番組表が前回と同一の時点で、この実行でやることは何も無い。
+    time_work = (announce_pending
+                 or outbox['held_since'] is not None
+                 or not saved_target
+                 or date.fromisoformat(saved_target) < tb
+                 or links_pending(full_acc, date.fromisoformat(saved_target), now))
+
+    # 番組表JSON・キャスター対応表・YouTube(放送中/一覧)を並列で取り始める。
+    # YouTube はリンク待ちの枠がある時だけ（番組表が変わって必要になれば後で取りに行く）。
+    # キャスター対応表は保存分が期限切れの時だけ。
+    maps_stale = caster_maps_stale()
+    # 配信リンクが要るのは追跡中の放送日（告知時は final にする日）以降だけ
+    set_archive_horizon(date.fromisoformat(saved_target) if saved_target else tb)
+    phase('fetch_timetable')
+    start_prefetch([t for t in PREFETCH_TARGETS
+                    if (time_work or t[0] not in (YOUTUBE_LIVE_URL, YOUTUBE_STREAMS_URL))
+                    and (t[0] != TIMETABLE_HTML_URL or maps_stale)])
+    # 前回までに送れなかった投稿を先に送る（番組表の取得と並行）
+    if outbox['pending'] and not is_dry_run():
+        phase('outbox')
+        log(f"送信待ち {len(outbox['pending'])}件を送る")
+        if drain_outbox(outbox, tb):
+            save_outbox(outbox)
+        phase('fetch_timetable')
+    entries = fetch_entries()
+    if not entries:
+        log("番組表が取得できず。処理中断")
+        return False
+    digest = http_cache_digest(TIMETABLE_JSON_URL)
+    if digest and digest == saved.get('timetable_digest') and not time_work:
+        log("番組表は前回から変化なし・時刻起因の処理も無し → 何もせず終了")
+        if maps_stale:
+            get_caster_maps()   # 先読みした timetable.html で保存分だけ更新しておく
+        return True
+    phase('parse')
+    dated = assign_broadcast_dates(entries, now)
 
     # ---------- ① 告知（21時以降・翌日が未告知） ----------
-    if announce_now and announced_date != tomorrow.isoformat():
+    if announce_pending:
+        phase('announce')
         raw = lineup_for(dated, tomorrow, pad_standard=False)
         if any(p['status'] == 'confirmed' for p in raw):
             lineup = lineup_for(dated, tomorrow, pad_standard=True)
@@ -835,13 +2078,13 @@ def reconcile() -> bool:
             if is_dry_run():
                 log("dry-run: 告知投稿・保存スキップ")
                 return True
-            tweet_id = post_to_twitter(tweet)
-            if not tweet_id:
-                log("告知投稿に失敗。次回リトライ")
-                return False
-            # プロフィールの固定ポストを最新の番組表に差し替える
-            pin_tweet(tweet_id)
+            # 送信待ちに積み、翌日へロールした状態と一緒に保存してから送る。
+            # 送れなくても状態は進める（次の実行の冒頭で同じ本文を送り直す）。
+            # 出せたらプロフィールの固定ポストを最新の番組表に差し替える（pin=True）
+            enqueue_post(outbox, 'announce', tomorrow, [tweet], lineup, pin=True)
+            outbox['held_since'] = None   # 保留していた変更は告知（翌日ぶん）に置き換わる
             # 終わる放送日を final として確定（最後の観測も取り込む）
+            phase('final')
             if saved_target and saved_target != tomorrow.isoformat():
                 out_day = date.fromisoformat(saved_target)
                 final_full = union_full(full_acc, full_slots_for(dated, out_day))
@@ -850,9 +2093,18 @@ def reconcile() -> bool:
                     append_history(history_final_record(out_day, final_full))
                     log(f"final 確定: {out_day} ({len(final_full)}枠)")
             # 翌日へロール（tweeted/full をリセット）
-            save_data(tomorrow, lineup, full_slots_for(dated, tomorrow),
-                      announced_date=tomorrow.isoformat())
+            phase('save')
+            # 翌日は番組表に載った時から days に蓄積してある。それを引き継いで追跡日にする
+            next_full = union_full((days.get(tomorrow.isoformat()) or {}).get('full') or [],
+                                   full_slots_for(dated, tomorrow))
+            track_future_days(days, dated, tomorrow)
+            save_data(tomorrow, lineup, next_full, announced_date=tomorrow.isoformat(),
+                      timetable_digest=digest, outbox=outbox, days=days)
             append_history(history_tweet_record(tomorrow, 'announce', lineup))
+            phase('outbox')
+            sent = drain_outbox(outbox, tb)
+            if retry_outbox(outbox, tb) or sent:
+                save_outbox(outbox)
             return True
         else:
             log("翌日の確定キャスターがまだ無い。告知保留")
@@ -863,17 +2115,14 @@ def reconcile() -> bool:
         tracked = date.fromisoformat(saved_target)
         if tracked < tb:
             log(f"追跡日 {tracked} が古い → 今日 {tb} に再アンカー（基準リセット）")
-            tracked, tweeted, full_acc = tb, [], []
+            tracked, tweeted = tb, []
+            full_acc = (days.get(tb.isoformat()) or {}).get('full') or []
             reanchored = True
     else:
         tracked = tb
 
-    # ---------- ② フル時刻表を蓄積（アーカイブ） ----------
-    new_full = union_full(full_acc, full_slots_for(dated, tracked))
-    # 終わった枠から順に配信リンクを埋める（未解決分は次の実行で再挑戦）
-    new_full = resolve_youtube_links(new_full, tracked)
-
-    # ---------- ③ 監視（決定 / 変更）：基準は tweeted ----------
+    # ---------- ② 監視（決定 / 変更）：基準は tweeted ----------
+    phase('monitor')
     current = lineup_for(dated, tracked, pad_standard=False)
     upcoming = filter_upcoming(current, tracked, now)
     decisions, changes = diff_lineup(tweeted, upcoming)
@@ -885,60 +2134,403 @@ def reconcile() -> bool:
             # tweeted が空リセットされているため、全枠が「未定から決定」に化けて
             # 誤解を招く通知になる。ここでは通知せず baseline だけ静かに確立する。
             log(f"再アンカー直後につき通知抑止（{len(decisions)}決定/{len(changes)}変更を baseline 化）")
+            outbox['held_since'] = None
             if is_dry_run():
                 log("dry-run: baseline確立スキップ")
                 return True
             new_tweeted = merge_baseline(tweeted, upcoming)
+        elif coalesce_hold(outbox, tracked, [t for t, *_ in decisions + changes], now,
+                           next_run_gap(now, announced_date == tomorrow.isoformat())):
+            # 基準は進めない＝次の照合の差分にこの決定/変更も入り、1件の通知にまとまる
+            log(f"決定{len(decisions)} / 変更{len(changes)} の通知を保留（{outbox['held_since']} から"
+                f"最大{COALESCE_WINDOW_MIN}分。まとめて出す）")
         else:
             # 通知は「その日1日ぶん」を載せる＝更新後の baseline がそのまま本文になる
+            outbox['held_since'] = None
             new_tweeted = merge_baseline(tweeted, upcoming)
-            tweet, is_full = build_change_tweet(tracked, new_tweeted, decisions, changes,
-                                                now.strftime('%H:%M'))
-            log(f"=== 決定{len(decisions)} / 変更{len(changes)} ===\n" + tweet)
+            tweets, is_full = build_change_tweet(tracked, new_tweeted, decisions, changes,
+                                                 now.strftime('%H:%M'))
+            log(f"=== 決定{len(decisions)} / 変更{len(changes)} ===\n" + "\n---\n".join(tweets))
             if is_dry_run():
                 log("dry-run: 投稿・保存スキップ")
                 return True
-            tweet_id = post_to_twitter(tweet)
-            if not tweet_id:
-                log("投稿失敗。状態更新せず（次回リトライ）")
-                return False
+            ev = 'decision+change' if (decisions and changes) else ('change' if changes else 'decision')
             # 1日ぶん載っている通知だけ固定ポストに差し替える（時刻表として完全なので）
-            if is_full:
-                pin_tweet(tweet_id)
-            else:
+            if not is_full:
                 log("変わった枠のみの通知のため固定ポストは差し替えない")
-            ev = 'decision+change' if (decisions and changes) else ('change' if changes else 'decision')
-            append_history(history_tweet_record(tracked, ev, new_tweeted))
+            # 送信待ちに積み、基準を進めた状態を先に保存してから送る（送れなければ次の実行が
+            # 同じ本文を送り直す。差分を組み直さないので二重の通知にならない）。
+            # 番組表のダイジェストはまだ前回のまま（蓄積が済むまで無変化判定に使わせない）
+            if enqueue_post(outbox, ev, tracked, tweets, new_tweeted, pin=is_full):
+                phase('save')
+                save_data(tracked, new_tweeted, full_acc, announced_date=announced_date,
+                          timetable_digest=saved.get('timetable_digest'), outbox=outbox)
+                phase('outbox')
+                drain_outbox(outbox, tb)
+                append_history(history_tweet_record(tracked, ev, new_tweeted))
     else:
+        if outbox['held_since'] is not None:
+            log("保留していた決定/変更が元に戻った。通知しない")
+            outbox['held_since'] = None
         log("決定・変更なし")
-        if is_dry_run():
-            log("dry-run: 保存スキップ")
-            return True
+
+    # ---------- ③ フル時刻表を蓄積（アーカイブ） ----------
+    # 配信リンクの照合は YouTube 待ちになりうるので、通知を出した後に回す
+    phase('archive')
+    new_full = union_full(full_acc, full_slots_for(dated, tracked))
+    track_future_days(days, dated, tracked)
+    # 終わった枠から順に配信リンクを埋める（未解決分は次の実行で再挑戦）
+    new_full = resolve_youtube_links(new_full, tracked)
+    if is_dry_run():
+        log("dry-run: 保存スキップ")
+        return True
+
+    # 主に出せていない送信待ちは、残り時間で送り直す
+    phase('outbox')
+    retry_outbox(outbox, tb)
 
     # ---------- 保存（状態が変わった時だけ） ----------
+    phase('save')
     state_changed = (
         saved_target != tracked.isoformat()
         or not programs_equal(tweeted, new_tweeted)
         or not full_equal(full_acc, new_full)
+        or saved.get('timetable_digest') != digest
+        or outbox != (saved.get('outbox') or empty_outbox())
+        or days != (saved.get('days') or {})
     )
     if state_changed:
-        save_data(tracked, new_tweeted, new_full, announced_date=announced_date)
+        save_data(tracked, new_tweeted, new_full, announced_date=announced_date,
+                  timetable_digest=digest, outbox=outbox, days=days)
     else:
         log("状態変化なし → 保存スキップ")
     return True
 
 
+# ============================ 読み取りAPI（--serve） ============================
+READ_API_DEFAULT = '127.0.0.1:8080'
+READ_API_HISTORY = 30   # /history で返す直近のイベント数
+
+
+def slot_start(bday: date, hhmm: str) -> datetime:
+    """放送日の枠の開始時刻（05:00 より前の枠は翌日の未明）。"""
+    minutes = slot_minutes(hhmm)
+    if minutes < DAY_START_HOUR * 60:
+        minutes += 24 * 60
+    return datetime.combine(bday, datetime.min.time(), JST) + timedelta(minutes=minutes)
+
+
+def _api_body(obj) -> tuple[bytes, str]:
+    """応答の本文と ETag（本文のダイジェスト。同じ内容なら再読込をまたいでも同じ）。"""
+    body = (json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def recent_history(limit: int = READ_API_HISTORY) -> list[dict]:
+    """直近の履歴イベント（新しい順）。新しい月のセグメントから遡り、足りた所で止める。"""
+    out: list[dict] = []
+    for _, path in reversed(history_segments.list_segments(HISTORY_DIR)):
+        records = [r for _, _, r in history_segments.iter_segment(path)]
+        out.extend(reversed(records[-(limit - len(out)):]))
+        if len(out) >= limit:
+            break
+    return out
+
+
+def build_read_cache(saved: dict, events: list[dict]) -> dict:
+    """
+    保存済みの追跡状態と直近の履歴から、応答をすべて組み立てておく。
+
+    /now は時刻で変わるので、枠の境目ごとの本文を先に作っておき、要求のたびには
+    開始時刻の列を二分探索して選ぶだけにする。
+    """
+    tracked = saved.get('target_date')
+    days = {k: v.get('full') or [] for k, v in sorted((saved.get('days') or {}).items())}
+    timeline = []
+    for key, full in ([(tracked, saved.get('full') or [])] if tracked else []) + list(days.items()):
+        bday = date.fromisoformat(key)
+        for p in full:
+            start = slot_start(bday, p['time'])
+            timeline.append((start, {'date': key, 'time': p['time'], 'start': start.isoformat(),
+                                     'program': p.get('program', ''), 'caster': p.get('caster'),
+                                     'youtube': p.get('youtube')}))
+    timeline.sort(key=lambda x: x[0])
+    for (_, cur), (nxt_start, _) in zip(timeline, timeline[1:]):
+        cur['end'] = nxt_start.isoformat()
+    updated = saved.get('timestamp')
+    # now_bodies[i] は timeline[i-1] が放送中の時の応答（i=0 は最初の枠の前）
+    now_bodies = [_api_body({'now': timeline[i - 1][1] if i else None,
+                             'next': timeline[i][1] if i < len(timeline) else None,
+                             'updated': updated})
+                  for i in range(len(timeline) + 1)]
+    bodies = {
+        '/': _api_body({'endpoints': ['/lineup', '/now', '/history'], 'updated': updated}),
+        '/lineup': _api_body({'target_date': tracked, 'announced_date': saved.get('announced_date'),
+                              'tweeted': saved.get('tweeted') or [], 'full': saved.get('full') or [],
+                              'days': days, 'updated': updated}),
+        '/history': _api_body({'events': events, 'updated': updated}),
+    }
+    return {'bodies': bodies, 'starts': [s for s, _ in timeline], 'now_bodies': now_bodies}
+
+
+def refresh_read_cache() -> None:
+    """
+    読み取りAPIの応答を作り直す（常駐モードの各照合の後）。
+
+    読み込みに失敗したら前の応答のまま出し続ける。差し替えは参照の付け替え1回なので、
+    応答中のスレッドは古いか新しいかどちらか一方を丸ごと見る。
+    """
+    global _READ_CACHE
+    try:
+        _READ_CACHE = build_read_cache(load_saved_data() or {}, recent_history())
+    except Exception as e:
+        log(f"読み取りAPIの更新に失敗（前の内容のまま）: {e}")
+
+
+def read_api_response(path: str, now: datetime) -> Optional[tuple[bytes, str, int]]:
+    """
+    path の応答 (本文, ETag, 鮮度の秒数)。無いパスなら None。
+
+    /now は次の枠の境目まで、それ以外は次の照合まで内容が変わらないが、照合の時刻は
+    決まっていないので鮮度は0（毎回 ETag で確かめてもらう）。
+    """
+    cache = _READ_CACHE
+    if cache is None:
+        return None
+    if path == '/now':
+        i = bisect.bisect_right(cache['starts'], now)
+        max_age = int((cache['starts'][i] - now).total_seconds()) if i < len(cache['starts']) else 0
+        return (*cache['now_bodies'][i], max_age)
+    got = cache['bodies'].get(path)
+    return (*got, 0) if got else None
+
+
+class ReadApiHandler(BaseHTTPRequestHandler):
+    """読み取りAPI（GET/HEAD のみ。If-None-Match が一致すれば 304）。"""
+    protocol_version = 'HTTP/1.1'   # 持続接続（高頻度の読み手が毎回つなぎ直さないように）
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def _respond(self, head: bool) -> None:
+        got = read_api_response(self.path.split('?', 1)[0].rstrip('/') or '/', now_jst())
+        if got is None:
+            body, etag, status, max_age = b'{"error":"not found"}\n', None, 404, 0
+        else:
+            (body, etag, max_age), status = got, 200
+            match = [t.strip() for t in (self.headers.get('If-None-Match') or '').split(',')]
+            if etag in match or '*' in match:
+                body, status = b'', 304
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f"max-age={max_age}, must-revalidate")
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass   # 高頻度に読まれるので1件ずつは記録しない
+
+
+def start_read_api(spec: str) -> ThreadingHTTPServer:
+    """
+    読み取りAPIを別スレッドで立てる（spec は 'HOST:PORT' か 'PORT'）。
+    内容は保存済みの状態から作り、以後は照合のたびに refresh_read_cache で差し替える。
+    """
+    host, _, port = spec.rpartition(':')
+    refresh_read_cache()
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), ReadApiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='read-api', daemon=True).start()
+    log(f"読み取りAPI: http://{host or '127.0.0.1'}:{port}/ （/lineup /now /history）")
+    return server
+
+
+# ============================ 常駐モード ============================
+def reset_run_caches() -> None:
+    """
+    実行ごとに取り直すべきプロセス内キャッシュを捨てる（常駐モードの各照合の前）。
+    配信一覧・先読みは毎回取り直し、キャスター対応表は期限切れの時だけ捨てる。
+    条件付きGETのキャッシュはそのまま使い回す（＝304 で済ませるため）。
+    """
+    global _YOUTUBE_ARCHIVES, _ARCHIVE_INDEX, _ARCHIVE_HORIZON, _CASTER_MAPS, _CASTER_MAPS_REFRESHED
+    _YOUTUBE_ARCHIVES = None
+    _ARCHIVE_INDEX = None
+    _ARCHIVE_HORIZON = None
+    _PREFETCH.clear()
+    _CASTER_MAPS_REFRESHED = False
+    if caster_maps_stale():
+        _CASTER_MAPS = None
+
+
+def dense_windows(day: date) -> list[tuple[datetime, datetime]]:
+    """指定日の「密に問い合わせる」時間帯（各枠の開始前、告知時刻から翌放送日の開始まで）。"""
+    base = datetime.combine(day, datetime.min.time(), JST)
+    out = [(base + timedelta(minutes=slot_minutes(t) - DENSE_BEFORE_SLOT_MIN),
+            base + timedelta(minutes=slot_minutes(t))) for t in STANDARD_SLOTS]
+    out.append(announce_window(base + timedelta(hours=ANNOUNCE_HOUR)))
+    return out
+
+
+def announce_window(now: datetime) -> tuple[datetime, datetime]:
+    """
+    now の放送日の告知窓（告知時刻〜翌放送日の開始）。reconcile はこの間ずっと告知を試みる。
+
+    Examples:
+        >>> announce_window(datetime(2026,6,21,2,0,tzinfo=JST))[0].isoformat()
+        '2026-06-20T21:00:00+09:00'
+    """
+    base = datetime.combine(today_bday(now), datetime.min.time(), JST)
+    return (base + timedelta(hours=ANNOUNCE_HOUR),
+            base + timedelta(days=1, hours=DAY_START_HOUR))
+
+
+def poll_interval(now: datetime, announced: bool) -> float:
+    """
+    今の時刻に応じた問い合わせ間隔（秒）。
+
+    Args:
+        announced: 翌日ぶんを告知済みか（告知後の夜〜未明は疎でよい）
+    """
+    # 告知窓は日を跨ぐので、前日ぶんの窓も見る
+    for lo, hi in dense_windows(now.date() - timedelta(days=1)) + dense_windows(now.date()):
+        if lo <= now < hi:
+            if lo.hour == ANNOUNCE_HOUR and announced:
+                continue   # 告知済みなら告知窓は密にしない（枠の開始前だけ見る）
+            return DAEMON_DENSE_SEC
+    if announced and (now.hour >= ANNOUNCE_HOUR or now.hour < DAY_START_HOUR):
+        return DAEMON_SPARSE_SEC
+    return DAEMON_NORMAL_SEC
+
+
+def next_poll_at(now: datetime, announced: bool, plan: Optional[dict] = None) -> datetime:
+    """
+    次に照合する時刻。間隔ぶん待つ途中で密な時間帯が始まるなら、その開始時刻に前倒しする。
+
+    plan（履歴から作ったポーリング計画）があれば枠まわりはそれに従う。告知は履歴ではなく
+    こちらが出すものなので、告知時刻〜告知するまで（翌放送日の開始まで）は計画に関係なく
+    密に問い合わせる。
+    """
+    if plan:
+        nxt = next_planned_poll(plan, now)
+        if not announced:
+            lo, hi = announce_window(now)
+            if lo <= now < hi:
+                nxt = min(nxt, now + timedelta(seconds=DAEMON_DENSE_SEC))
+            elif now < lo:
+                nxt = min(nxt, lo)
+        return nxt
+    nxt = now + timedelta(seconds=poll_interval(now, announced))
+    starts = [lo for d in (now.date(), now.date() + timedelta(days=1))
+              for lo, _ in dense_windows(d) if now < lo < nxt]
+    return min(starts, default=nxt)
+
+
+def run_daemon(read_api: Optional[ThreadingHTTPServer] = None) -> None:
+    """
+    常駐して reconcile() を内部スケジューラで繰り返す。
+
+    プロセスを保ったままなのでキャッシュ（条件付きGET・キャスター対応表）が温まったまま使える。
+    状態は各 reconcile の中で保存済みなので、止める時は実行中の照合を終えるのを待つだけ。
+
+    Args:
+        read_api: 読み取りAPI（start_read_api）。あれば照合のたびに応答を作り直す
+    """
+    global _DAEMON_MODE
+    _DAEMON_MODE = True
+    stop = threading.Event()
+
+    def handle(signum, _frame):
+        log(f"シグナル {signum} を受信。実行中の照合を終えてから停止する")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+    log("=== 常駐モード開始 ===")
+    plan, plan_day = None, None
+    while not stop.is_set():
+        if plan_day != now_jst().date():   # 計画は1日1回作り直す（履歴は増えていくので）
+            plan, plan_day = build_polling_plan(), now_jst().date()
+            log(f"ポーリング計画: {'履歴から作成' if plan else '履歴が少ないので静的な間隔'}")
+        reset_run_caches()
+        try:
+            success = reconcile()
+        except Exception as e:
+            log(f"照合中の想定外のエラー（常駐は継続）: {e}")
+            success = False
+        write_result(success)
+        if read_api:
+            refresh_read_cache()
+        now = now_jst()
+        try:
+            announced = (load_saved_data() or {}).get('announced_date') == \
+                (today_bday(now) + timedelta(days=1)).isoformat()
+        except state_store.StateCorruptError:
+            announced = False   # 照合側で失敗として記録済み。間隔は密な方に倒す
+        wake = next_poll_at(now, announced, plan)
+        log(f"次の照合: {wake.strftime('%H:%M')}")
+        stop.wait(max(1.0, (wake - now).total_seconds()))
+    if read_api:
+        read_api.shutdown()
+    log("=== 常駐モード終了 ===")
+
+
 # ============================ エントリーポイント ============================
-def main() -> None:
-    log("=== ウェザーニュースBot開始 ===")
-    ensure_history_file()   # イベント無しrunでも commit step が落ちないように先に確保
-    success = reconcile()
+def write_result(success: bool) -> None:
+    """
+    実行結果を bot_result.json に書く（計測つき）。
+    METRICS_TEXTFILE があれば Prometheus の textfile も書く。
+    """
+    metrics = run_metrics()
     try:
         with open('bot_result.json', 'w', encoding='utf-8') as f:
-            json.dump({'success': success, 'timestamp': now_jst().isoformat()},
+            json.dump({'success': success, 'timestamp': now_jst().isoformat(), **metrics},
                       f, ensure_ascii=False, indent=2)
     except Exception as e:
         log(f"結果出力エラー: {e}")
+    textfile = os.getenv('METRICS_TEXTFILE')
+    if textfile:
+        try:
+            write_prometheus(textfile, success, metrics)
+        except Exception as e:
+            log(f"メトリクス出力エラー: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ウェザーニュース番組表Bot')
+    parser.add_argument('--daemon', action='store_true',
+                        help='常駐して内部スケジューラで照合を繰り返す')
+    parser.add_argument('--polling-plan', action='store_true',
+                        help='履歴からポーリング計画を作って出力する（照合はしない）')
+    parser.add_argument('--serve', nargs='?', const=READ_API_DEFAULT, metavar='[HOST:]PORT',
+                        help=f'常駐しつつ読み取りAPIを立てる（既定 {READ_API_DEFAULT}）')
+    parser.add_argument('--cron', action='store_true',
+                        help='--polling-plan の出力を GitHub Actions の cron 行（UTC）にする')
+    args = parser.parse_args()
+
+    if args.polling_plan:
+        plan = polling_plan(change_histogram(iter_history()))
+        if plan['events'] < PLAN_MIN_EVENTS:
+            log(f"決定/変更イベントが {plan['events']} 件しか無い（{PLAN_MIN_EVENTS} 件未満）。参考値として出力")
+        print("\n".join(plan_to_cron(plan)) if args.cron
+              else json.dumps(plan, ensure_ascii=False, indent=2))
+        return
+
+    log("=== ウェザーニュースBot開始 ===")
+    ensure_history_file()   # イベント無しrunでも commit step が落ちないように先に確保
+    ensure_cache_files()
+    if args.daemon or args.serve:
+        run_daemon(start_read_api(args.serve) if args.serve else None)
+        sys.exit(0)
+    success = reconcile()
+    write_result(success)
     sys.exit(0 if success else 1)
 
 